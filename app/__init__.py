@@ -11,6 +11,8 @@ def create_app(config_class=Config):
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
 
+    from app.engine import configure_engine, register_sqlite_pragmas
+    configure_engine(app)
     db.init_app(app)
     login_manager.init_app(app)
 
@@ -20,6 +22,8 @@ def create_app(config_class=Config):
     from app.routes.employees import employees_bp
     from app.routes.admin import admin_bp
     from app.routes.qr import qr_bp  # NEW
+    from app.routes.api import api_bp
+    from app.routes.jobs import jobs_bp
 
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -27,8 +31,26 @@ def create_app(config_class=Config):
     app.register_blueprint(employees_bp, url_prefix='/employees')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(qr_bp, url_prefix='/qr') # NEW
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+    app.register_blueprint(jobs_bp, url_prefix='/jobs')
+
+    from app.stats import register_stat_tracking
+    from app.search import init_search_index
+    from app.cache import register_version_tracking
+    from app.scanlog import init_scan_log
+    from app.proof_images import init_proof_images
+    from app.jobs import init_jobs
+    from app.snapshots import register_snapshot_tracking
+    register_stat_tracking()
+    register_version_tracking()
+    register_snapshot_tracking()
+    init_scan_log(app)
+    init_proof_images(app)
+    init_jobs(app)
 
     with app.app_context():
+        register_sqlite_pragmas(db.engine, app.config)
         db.create_all()
+        init_search_index(app)
 
     return app
\ No newline at end of file
@@ -0,0 +1,217 @@
+# Path: app/cache.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Asset, AssetHistory, Branch, DataVersion, Employee, User
+
+# --- In-process caches ---
+# Each gunicorn worker keeps its own copy. Explicit invalidation only reaches
+# the worker that made the change, so every cache also has a TTL that bounds
+# how stale the other workers can be.
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds (None = never)."""
+
+    def __init__(self, ttl=None, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# Global "QR scanning enabled" flag (SystemSetting 'global_qr_scan')
+scan_flag_cache = TTLCache(ttl=30, maxsize=1)
+# Rendered public scan pages: qr_hash -> (etag, html)
+scan_page_cache = TTLCache(ttl=300, maxsize=2048)
+# Row totals for the audit log pages, keyed by page + filters (app/pagination.py)
+count_cache = TTLCache(ttl=60, maxsize=256)
+
+# --- Asset versions ---
+# Asset.version is bumped on every flush that changes an asset, so cached
+# renderings (and ETags) keyed on (asset id, version) go stale automatically,
+# whichever worker made the change. Those renderings also show the holder's and
+# branch's names, so editing an employee or branch bumps the assets it holds.
+
+def _bump_versions(session, flush_context, instances):
+    holders, branches = [], []
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, Asset):
+            obj.version = (obj.version or 0) + 1
+        elif isinstance(obj, Employee) and obj.id:
+            holders.append(obj.id)
+        elif isinstance(obj, Branch) and obj.id:
+            branches.append(obj.id)
+    for column, ids in ((Asset.current_employee_id, holders), (Asset.current_branch_id, branches)):
+        if not ids:
+            continue
+        session.connection().execute(update(Asset.__table__).where(column.in_(ids))
+                                     .values(version=Asset.__table__.c.version + 1))
+        for obj in session.identity_map.values():
+            if isinstance(obj, Asset) and inspect(obj).dict.get(column.key) in ids:
+                session.expire(obj, ['version'])  # reload the bumped value
+
+# --- Global data version ---
+# One counter for "anything the API serves has changed": every history row
+# written by log_history (or the bulk actions), and any asset, employee or
+# branch edit, bumps it in the same transaction. API responses use it as their
+# ETag/Last-Modified, so polling clients get a 304 from a single-row read.
+#
+# Every writer updates the same row, so flushes only note that a bump is due
+# and the UPDATE runs once, right before the commit: the row stays locked for
+# the end of the transaction rather than all of it.
+
+DATA_MODELS = (Asset, AssetHistory, Employee, Branch)
+PENDING_VERSIONS = 'pending_data_versions'  # session.info key: DataVersion rows to bump at commit
+
+def _data_changed(session):
+    if any(isinstance(o, DATA_MODELS) for o in session.new) or \
+            any(isinstance(o, DATA_MODELS) for o in session.deleted):
+        return True
+    return any(isinstance(o, DATA_MODELS) and session.is_modified(o, include_collections=False)
+               for o in session.dirty)
+
+def _note_data_change(session, flush_context, instances):
+    if _data_changed(session):
+        bump_data_version(session)
+
+def _bump_pending_versions(session):
+    if session.in_nested_transaction():
+        return  # a savepoint; the outer commit bumps
+    session.flush()  # commit flushes after this hook; its changes must count
+    rows = session.info.pop(PENDING_VERSIONS, None)
+    if not rows:
+        return
+    table = DataVersion.__table__
+    conn = session.connection()
+    now = datetime.utcnow()
+    for row in sorted(rows):
+        bump = table.update().where(table.c.id == row).values(version=table.c.version + 1, modified_at=now)
+        if conn.execute(bump).rowcount:
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(table.insert().values(id=row, version=1, modified_at=now))
+        except IntegrityError:
+            conn.execute(bump)  # another worker created the row first
+
+def _drop_pending_versions(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_VERSIONS, None)  # rolled back (a commit already took them)
+
+DATA_VERSION = 1
+USERS_VERSION = 2  # login accounts, see "Logged-in users" below
+
+def bump_data_version(session=None, row=DATA_VERSION):
+    """Bump the version when the current transaction commits (for writes that bypass the ORM flush)."""
+    (session or db.session).info.setdefault(PENDING_VERSIONS, set()).add(row)
+
+def data_version():
+    """(version, modified_at) of the last committed data change."""
+    row = db.session.query(DataVersion.version, DataVersion.modified_at).filter(DataVersion.id == DATA_VERSION).first()
+    return tuple(row) if row else (0, datetime(2000, 1, 1))
+
+def register_version_tracking():
+    for name, listener in (('before_flush', _bump_versions), ('before_flush', _note_data_change),
+                           ('before_commit', _bump_pending_versions),
+                           ('after_transaction_end', _drop_pending_versions)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+# --- Logged-in users ---
+# Flask-Login loads current_user on every authenticated request, including each
+# live-search keystroke and branch dropdown fetch. load_user (models.py) serves
+# it from user_cache instead: a read-only copy of the account, never an ORM
+# instance shared between threads. Deleting a user or changing a password calls
+# forget_user, which drops the entry here and bumps the users version row in the
+# same transaction; every worker compares that row at most once per
+# USER_VERSION_CHECK seconds and empties its cache when it moved, so a deleted
+# account is logged out everywhere within seconds rather than after the TTL.
+
+user_cache = TTLCache(ttl=300, maxsize=1024)
+USER_VERSION_CHECK = 5  # seconds
+
+class CachedUser(UserMixin):
+    """What current_user needs from a User (no password)."""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.name = user.name
+
+    def __repr__(self):
+        return f"<CachedUser {self.id}>"
+
+_users_seen = {'version': None, 'checked_at': 0.0}
+_users_lock = threading.Lock()
+
+def _check_users_version():
+    now = time.monotonic()
+    with _users_lock:
+        if now - _users_seen['checked_at'] < USER_VERSION_CHECK:
+            return
+        _users_seen['checked_at'] = now
+    version = db.session.query(DataVersion.version).filter(DataVersion.id == USERS_VERSION).scalar() or 0
+    with _users_lock:
+        if version != _users_seen['version']:
+            if _users_seen['version'] is not None:
+                user_cache.clear()
+            _users_seen['version'] = version
+
+def cached_user(user_id):
+    """current_user for a session's user id, or None when the account is gone."""
+    _check_users_version()
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.session.get(User, user_id)
+        if row is None:
+            return None
+        user = CachedUser(row)
+        user_cache.set(user_id, user)
+    return user
+
+def forget_user(user_id, session=None):
+    """Drop a changed or deleted account from every worker's cache. Call before the commit."""
+    bump_data_version(session, row=USERS_VERSION)
+    user_cache.pop(user_id)
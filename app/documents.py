@@ -0,0 +1,222 @@
+# Path: app/documents.py
+import os
+import re
+import glob
+import time
+import uuid
+import hashlib
+import shutil
+from collections import Counter, namedtuple
+from flask import current_app
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import AssetHistory, StoredDocument
+
+# --- Proof documents ---
+# Uploads are stored once per content. store_upload streams the file to a temp
+# name while hashing it, then moves it to UPLOAD_FOLDER/<aa>/<sha256>.<ext>,
+# or drops it when that content is already there, so the same invoice attached
+# to 40 assets in one batch transfer is one file. StoredDocument.ref_count
+# counts the AssetHistory rows pointing at each file: writers of history rows
+# call add_references, admin.revert_transaction calls release_reference and
+# the file goes with its last reference.
+#
+# Files from before this scheme (proof_<ts>_<uuid>.<ext>, no StoredDocument
+# row) keep working; scripts/update_db.py moves them into the store. The store
+# sits outside app/static: assets.document is the only way to read a proof.
+
+CHUNK_SIZE = 64 * 1024
+STORED_NAME = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+ORPHAN_GRACE_SECONDS = 3600  # an upload whose history row is still being written
+
+def is_stored(path):
+    return bool(path and STORED_NAME.match(path))
+
+def stored_sha256(path):
+    """The content hash in a content-addressed path (its strong ETag), else None."""
+    return os.path.basename(path).split('.')[0] if is_stored(path) else None
+
+# A file put in the store: its path relative to UPLOAD_FOLDER, its size, and
+# where the content came from (a seekable stream or a file name), so that
+# add_references can store it again if it was removed in the meantime.
+StoredFile = namedtuple('StoredFile', 'path size origin')
+
+def _store(stream, extension):
+    """Copy a binary stream into the store; returns (path relative to UPLOAD_FOLDER, size)."""
+    folder = current_app.config['UPLOAD_FOLDER']
+    tmp = os.path.join(folder, f".upload-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        path = f"{sha256[:2]}/{sha256}.{extension}"
+        target = os.path.join(folder, path)
+        if os.path.exists(target):
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path, size
+
+def _store_again(stored):
+    extension = stored.path.rsplit('.', 1)[1]
+    if isinstance(stored.origin, str):
+        with open(stored.origin, 'rb') as f:
+            _store(f, extension)
+    else:
+        stored.origin.seek(0)
+        _store(stored.origin, extension)
+
+def store_upload(file_obj, extension):
+    """Store an uploaded FileStorage; returns its StoredFile (path = the document_path to record).
+
+    Does not touch the database.
+    """
+    path, size = _store(file_obj.stream, extension)
+    return StoredFile(path, size, file_obj.stream)
+
+def add_references(stored, count=1, session=None):
+    """Count `count` more history rows pointing at a StoredFile (None: no proof). Does not commit."""
+    if stored is None or not is_stored(stored.path) or count <= 0:
+        return
+    table = StoredDocument.__table__
+    conn = (session or db.session).connection()
+    bump = update(table).where(table.c.path == stored.path).values(ref_count=table.c.ref_count + count)
+    if conn.execute(bump).rowcount:
+        return
+    # No references yet: a remove_unused or prune_orphans since _store may
+    # have deleted the file, so put it back before counting it
+    if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], stored.path)):
+        _store_again(stored)
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(table).values(path=stored.path, sha256=stored_sha256(stored.path), size=stored.size,
+                                              ref_count=count))
+    except IntegrityError:
+        conn.execute(bump)  # another request stored the same content first
+
+def release_reference(path, session=None):
+    """Drop one reference (the caller is deleting a history row). Does not commit.
+
+    Returns True when that was the last one: call remove_unused(path) after the commit.
+    """
+    if not is_stored(path):
+        return False
+    table = StoredDocument.__table__
+    conn = (session or db.session).connection()
+    conn.execute(update(table).where(table.c.path == path, table.c.ref_count > 0)
+                 .values(ref_count=table.c.ref_count - 1))
+    return conn.execute(table.select().with_only_columns(table.c.ref_count)
+                        .where(table.c.path == path)).scalar() == 0
+
+def remove_unused(path):
+    """Delete a stored file and its row if nothing references it any more. Commits."""
+    result = db.session.execute(delete(StoredDocument).where(StoredDocument.path == path,
+                                                             StoredDocument.ref_count == 0))
+    db.session.commit()
+    if result.rowcount:
+        _remove_file(path)
+
+def _remove_file(path):
+    full = os.path.join(current_app.config['UPLOAD_FOLDER'], path)
+    for name in [full] + glob.glob(glob.escape(full) + '.*.jpg'):  # + image renditions (app/proof_images.py)
+        try:
+            os.remove(name)
+        except OSError:
+            pass
+
+# --- Maintenance ---
+def prune_orphans():
+    """Delete stored files no history row references (uploads whose request failed). Commits.
+
+    Files younger than ORPHAN_GRACE_SECONDS are left alone: their history row
+    may not be committed yet.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    referenced = set(p for (p,) in db.session.query(StoredDocument.path).filter(StoredDocument.ref_count > 0))
+    db.session.execute(delete(StoredDocument).where(StoredDocument.ref_count == 0))
+    db.session.commit()
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    removed = 0
+    for entry in os.scandir(folder):
+        if not (entry.is_dir() and re.match(r'^[0-9a-f]{2}$', entry.name)):
+            continue
+        for name in os.listdir(entry.path):
+            path = f"{entry.name}/{name}"
+            if is_stored(path) and path not in referenced and \
+                    os.path.getmtime(os.path.join(folder, path)) < cutoff:
+                _remove_file(path)
+                removed += 1
+    return removed
+
+def move_public_uploads(source):
+    """Move every file under `source` (the old app/static/uploads) into UPLOAD_FOLDER.
+
+    Keeps relative paths; a stored file already present in both is the same
+    content and the public copy is dropped. Returns the number of files moved.
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.isdir(source) or os.path.abspath(source) == os.path.abspath(folder):
+        return 0
+    moved = 0
+    for root, _, names in os.walk(source):
+        for name in names:
+            full = os.path.join(root, name)
+            target = os.path.join(folder, os.path.relpath(full, source))
+            if os.path.exists(target):
+                os.remove(full)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(full, target)
+            moved += 1
+    for root, _, _ in sorted(os.walk(source), reverse=True):  # empty subfolders, deepest first
+        if root != source and not os.listdir(root):
+            os.rmdir(root)
+    return moved
+
+def migrate_legacy_documents(batch_size=1000):
+    """Move pre-store proof files into the store and repoint their history rows. Commits.
+
+    Returns (files moved, files missing on disk).
+    """
+    folder = current_app.config['UPLOAD_FOLDER']
+    moved, missing = {}, 0
+    for (old_path,) in db.session.query(AssetHistory.document_path)\
+            .filter(AssetHistory.document_path.isnot(None)).distinct():
+        if is_stored(old_path):
+            continue
+        full = os.path.join(folder, old_path)
+        if not os.path.isfile(full):
+            missing += 1
+            continue
+        with open(full, 'rb') as f:
+            path, size = _store(f, old_path.rsplit('.', 1)[-1].lower())
+        moved[old_path] = StoredFile(path, size, full)  # the old file stays until the commit
+    if not moved:
+        return 0, missing
+
+    # One pass over the history rows with a document, updated by primary key
+    rows = db.session.query(AssetHistory.id, AssetHistory.document_path)\
+        .filter(AssetHistory.document_path.isnot(None)).all()
+    changes = [dict(id=row_id, document_path=moved[path].path) for row_id, path in rows if path in moved]
+    for i in range(0, len(changes), batch_size):
+        db.session.execute(update(AssetHistory), changes[i:i + batch_size])
+    counts = Counter(c['document_path'] for c in changes)
+    for stored in {s.path: s for s in moved.values()}.values():
+        add_references(stored, counts[stored.path])
+    db.session.commit()
+    for old_path in moved:
+        _remove_file(old_path)
+    return len(moved), missing
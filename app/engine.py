@@ -0,0 +1,89 @@
+# Path: app/engine.py
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# --- Database engine profiles ---
+# Config.DB_PROFILE picks how the engine is tuned for the configured backend:
+#   stock      - SQLAlchemy/driver defaults (what the app shipped with)
+#   production - several gunicorn workers sharing one database
+#
+# MySQL (pymysql): a bounded pool per worker that checks connections before use
+# and recycles them before the server's idle timeout drops them.
+# SQLite: WAL journal so readers never block the writer and a commit is one
+# append instead of a rollback-journal rewrite, a busy timeout so a worker
+# waits for the write lock instead of failing with "database is locked", and a
+# larger page cache plus memory-mapped reads.
+#
+# Any single setting can be overridden with the matching DB_* config key.
+
+PROFILES = {
+    'stock': {
+        'mysql': {},
+        'sqlite': {},
+    },
+    'production': {
+        'mysql': {
+            'pool_size': 5,
+            'max_overflow': 10,
+            'pool_timeout': 30,
+            'pool_pre_ping': True,
+            'pool_recycle': 1800,
+        },
+        'sqlite': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',  # durable in WAL mode except on power loss
+            'busy_timeout': 15000,  # ms
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64000,  # negative = KiB, i.e. 64 MB per connection
+        },
+    },
+}
+
+# Config key -> setting it overrides
+OVERRIDES = {
+    'DB_POOL_SIZE': 'pool_size',
+    'DB_MAX_OVERFLOW': 'max_overflow',
+    'DB_POOL_RECYCLE': 'pool_recycle',
+    'DB_BUSY_TIMEOUT': 'busy_timeout',
+    'DB_MMAP_SIZE': 'mmap_size',
+    'DB_CACHE_SIZE': 'cache_size',
+}
+
+def _backend(uri):
+    return 'sqlite' if make_url(uri).get_backend_name() == 'sqlite' else 'mysql'
+
+def profile_settings(config):
+    """Settings of config['DB_PROFILE'] for the configured database, with overrides applied."""
+    name = config.get('DB_PROFILE') or 'stock'
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}' (choose from {', '.join(PROFILES)})")
+    settings = dict(PROFILES[name][_backend(config['SQLALCHEMY_DATABASE_URI'])])
+    for key, setting in OVERRIDES.items():
+        if config.get(key) is not None and setting in settings:
+            settings[setting] = config[key]
+    return settings
+
+def configure_engine(app):
+    """Merge the profile's pool options into SQLALCHEMY_ENGINE_OPTIONS (call before db.init_app)."""
+    if _backend(app.config['SQLALCHEMY_DATABASE_URI']) == 'sqlite':
+        return
+    options = profile_settings(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})  # explicit options win
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def register_sqlite_pragmas(engine, config):
+    """Apply the profile's PRAGMAs to every new SQLite connection of `engine`."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = profile_settings(config)
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
@@ -0,0 +1,187 @@
+# Path: app/jobs.py
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from app.extensions import db
+from app.models import Job
+from app.workers import BackgroundWorker
+
+# --- Background jobs ---
+# Work that can outlast a gunicorn request timeout (detailed CSV export, QR
+# generation for the whole fleet, large sticker batches, CSV imports) is
+# submitted as a Job row and run by JobRunner threads instead of the request.
+#
+# Every web process runs JOB_WORKERS runner threads, started on its first
+# request (threads don't survive a fork). They claim queued jobs from the
+# table with a conditional UPDATE, so a job submitted to one worker may run in
+# any of them and each runs exactly once; a runner that was idle re-checks the
+# table every JOB_POLL_INTERVAL seconds. A job runs inside a request context
+# for the URL it was submitted from (url_for and render_template work) and
+# writes its result, if any, under JOB_RESULT_FOLDER/<job id>/.
+#
+# Handlers are registered with @job_handler(kind) next to the synchronous code
+# they share (routes/assets.py, routes/qr.py, routes/jobs.py). A running job
+# reports ctx.progress(done, total); that is also its heartbeat: a job with
+# none for JOB_STALE_SECONDS (its process died) is marked failed.
+
+HANDLERS = {}
+
+class JobError(Exception):
+    """A handler failure whose message is meant for the user."""
+
+def job_handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+def submit_job(kind, params=None, user_id=None, base_url=None):
+    """Queue a job (commits) and wake this process's runner."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    job = Job(kind=kind, params=json.dumps(params or {}), created_by_user_id=user_id, base_url=base_url)
+    db.session.add(job)
+    db.session.commit()
+    current_app.extensions['jobs'].wake(job.id)
+    return job
+
+def result_folder(job_id):
+    return os.path.join(current_app.config['JOB_RESULT_FOLDER'], str(job_id))
+
+class JobContext:
+    """What a handler gets: its params, progress reporting and a result file."""
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.params = json.loads(job.params or '{}')
+        self.result = None  # (name, mimetype) once open_result was called
+        self._reported = 0.0
+
+    def progress(self, done, total=None, message=None, force=False):
+        """Record progress (at most once a second unless forced).
+
+        Written on a connection of its own so it can be called in the middle
+        of a streamed query; call it between commits, never with uncommitted
+        writes in db.session (SQLite would wait on its own write lock).
+        """
+        now = time.monotonic()
+        if not force and now - self._reported < 1.0:
+            return
+        self._reported = now
+        values = dict(progress=done, heartbeat_at=datetime.utcnow())
+        if total is not None:
+            values['total'] = total
+        if message is not None:
+            values['message'] = message[:500]
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(update(Job.__table__).where(Job.__table__.c.id == self.job_id).values(**values))
+        except OperationalError:
+            # SQLite without WAL: an open read in this thread blocks the write.
+            # Progress is advisory; the job carries on.
+            current_app.logger.warning(f"Could not record progress of job {self.job_id}")
+
+    def open_result(self, name, mimetype, mode='wb'):
+        """Open the job's downloadable result file for writing."""
+        folder = result_folder(self.job_id)
+        os.makedirs(folder, exist_ok=True)
+        self.result = (name, mimetype)
+        return open(os.path.join(folder, name), mode)
+
+class JobRunner(BackgroundWorker):
+    name = 'job-runner'
+    join_timeout = 1  # a running job is left to the stale check
+
+    def __init__(self, app):
+        super().__init__(app, run_async=app.config.get('JOBS_ASYNC', True))
+        self.threads = app.config.get('JOB_WORKERS', 2)
+        self.idle_interval = app.config.get('JOB_POLL_INTERVAL', 2.0)
+        self.stale_after = app.config.get('JOB_STALE_SECONDS', 900)
+        self._stale_checked = 0.0
+
+    def wake(self, job_id):
+        self.put(job_id)
+
+    def handle(self, job_ids):
+        # Any runner may claim any queued job: a wakeup (or an idle poll) only
+        # means "look at the table"
+        self.run_pending()
+
+    def run_pending(self):
+        """Claim and run queued jobs until none are left (needs an app context)."""
+        if time.monotonic() - self._stale_checked >= 60:
+            self._stale_checked = time.monotonic()
+            self._fail_stale()
+        ran = 0
+        while True:
+            job = self._claim()
+            if job is None:
+                return ran
+            self._execute(job)
+            ran += 1
+
+    def _claim(self):
+        while True:
+            job_id = db.session.query(Job.id).filter(Job.status == 'queued').order_by(Job.id).limit(1).scalar()
+            if job_id is None:
+                db.session.commit()
+                return None
+            now = datetime.utcnow()
+            claimed = db.session.execute(update(Job).where(Job.id == job_id, Job.status == 'queued')
+                                         .values(status='running', started_at=now, heartbeat_at=now)).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+
+    def _fail_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        db.session.execute(update(Job).where(Job.status == 'running', Job.heartbeat_at < cutoff)
+                           .values(status='failed', finished_at=datetime.utcnow(),
+                                   message='Stopped: the process running it exited.'))
+        db.session.commit()
+
+    def _execute(self, job):
+        ctx = JobContext(job)
+        handler = HANDLERS.get(job.kind)
+        status, message = 'done', None
+        try:
+            with self.app.test_request_context(base_url=job.base_url or None):
+                if handler is None:
+                    raise JobError(f"No handler for job kind '{job.kind}'")
+                message = handler(ctx)
+        except JobError as e:
+            db.session.rollback()
+            status, message = 'failed', str(e)
+        except Exception as e:
+            db.session.rollback()
+            self.app.logger.exception(f"Job {job.id} ({job.kind}) failed")
+            status, message = 'failed', f"Error: {e}"
+        values = dict(status=status, finished_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+        if message is not None:
+            values['message'] = str(message)[:500]
+        if ctx.result:
+            values['result_name'], values['result_mimetype'] = ctx.result
+        db.session.execute(update(Job).where(Job.id == ctx.job_id).values(**values))
+        db.session.commit()
+
+# --- Maintenance ---
+def prune_jobs(days=None):
+    """Delete finished jobs older than `days` (JOB_RETENTION_DAYS) and their result files. Commits."""
+    days = current_app.config['JOB_RETENTION_DAYS'] if days is None else days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    old = Job.query.filter(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff).all()
+    for job in old:
+        shutil.rmtree(result_folder(job.id), ignore_errors=True)
+        db.session.delete(job)
+    db.session.commit()
+    return len(old)
+
+def init_jobs(app):
+    runner = JobRunner(app)
+    app.extensions['jobs'] = runner
+    app.before_request(runner.ensure_started)
@@ -0,0 +1,29 @@
+# Path: app/loading.py
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from app.models import Asset, AssetHistory, Employee
+
+# --- Loading Strategies ---
+# Every relationship in models.py is lazy=True, which is right for single-object
+# pages but turns list pages into 1 + N queries. Each list view picks one of
+# these option sets instead so its query count does not grow with the rows shown;
+# tests/test_query_budget.py holds each page to a fixed statement budget.
+# (Functions rather than constants: backref attributes such as Asset.branch
+# only exist once the mappers are configured.)
+
+def asset_rows_joined():
+    """For asset queries that already outer-join Branch and Employee."""
+    return (contains_eager(Asset.branch), contains_eager(Asset.holder))
+
+def asset_rows():
+    return (joinedload(Asset.branch), joinedload(Asset.holder))
+
+def employee_rows_joined():
+    """For employee queries that already outer-join Branch."""
+    return (contains_eager(Employee.branch), selectinload(Employee.assets_holding))
+
+def history_with_asset():
+    return (joinedload(AssetHistory.asset),)
+
+def history_with_joined_asset():
+    """For history queries that already join Asset."""
+    return (contains_eager(AssetHistory.asset),)
@@ -5,7 +5,8 @@ from app.extensions import db, login_manager
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    from app.cache import cached_user  # app.cache imports these models
+    return cached_user(int(user_id))
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -27,6 +28,10 @@ class Employee(db.Model):
     status = db.Column(db.String(20), default='Active')
     branch_id = db.Column(db.Integer, db.ForeignKey('branch.id'), nullable=True)
     assets_holding = db.relationship('Asset', backref='holder', lazy=True)
+    __table_args__ = (
+        db.Index('ix_employee_status', 'status', 'branch_id'),  # active list, allocation dropdowns
+        db.Index('ix_employee_branch', 'branch_id'),
+    )
 
 class Asset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -37,10 +42,17 @@ class Asset(db.Model):
     status = db.Column(db.String(50), default='In Stock')
     current_branch_id = db.Column(db.Integer, db.ForeignKey('branch.id'), nullable=True)
     current_employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=True)
+    allocated_at = db.Column(db.DateTime, nullable=True)  # When the current holder got it
     history = db.relationship('AssetHistory', backref='asset', lazy=True, order_by="desc(AssetHistory.timestamp)")
     
     qr_code_hash = db.Column(db.String(64), unique=True, nullable=True)
     is_qr_active = db.Column(db.Boolean, default=True)
+    version = db.Column(db.Integer, default=1, nullable=False)  # Bumped on every change (app/cache.py)
+    __table_args__ = (
+        db.Index('ix_asset_status', 'status', 'current_branch_id'),  # list/QR filters, stats rebuild
+        db.Index('ix_asset_branch', 'current_branch_id', 'status'),
+        db.Index('ix_asset_employee', 'current_employee_id'),  # holder's assets, employee detail
+    )
 
 class AssetHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -56,6 +68,21 @@ class AssetHistory(db.Model):
     post_action_status = db.Column(db.String(50))
     post_action_branch_id = db.Column(db.Integer)
     post_action_employee_id = db.Column(db.Integer)
+    # Structured from/to parties (the *_detail columns are display text only)
+    from_employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    to_employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    from_branch_id = db.Column(db.Integer, db.ForeignKey('branch.id'))
+    to_branch_id = db.Column(db.Integer, db.ForeignKey('branch.id'))
+    __table_args__ = (
+        db.Index('ix_asset_history_from_employee', 'from_employee_id', 'timestamp'),
+        db.Index('ix_asset_history_to_employee', 'to_employee_id', 'timestamp'),
+        db.Index('ix_asset_history_from_branch', 'from_branch_id', 'timestamp'),
+        db.Index('ix_asset_history_to_branch', 'to_branch_id', 'timestamp'),
+        db.Index('ix_asset_history_asset', 'asset_id', 'timestamp'),  # asset timeline, revert
+        db.Index('ix_asset_history_timestamp', 'timestamp'),  # dashboard activity, transactions
+        db.Index('ix_asset_history_action', 'action', 'timestamp'),
+        db.Index('ix_asset_history_user', 'created_by_user_id', 'timestamp'),
+    )
 
 class PreGeneratedQR(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -63,6 +90,7 @@ class PreGeneratedQR(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id')) 
     status = db.Column(db.String(20), default='Available') 
+    __table_args__ = (db.Index('ix_pre_generated_qr_status', 'status', 'created_at'),)
 
 class ScanLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -71,8 +99,93 @@ class ScanLog(db.Model):
     ip_address = db.Column(db.String(50))
     user_agent = db.Column(db.String(200))
     linked_asset_id = db.Column(db.Integer, nullable=True)
+    __table_args__ = (
+        db.Index('ix_scan_log_timestamp', 'timestamp'),  # scan history, newest first
+        db.Index('ix_scan_log_asset', 'linked_asset_id', 'timestamp'),
+        db.Index('ix_scan_log_hash', 'qr_hash', 'timestamp'),
+    )
 
 class SystemSetting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False)
-    value = db.Column(db.String(200))
\ No newline at end of file
+    value = db.Column(db.String(200))
+
+class FleetStat(db.Model):
+    # Running asset count per (status, branch), maintained by app/stats.py
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(50))
+    branch_id = db.Column(db.Integer, default=0, nullable=False)  # 0: no branch
+    count = db.Column(db.Integer, default=0, nullable=False)
+    __table_args__ = (db.UniqueConstraint('status', 'branch_id'),)
+
+class DataVersion(db.Model):
+    # Row 1 is bumped once per commit that changes assets, history, employees
+    # or branches (app/cache.py); the JSON API derives ETag/Last-Modified from it.
+    # Row 2 is bumped when a login account changes (cached current_user).
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    modified_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class FleetSnapshot(db.Model):
+    # Every asset's state at taken_at (a month start), rebuilt from history by
+    # app/snapshots.py so "as of" queries only replay events after it
+    id = db.Column(db.Integer, primary_key=True)
+    taken_at = db.Column(db.DateTime, unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    asset_count = db.Column(db.Integer, default=0, nullable=False)
+
+class AssetSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('fleet_snapshot.id'), nullable=False)
+    asset_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(50))
+    branch_id = db.Column(db.Integer)
+    employee_id = db.Column(db.Integer)
+    __table_args__ = (db.UniqueConstraint('snapshot_id', 'asset_id'),)
+
+class ScanRollup(db.Model):
+    # Scans per (QR hash, linked asset) per hour/day, kept up to date by the scan
+    # log writer (app/scan_stats.py); outlives the raw rows the retention job archives
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(4), nullable=False)  # 'hour' | 'day'
+    bucket = db.Column(db.DateTime, nullable=False)  # start of the hour/day (UTC)
+    qr_hash = db.Column(db.String(64), nullable=False)
+    linked_asset_id = db.Column(db.Integer, default=0, nullable=False)  # 0: sticker not linked
+    count = db.Column(db.Integer, default=0, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('period', 'bucket', 'qr_hash', 'linked_asset_id'),
+        db.Index('ix_scan_rollup_asset', 'period', 'bucket', 'linked_asset_id'),
+    )
+
+class StoredDocument(db.Model):
+    # One uploaded proof file per distinct content, stored under its SHA-256
+    # (app/documents.py); ref_count = AssetHistory rows whose document_path is it
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(200), unique=True, nullable=False)  # relative to UPLOAD_FOLDER
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Job(db.Model):
+    # Long-running work (exports, imports, sticker batches) queued from the web
+    # UI and run by the background job runner (app/jobs.py)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued | running | done | failed
+    params = db.Column(db.Text)  # JSON
+    base_url = db.Column(db.String(200))  # of the submitting request, for url_for(_external=True)
+    progress = db.Column(db.Integer, default=0, nullable=False)
+    total = db.Column(db.Integer)
+    message = db.Column(db.String(500))
+    result_name = db.Column(db.String(200))
+    result_mimetype = db.Column(db.String(100))
+    created_by_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index('ix_job_status', 'status', 'id'),  # the runner's queue
+        db.Index('ix_job_user', 'created_by_user_id', 'id'),
+    )
@@ -0,0 +1,71 @@
+# Path: app/pagination.py
+import base64
+import json
+from datetime import datetime, time
+from sqlalchemy import and_, or_
+from app.cache import count_cache
+
+# --- Keyset (seek) pagination helpers ---
+# Pages are addressed by the sort key of the last row already shown instead of
+# an OFFSET, so fetching page N costs the same as fetching page 1.
+
+def encode_cursor(*values):
+    raw = json.dumps(list(values), default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, *types):
+    """Decode a cursor; `types` optionally converts each value back (e.g. datetime.fromisoformat)."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list):
+            return None
+        if types:
+            values = [convert(v) for convert, v in zip(types, values)]
+    except (ValueError, TypeError):
+        return None
+    return values
+
+def seek(query, columns, cursor=None, descending=False):
+    """Order `query` by `columns` and skip everything up to `cursor`.
+
+    The last column must be unique (normally the primary key) so that rows
+    sharing the same leading sort value are never skipped or repeated.
+    """
+    if cursor is not None and len(cursor) == len(columns):
+        clauses = []
+        for i, col in enumerate(columns):
+            step = col < cursor[i] if descending else col > cursor[i]
+            ties = [c == v for c, v in zip(columns[:i], cursor[:i])]
+            clauses.append(and_(*ties, step))
+        query = query.filter(or_(*clauses))
+    return query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+
+def fetch_page(query, per_page):
+    """Return (rows, has_more) using a single LIMIT per_page + 1 query."""
+    rows = query.limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+def day_range(column, start=None, end=None):
+    """Filters keeping `column` within the YYYY-MM-DD days given (blank or invalid = open)."""
+    filters = []
+    for value, bound, check in ((start, time.min, column.__ge__), (end, time.max, column.__le__)):
+        try:
+            filters.append(check(datetime.combine(datetime.strptime(value or '', '%Y-%m-%d').date(), bound)))
+        except ValueError:
+            pass
+    return filters
+
+def cached_total(key, count_query):
+    """Result of `count_query` (a COUNT), reused for a minute per worker.
+
+    Log pages show it as an approximate total so a page view doesn't pay for
+    a COUNT over millions of rows each time.
+    """
+    total = count_cache.get(key)
+    if total is None:
+        total = count_query.scalar() or 0
+        count_cache.set(key, total)
+    return total
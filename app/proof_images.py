@@ -0,0 +1,92 @@
+# Path: app/proof_images.py
+import io
+import os
+import uuid
+from PIL import Image, ImageOps
+from app.documents import is_stored
+from app.workers import BackgroundWorker
+
+# --- Proof image renditions ---
+# Staff attach full-resolution phone photos of courier slips. After save_proof
+# stores a JPEG/PNG, a background thread writes two JPEG renditions next to it:
+#   <stored path>.display.jpg  - longest side PROOF_DISPLAY_SIZE, for viewing
+#   <stored path>.thumb.jpg    - longest side PROOF_THUMB_SIZE, for history lists
+# The display rendition is skipped when it would not be smaller than the
+# original. The original is kept untouched as the evidential copy; it goes,
+# renditions included, with its last reference (app/documents.py).
+#
+# Until a rendition exists /assets/documents/<path>?size=... serves the
+# original, so a restart that drops the queue only costs page weight;
+# `flask proof-images` renders whatever is missing.
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png'}
+RENDITION_QUALITY = {'display': 80, 'thumb': 70}  # JPEG quality
+
+def is_image(path):
+    return is_stored(path) and path.rsplit('.', 1)[-1] in IMAGE_EXTENSIONS
+
+def rendition_path(path, size):
+    return f"{path}.{size}.jpg"
+
+def _flatten(image):
+    """RGB copy of any Pillow image, transparency composited onto white."""
+    if image.mode in ('RGB', 'L'):
+        return image.convert('RGB')
+    rgba = image.convert('RGBA')
+    background = Image.new('RGB', rgba.size, 'white')
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    return background
+
+def render_renditions(folder, path, sizes):
+    """Write the missing renditions of one stored image. Returns how many were written."""
+    source = os.path.join(folder, path)
+    wanted = [(name, sizes[name], quality) for name, quality in RENDITION_QUALITY.items()
+              if not os.path.exists(os.path.join(folder, rendition_path(path, name)))]
+    if not wanted:
+        return 0
+    written = 0
+    with Image.open(source) as image:
+        image.draft('RGB', (sizes['display'], sizes['display']))  # JPEG: decode at a reduced scale
+        image = _flatten(ImageOps.exif_transpose(image))
+    for name, side, quality in wanted:
+        copy = image.copy()
+        copy.thumbnail((side, side), Image.LANCZOS)
+        buf = io.BytesIO()
+        copy.save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+        if name == 'display' and buf.tell() >= os.path.getsize(source):
+            continue
+        target = os.path.join(folder, rendition_path(path, name))
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'wb') as out:
+            out.write(buf.getvalue())
+        os.replace(tmp, target)
+        written += 1
+    return written
+
+class ProofImageWorker(BackgroundWorker):
+    name = 'proof-images'
+
+    def __init__(self, app):
+        super().__init__(app, run_async=app.config.get('PROOF_IMAGES_ASYNC', True))
+        self.folder = app.config['UPLOAD_FOLDER']
+        self.sizes = {'display': app.config.get('PROOF_DISPLAY_SIZE', 1600),
+                      'thumb': app.config.get('PROOF_THUMB_SIZE', 320)}
+
+    def submit(self, path):
+        """Queue renditions for a stored document (ignored unless it is a JPEG/PNG)."""
+        if not is_image(path):
+            return False
+        self.put(path)
+        return True
+
+    def handle(self, paths):
+        for path in paths:
+            try:
+                render_renditions(self.folder, path, self.sizes)
+            except Exception:
+                # Unreadable or oversized image: the original is still served
+                self.app.logger.exception(f"Failed to render proof image {path}")
+
+def init_proof_images(app):
+    app.extensions['proof_images'] = ProofImageWorker(app)
+    app.add_template_test(is_image, 'proof_image')  # {% if event.document_path is proof_image %}
@@ -0,0 +1,191 @@
+# Path: app/qr_images.py
+import base64
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import qrcode
+from flask import current_app
+from app.cache import TTLCache
+
+# --- Rendered QR image cache ---
+# A scan URL never changes for a given hash, so the image for it only has to be
+# built once. Images are content-addressed by sha256(url + render params) and
+# kept in a bounded in-memory LRU backed by files under
+# QR_CACHE_FOLDER/<qr_hash>/, so reprinting a sheet reads them back instead of
+# re-rendering. forget_qr() drops everything cached for a hash.
+#
+# Formats:
+#   png  - box_size px per module (the original sticker image)
+#   png1 - 1-bit PNG, one pixel per module; the sheet scales it up with
+#          image-rendering: pixelated, so it prints just as sharp
+#   svg  - inline <svg> with one stroked path, each horizontal run of dark
+#          modules drawn as a single line
+#   pdf  - the same runs as PDF path operators, for app/sticker_pdf.py
+
+FORMATS = {'png': 'png', 'png1': 'png', 'svg': 'svg', 'pdf': 'ops'}  # format -> file extension
+
+qr_png_cache = TTLCache(ttl=None, maxsize=1024)
+
+def _digest(url, params):
+    raw = json.dumps([url, sorted(params.items())], separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _cache_dir(qr_hash):
+    return os.path.join(current_app.config['QR_CACHE_FOLDER'], qr_hash or '_')
+
+def _matrix(url, border):
+    qr = qrcode.QRCode(border=border)
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+def _runs(matrix):
+    """(y, x, length) for each horizontal run of dark modules, row by row."""
+    size = len(matrix)
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                yield y, start, x - start
+            x += 1
+
+def _svg(matrix):
+    size = len(matrix)
+    parts, line, pen = [], None, 0
+    for y, x, length in _runs(matrix):
+        # absolute move for a row's first run, relative after that
+        parts.append(f"M{x} {y}.5h{length}" if y != line else f"m{x - pen} 0h{length}")
+        line, pen = y, x + length
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="#fff"/><path stroke="#000" d="{"".join(parts)}"/></svg>')
+
+def _pdf_ops(matrix):
+    # First line is the module count; the rest are PDF rectangles in module units, y down
+    ops = ' '.join(f"{x} {y} {length} 1 re" for y, x, length in _runs(matrix))
+    return f"{len(matrix)}\n{ops}"
+
+def render_qr(url, fmt='png', box_size=10, border=1):
+    """Render `url` as image bytes. Module-level so a process pool can call it."""
+    if fmt == 'svg':
+        return _svg(_matrix(url, border)).encode('utf-8')
+    if fmt == 'pdf':
+        return _pdf_ops(_matrix(url, border)).encode('ascii')
+    qr = qrcode.QRCode(box_size=1 if fmt == 'png1' else box_size, border=border)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill='black', back_color='white')
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=fmt == 'png1')
+    return buffer.getvalue()
+
+def _render_args(args):
+    url, params = args
+    return render_qr(url, **params)
+
+def _cached(qr_hash, digest, ext):
+    key = (qr_hash, digest)
+    data = qr_png_cache.get(key)
+    if data is not None:
+        return data
+    try:
+        with open(os.path.join(_cache_dir(qr_hash), f"{digest}.{ext}"), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    qr_png_cache.set(key, data)
+    return data
+
+def _store(qr_hash, digest, ext, data):
+    qr_png_cache.set((qr_hash, digest), data)
+    path = os.path.join(_cache_dir(qr_hash), f"{digest}.{ext}")
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        current_app.logger.warning(f"Could not cache QR image {path}: {e}")
+
+# --- Parallel rendering ---
+# Cache misses beyond QR_PARALLEL_THRESHOLD are rendered in a process pool
+# (one per worker process, created on first use) instead of serially in the
+# request thread.
+
+_pool = None
+_pool_pid = None
+
+def _render_pool():
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        workers = current_app.config.get('QR_RENDER_WORKERS') or os.cpu_count() or 1
+        if workers < 2:
+            return None
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        _pool_pid = os.getpid()
+    return _pool
+
+def _discard_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def qr_images(items, fmt='png', **params):
+    """Image bytes for each (qr_hash, url) in `items`, in order."""
+    params = dict(params, fmt=fmt)
+    if fmt != 'png':
+        params.pop('box_size', None)
+    ext = FORMATS[fmt]
+    keys = [(qr_hash, url, _digest(url, params)) for qr_hash, url in items]
+    results = [_cached(qr_hash, digest, ext) for qr_hash, url, digest in keys]
+    missing = [i for i, data in enumerate(results) if data is None]
+    if not missing:
+        return results
+
+    jobs = [(keys[i][1], params) for i in missing]
+    rendered = None
+    pool = _render_pool() if len(jobs) >= current_app.config.get('QR_PARALLEL_THRESHOLD', 64) else None
+    if pool is not None:
+        try:
+            rendered = list(pool.map(_render_args, jobs, chunksize=16))
+        except Exception as e:  # BrokenProcessPool, OSError, ... - render inline instead
+            _discard_pool()
+            current_app.logger.warning(f"Parallel QR rendering failed, rendering serially: {e}")
+    if rendered is None:
+        rendered = [_render_args(job) for job in jobs]
+
+    for i, data in zip(missing, rendered):
+        qr_hash, url, digest = keys[i]
+        _store(qr_hash, digest, ext, data)
+        results[i] = data
+    return results
+
+def sticker_image(fmt, data):
+    """Template payload for one rendered image: inline SVG markup or a data: URI."""
+    if fmt == 'svg':
+        return {'svg': data.decode('utf-8')}
+    return {'img': base64.b64encode(data).decode()}
+
+def forget_qr(qr_hash):
+    """Evict every cached image for `qr_hash` (call when a hash is reset or moved)."""
+    if not qr_hash:
+        return
+    qr_png_cache.pop_where(lambda key: key[0] == qr_hash)
+    folder = _cache_dir(qr_hash)
+    if os.path.isdir(folder):
+        for name in os.listdir(folder):
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
@@ -4,8 +4,14 @@ import uuid
 from datetime import datetime
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import func
 from app.extensions import db
-from app.models import AssetHistory, Asset, SystemSetting
+from app.models import AssetHistory, Asset, SystemSetting, User
+from app.loading import history_with_asset
+from app.cache import scan_flag_cache
+from app.pagination import encode_cursor, decode_cursor, seek, fetch_page, day_range, cached_total
+from app.qr_images import forget_qr
+from app.documents import is_stored, release_reference, remove_unused
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -15,12 +21,41 @@ def restrict_to_admin():
         flash('Access Denied: Admin privileges required.', 'error')
         return redirect(url_for('main.dashboard'))
 
+TRANSACTION_PAGE_SIZE = 20
+
+# Actions log_history / the bulk actions / the QR routes write, for the filter
+HISTORY_ACTIONS = ['Purchase', 'Allocation', 'Return', 'Transfer Initiated', 'Transfer Received',
+                   'Sent to Repair', 'Repair Completed', 'Retired/Scrapped',
+                   'QR Assigned', 'QR Unassigned', 'QR Linked', 'QR Reset']
+
 @admin_bp.route('/transactions')
 @login_required
 def transactions():
-    page = request.args.get('page', 1, type=int)
-    history = AssetHistory.query.order_by(AssetHistory.timestamp.desc()).paginate(page=page, per_page=20)
-    return render_template('admin/transactions.html', history=history)
+    # Newest first, paged by a (timestamp, id) cursor; every filter has an
+    # index that leads with it and ends in timestamp (models.AssetHistory)
+    filters = dict((k, request.args.get(k, '').strip()) for k in ('action', 'user_id', 'serial', 'start', 'end'))
+    conditions = day_range(AssetHistory.timestamp, filters['start'], filters['end'])
+    if filters['action']:
+        conditions.append(AssetHistory.action == filters['action'])
+    if filters['user_id'].isdigit():
+        conditions.append(AssetHistory.created_by_user_id == int(filters['user_id']))
+    if filters['serial']:
+        asset_id = db.session.query(Asset.id).filter(Asset.serial_number == filters['serial']).scalar()
+        conditions.append(AssetHistory.asset_id == (asset_id or 0))
+
+    cursor = decode_cursor(request.args.get('cursor'), datetime.fromisoformat, int)
+    query = AssetHistory.query.options(*history_with_asset()).filter(*conditions)
+    query = seek(query, [AssetHistory.timestamp, AssetHistory.id], cursor, descending=True)
+    history, has_more = fetch_page(query, TRANSACTION_PAGE_SIZE)
+    next_cursor = encode_cursor(history[-1].timestamp.isoformat(), history[-1].id) if has_more else None
+
+    total = cached_total(('transactions',) + tuple(sorted(filters.items())),
+                         db.session.query(func.count(AssetHistory.id)).filter(*conditions))
+    users = User.query.order_by(User.name).all()
+    return render_template('admin/transactions.html', history=history, next_cursor=next_cursor,
+                           is_first_page=cursor is None, total=total, filters=filters,
+                           filter_args=dict((k, v) for k, v in filters.items() if v),
+                           actions=HISTORY_ACTIONS, users=users)
 
 @admin_bp.route('/transaction/<int:history_id>/revert', methods=['POST'])
 @login_required
@@ -41,16 +76,26 @@ def revert_transaction(history_id):
             asset.status = previous_txn.post_action_status
             asset.current_branch_id = previous_txn.post_action_branch_id
             asset.current_employee_id = previous_txn.post_action_employee_id
+        if asset.current_employee_id:
+            last_alloc = AssetHistory.query.filter(AssetHistory.asset_id == asset.id, AssetHistory.action == 'Allocation',
+                                                   AssetHistory.id != target_txn.id)\
+                .order_by(AssetHistory.timestamp.desc()).first()
+            asset.allocated_at = last_alloc.timestamp if last_alloc else None
+        else:
+            asset.allocated_at = None
     else:
         db.session.delete(asset)
         return redirect(url_for('admin.transactions'))
 
-    if target_txn.document_path:
-        try: os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], target_txn.document_path))
-        except: pass 
-    
+    document = target_txn.document_path
+    unused = release_reference(document)
     db.session.delete(target_txn)
     db.session.commit()
+    if unused:
+        remove_unused(document)
+    elif document and not is_stored(document):
+        try: os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], document))  # pre-store upload
+        except: pass
     flash('Transaction reverted.', 'success')
     return redirect(request.referrer)
 
@@ -60,9 +105,10 @@ def reset_qr_hash(asset_id):
     asset = Asset.query.get_or_404(asset_id)
     old_hash = asset.qr_code_hash
     asset.qr_code_hash = uuid.uuid4().hex
-    hist = AssetHistory(asset_id=asset.id, action="QR Reset", from_detail=f"Old: {old_hash[:8] if old_hash else 'None'}...", to_detail="New Hash", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=asset.status)
+    hist = AssetHistory(asset_id=asset.id, action="QR Reset", from_detail=f"Old: {old_hash[:8] if old_hash else 'None'}...", to_detail="New Hash", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=asset.status, post_action_branch_id=asset.current_branch_id, post_action_employee_id=asset.current_employee_id)
     db.session.add(hist)
     db.session.commit()
+    forget_qr(old_hash)
     flash('QR Reset.', 'success')
     return redirect(url_for('assets.detail', asset_id=asset_id))
 
@@ -81,11 +127,12 @@ def reassign_qr(asset_id):
     source_asset.qr_code_hash = None 
     target_asset.qr_code_hash = qr_to_move 
     
-    h1 = AssetHistory(asset_id=source_asset.id, action="QR Unassigned", to_detail="Moved", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=source_asset.status)
-    h2 = AssetHistory(asset_id=target_asset.id, action="QR Assigned", from_detail=f"From {source_asset.serial_number}", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=target_asset.status)
+    h1 = AssetHistory(asset_id=source_asset.id, action="QR Unassigned", to_detail="Moved", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=source_asset.status, post_action_branch_id=source_asset.current_branch_id, post_action_employee_id=source_asset.current_employee_id)
+    h2 = AssetHistory(asset_id=target_asset.id, action="QR Assigned", from_detail=f"From {source_asset.serial_number}", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=target_asset.status, post_action_branch_id=target_asset.current_branch_id, post_action_employee_id=target_asset.current_employee_id)
     
     db.session.add_all([h1, h2])
     db.session.commit()
+    forget_qr(qr_to_move)
     flash('QR Moved.', 'success')
     return redirect(url_for('assets.detail', asset_id=target_asset.id))
 
@@ -102,6 +149,7 @@ def toggle_global_scan():
     new_val = '0' if setting.value == '1' else '1'
     setting.value = new_val
     db.session.commit()
+    scan_flag_cache.clear()  # other workers pick it up when their TTL lapses
     
     status = "ENABLED" if new_val == '1' else "DISABLED"
     flash(f'Global QR Scanning is now {status}', 'success' if new_val == '1' else 'warning')
@@ -0,0 +1,208 @@
+# Path: app/routes/api.py
+from flask import Blueprint, request, jsonify, make_response
+from flask_login import login_required
+from sqlalchemy import or_
+from sqlalchemy.orm import aliased
+from app.extensions import db
+from app.models import Asset, AssetHistory, Branch, Employee
+from app.pagination import encode_cursor, decode_cursor, seek, fetch_page
+from app.cache import data_version
+
+api_bp = Blueprint('api', __name__)
+
+# --- Read-only JSON API (v1) ---
+# Every list is keyset-paged on the primary key (?cursor=&limit=) and supports
+# ?fields=a,b,c to return only some columns. Responses carry an ETag and
+# Last-Modified from the global data version (app/cache.py); a client that
+# sends them back gets 304 Not Modified without any list query being run.
+
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+HolderEmployee = aliased(Employee)
+HolderBranch = aliased(Branch)
+
+# name -> column; *_name fields come from the outer-joined branch/holder
+ASSET_FIELDS = {
+    'id': Asset.id,
+    'serial_number': Asset.serial_number,
+    'brand': Asset.brand,
+    'model': Asset.model,
+    'status': Asset.status,
+    'purchase_date': Asset.purchase_date,
+    'branch_id': Asset.current_branch_id,
+    'branch_name': HolderBranch.name,
+    'employee_id': Asset.current_employee_id,
+    'employee_name': HolderEmployee.name,
+    'allocated_at': Asset.allocated_at,
+    'qr_active': Asset.is_qr_active,
+    'version': Asset.version,
+}
+EMPLOYEE_FIELDS = {
+    'id': Employee.id,
+    'emp_id': Employee.emp_id,
+    'name': Employee.name,
+    'status': Employee.status,
+    'branch_id': Employee.branch_id,
+    'branch_name': Branch.name,
+}
+BRANCH_FIELDS = {
+    'id': Branch.id,
+    'name': Branch.name,
+    'location': Branch.location,
+}
+HISTORY_FIELDS = {
+    'id': AssetHistory.id,
+    'asset_id': AssetHistory.asset_id,
+    'action': AssetHistory.action,
+    'timestamp': AssetHistory.timestamp,
+    'from_detail': AssetHistory.from_detail,
+    'to_detail': AssetHistory.to_detail,
+    'from_employee_id': AssetHistory.from_employee_id,
+    'to_employee_id': AssetHistory.to_employee_id,
+    'from_branch_id': AssetHistory.from_branch_id,
+    'to_branch_id': AssetHistory.to_branch_id,
+    'courier_details': AssetHistory.courier_details,
+    'notes': AssetHistory.notes,
+    'status': AssetHistory.post_action_status,
+    'branch_id': AssetHistory.post_action_branch_id,
+    'employee_id': AssetHistory.post_action_employee_id,
+    'created_by_user_id': AssetHistory.created_by_user_id,
+}
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@api_bp.errorhandler(ApiError)
+def api_error(e):
+    return jsonify({'success': False, 'message': e.message}), e.status
+
+# --- HELPER: Conditional GET ---
+def _http_date(value):
+    return value.replace(microsecond=0)
+
+def not_modified(version, modified_at):
+    """True when the client's validators show it already has this version."""
+    etag = f'v{version}'
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return since is not None and _http_date(modified_at) <= since.replace(tzinfo=None)
+
+def versioned(payload_fn):
+    """Run payload_fn() and wrap it in a JSON response, or answer 304 if unchanged."""
+    version, modified_at = data_version()
+    if not_modified(version, modified_at):
+        response = make_response('', 304)
+    else:
+        payload = payload_fn()
+        payload['version'] = version
+        response = jsonify(payload)
+    response.set_etag(f'v{version}')
+    response.last_modified = _http_date(modified_at)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# --- HELPER: Field selection and paging ---
+def _fields(available):
+    requested = [f.strip() for f in (request.args.get('fields') or '').split(',') if f.strip()]
+    if not requested:
+        return list(available)
+    unknown = [f for f in requested if f not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(available)}")
+    return ['id'] + [f for f in requested if f != 'id']
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _int_arg(name):
+    value = request.args.get(name)
+    if value in (None, ''):
+        return None
+    if not value.lstrip('-').isdigit():
+        raise ApiError(f"'{name}' must be an integer")
+    return int(value)
+
+def _page(query, available, id_column):
+    fields = _fields(available)
+    limit = min(max(request.args.get('limit', API_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+    cursor = decode_cursor(request.args.get('cursor'))
+    query = query.with_entities(*[available[f].label(f) for f in fields])
+    rows, has_more = fetch_page(seek(query, [id_column], cursor), limit)
+    data = [dict((f, _json_value(v)) for f, v in zip(fields, row)) for row in rows]
+    # last_cursor is always set (once anything was seen) so a poller can resume
+    # from it later and only receive rows added since
+    last_cursor = encode_cursor(rows[-1][0]) if rows else request.args.get('cursor')
+    return {'data': data, 'next_cursor': last_cursor if has_more else None, 'last_cursor': last_cursor}
+
+# --- ENDPOINTS ---
+@api_bp.route('/assets')
+@login_required
+def assets():
+    def payload():
+        query = db.session.query(Asset)\
+            .outerjoin(HolderBranch, Asset.current_branch_id == HolderBranch.id)\
+            .outerjoin(HolderEmployee, Asset.current_employee_id == HolderEmployee.id)
+        if request.args.get('status'):
+            query = query.filter(Asset.status == request.args['status'])
+        if _int_arg('branch_id') is not None:
+            query = query.filter(Asset.current_branch_id == _int_arg('branch_id'))
+        if _int_arg('employee_id') is not None:
+            query = query.filter(Asset.current_employee_id == _int_arg('employee_id'))
+        if request.args.get('serial'):
+            query = query.filter(Asset.serial_number == request.args['serial'])
+        return _page(query, ASSET_FIELDS, Asset.id)
+    return versioned(payload)
+
+@api_bp.route('/assets/<int:asset_id>')
+@login_required
+def asset(asset_id):
+    def payload():
+        query = db.session.query(Asset)\
+            .outerjoin(HolderBranch, Asset.current_branch_id == HolderBranch.id)\
+            .outerjoin(HolderEmployee, Asset.current_employee_id == HolderEmployee.id)\
+            .filter(Asset.id == asset_id)
+        fields = _fields(ASSET_FIELDS)
+        row = query.with_entities(*[ASSET_FIELDS[f].label(f) for f in fields]).first()
+        if row is None:
+            raise ApiError('Asset not found', 404)
+        return {'data': dict((f, _json_value(v)) for f, v in zip(fields, row))}
+    return versioned(payload)
+
+@api_bp.route('/employees')
+@login_required
+def employees():
+    def payload():
+        query = db.session.query(Employee).outerjoin(Branch, Employee.branch_id == Branch.id)
+        if request.args.get('status'):
+            query = query.filter(Employee.status == request.args['status'])
+        if _int_arg('branch_id') is not None:
+            query = query.filter(Employee.branch_id == _int_arg('branch_id'))
+        return _page(query, EMPLOYEE_FIELDS, Employee.id)
+    return versioned(payload)
+
+@api_bp.route('/branches')
+@login_required
+def branches():
+    return versioned(lambda: _page(db.session.query(Branch), BRANCH_FIELDS, Branch.id))
+
+@api_bp.route('/history')
+@login_required
+def history():
+    """Oldest first, so a poller can keep its last cursor and fetch only newer rows."""
+    def payload():
+        query = db.session.query(AssetHistory)
+        if _int_arg('asset_id') is not None:
+            query = query.filter(AssetHistory.asset_id == _int_arg('asset_id'))
+        employee_id = _int_arg('employee_id')
+        if employee_id is not None:
+            query = query.filter(or_(AssetHistory.from_employee_id == employee_id,
+                                     AssetHistory.to_employee_id == employee_id))
+        if request.args.get('action'):
+            query = query.filter(AssetHistory.action == request.args['action'])
+        return _page(query, HISTORY_FIELDS, AssetHistory.id)
+    return versioned(payload)
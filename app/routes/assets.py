@@ -1,14 +1,20 @@
 import os
-import uuid
-import io
 import csv
 from datetime import datetime
+from types import SimpleNamespace
 from werkzeug.utils import secure_filename
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context, send_from_directory
 from flask_login import login_required, current_user
-from sqlalchemy import or_, desc, asc
+from sqlalchemy import func, insert, or_
 from app.extensions import db
 from app.models import Asset, Branch, Employee, AssetHistory
+from app.pagination import encode_cursor, decode_cursor, seek, fetch_page
+from app.loading import asset_rows, asset_rows_joined, history_with_joined_asset
+from app.search import filter_assets
+from app.snapshots import parse_as_of, asset_states
+from app.documents import store_upload, add_references, stored_sha256
+from app.proof_images import RENDITION_QUALITY, is_image, rendition_path
+from app.jobs import submit_job, job_handler
 
 assets_bp = Blueprint('assets', __name__)
 
@@ -18,16 +24,48 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 def save_proof(file_obj):
+    """Store an upload once per content (app/documents.py); returns its StoredFile or None.
+    The history rows that record its path must be counted with add_references."""
     if file_obj and allowed_file(file_obj.filename):
         filename = secure_filename(file_obj.filename)
-        unique_name = f"proof_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8]}.{filename.rsplit('.', 1)[1].lower()}"
-        file_obj.save(os.path.join(current_app.config['UPLOAD_FOLDER'], unique_name))
-        return unique_name
+        proof = store_upload(file_obj, filename.rsplit('.', 1)[1].lower())
+        current_app.extensions['proof_images'].submit(proof.path)  # display copy + thumbnail, off-request
+        return proof
     return None
 
+# Proof downloads: conditional GETs and Range requests are answered by
+# send_from_directory. Stored files never change under their content-hash
+# name, so the hash is a strong ETag and browsers may keep them for a year.
+# ?size=display|thumb serves a photo's rendition (app/proof_images.py), or the
+# original, briefly cacheable, while the rendition is still being made.
+DOCUMENT_MAX_AGE = 365 * 24 * 3600
+
+@assets_bp.route('/documents/<path:document_path>')
+@login_required
+def document(document_path):
+    sha256 = stored_sha256(document_path)
+    size = request.args.get('size')
+    max_age = DOCUMENT_MAX_AGE if sha256 else None
+    if size in RENDITION_QUALITY and is_image(document_path):
+        folder = current_app.config['UPLOAD_FOLDER']
+        rendition = rendition_path(document_path, size)
+        if os.path.exists(os.path.join(folder, rendition)):
+            document_path, sha256 = rendition, f"{sha256}-{size}"
+        elif not os.path.exists(os.path.join(folder, rendition_path(document_path, 'thumb'))):
+            max_age = 0  # not rendered yet (a display copy is skipped when it would not be smaller)
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], document_path,
+                                   etag=sha256 or True, max_age=max_age)
+    response.cache_control.public = False  # behind the login
+    response.cache_control.private = True
+    if max_age:
+        response.cache_control.immutable = True
+    return response
+
 # --- HELPER: Log History ---
-def log_history(asset, action, from_d, to_d, courier="", notes="", doc_path=None):
-    history = AssetHistory(
+def history_row(asset, action, from_d, to_d, courier="", notes="", doc_path=None,
+                from_emp=None, to_emp=None, from_branch=None, to_branch=None, timestamp=None):
+    """Column values for one AssetHistory row describing `asset` after `action`."""
+    return dict(
         asset_id=asset.id,
         action=action,
         from_detail=from_d,
@@ -36,12 +74,23 @@ def log_history(asset, action, from_d, to_d, courier="", notes="", doc_path=None
         notes=notes,
         document_path=doc_path,
         created_by_user_id=current_user.id,
-        timestamp=datetime.now(),
+        timestamp=timestamp or datetime.now(),
         post_action_status=asset.status,
         post_action_branch_id=asset.current_branch_id,
-        post_action_employee_id=asset.current_employee_id
+        post_action_employee_id=asset.current_employee_id,
+        from_employee_id=from_emp,
+        to_employee_id=to_emp,
+        from_branch_id=from_branch,
+        to_branch_id=to_branch
     )
+
+def log_history(asset, action, from_d, to_d, courier="", notes="", proof=None,
+                from_emp=None, to_emp=None, from_branch=None, to_branch=None):
+    history = AssetHistory(**history_row(asset, action, from_d, to_d, courier, notes, proof.path if proof else None,
+                                         from_emp, to_emp, from_branch, to_branch))
     db.session.add(history)
+    add_references(proof)
+    return history
 
 # --- NEW: API for Dynamic Dropdown ---
 @assets_bp.route('/get_employees/<int:branch_id>')
@@ -50,63 +99,90 @@ def get_employees_by_branch(branch_id):
     employees = Employee.query.filter_by(status='Active', branch_id=branch_id).all()
     return jsonify([{'id': e.id, 'name': f"{e.name} ({e.emp_id})"} for e in employees])
 
+ASSET_PAGE_SIZE = 50
+
+# Sort keys for the asset list; nullable text columns are coalesced so they
+# can take part in keyset comparisons (NULL never compares true).
+ASSET_SORT_KEYS = {
+    'serial': Asset.serial_number,
+    'model': func.coalesce(Asset.model, ''),
+    'status': func.coalesce(Asset.status, ''),
+    'branch': func.coalesce(Branch.name, ''),
+    'holder': func.coalesce(Employee.name, ''),
+}
+
+def as_of_row(asset, status, branch, holder):
+    """An asset as the list template shows it, with its past status, branch and holder."""
+    return SimpleNamespace(id=asset.id, serial_number=asset.serial_number, brand=asset.brand, model=asset.model,
+                           qr_code_hash=asset.qr_code_hash, status=status, branch=branch, holder=holder,
+                           current_branch_id=branch.id if branch else None)
+
 @assets_bp.route('/')
 @login_required
 def list_assets():
     status_filter = request.args.get('status')
     branch_filter = request.args.get('branch_id')
     search = request.args.get('search')
+    # ?as_of=YYYY-MM-DD lists the fleet as it was at the end of that day (app/snapshots.py)
+    as_of = parse_as_of(request.args.get('as_of'))
     
-    # Sorting Parameters
-    sort_by = request.args.get('sort', 'id')
+    # Sorting Parameters (search results default to best match first)
+    sort_by = request.args.get('sort') or ('relevance' if search else 'id')
     order = request.args.get('order', 'desc')
+
+    # Paging Parameters (keyset cursor from the previous page + row counter)
+    cursor = decode_cursor(request.args.get('cursor'))
+    start = request.args.get('start', 0, type=int)
     
-    query = Asset.query.outerjoin(Branch, Asset.current_branch_id == Branch.id)\
-                       .outerjoin(Employee, Asset.current_employee_id == Employee.id)
+    if as_of:
+        # Status, branch and holder come from history; Branch/Employee are joined on those
+        state = asset_states(as_of)
+        query = Asset.query.join(state, state.c.asset_id == Asset.id)\
+                           .outerjoin(Branch, state.c.branch_id == Branch.id)\
+                           .outerjoin(Employee, state.c.employee_id == Employee.id)
+        status_column, branch_column = state.c.status, state.c.branch_id
+    else:
+        query = Asset.query.outerjoin(Branch, Asset.current_branch_id == Branch.id)\
+                           .outerjoin(Employee, Asset.current_employee_id == Employee.id)
+        status_column, branch_column = Asset.status, Asset.current_branch_id
 
     if status_filter:
-        query = query.filter(Asset.status == status_filter)
+        query = query.filter(status_column == status_filter)
     if branch_filter:
-        query = query.filter(Asset.current_branch_id == branch_filter)
+        query = query.filter(branch_column == branch_filter)
     
+    score = None
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Asset.serial_number.ilike(search_term),
-                Asset.model.ilike(search_term),
-                Employee.name.ilike(search_term),
-                Branch.name.ilike(search_term)
-            )
-        )
+        query, score = filter_assets(query, search)
     
-    # Sorting Logic
-    if sort_by == 'serial':
-        sort_col = Asset.serial_number
-    elif sort_by == 'model':
-        sort_col = Asset.model
-    elif sort_by == 'status':
-        sort_col = Asset.status
-    elif sort_by == 'branch':
-        sort_col = Branch.name
-    elif sort_by == 'holder':
-        sort_col = Employee.name
+    # Sorting Logic: (sort key, id) so ties are broken deterministically
+    if sort_by == 'relevance' and score is not None:
+        columns, descending = [score, Asset.id], False
+    else:
+        sort_key = func.coalesce(status_column, '') if sort_by == 'status' else ASSET_SORT_KEYS.get(sort_by)
+        columns = [sort_key, Asset.id] if sort_key is not None else [Asset.id]
+        descending = order != 'asc'
+    if as_of:
+        query = query.add_columns(state.c.status, Branch, Employee)
     else:
-        sort_col = Asset.id
+        query = query.options(*asset_rows_joined())
+    query = seek(query.add_columns(*columns), columns, cursor, descending=descending)
 
-    if order == 'asc':
-        query = query.order_by(asc(sort_col))
+    rows, has_more = fetch_page(query, ASSET_PAGE_SIZE)
+    if as_of:
+        assets = [as_of_row(*row[:4]) for row in rows]
+        next_cursor = encode_cursor(*rows[-1][4:]) if has_more else None
     else:
-        query = query.order_by(desc(sort_col))
-        
-    assets = query.all()
+        assets = [row[0] for row in rows]
+        next_cursor = encode_cursor(*rows[-1][1:]) if has_more else None
     
+    page = dict(assets=assets, next_cursor=next_cursor, start=start, next_start=start + len(assets), as_of=as_of)
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return render_template('assets/_table_rows.html', assets=assets)
+        return render_template('assets/_table_rows.html', **page)
 
     branches = Branch.query.all()
     employees = Employee.query.filter_by(status='Active').all()
-    return render_template('assets/list.html', assets=assets, branches=branches, employees=employees)
+    return render_template('assets/list.html', branches=branches, employees=employees, **page)
 
 @assets_bp.route('/<int:asset_id>')
 @login_required
@@ -130,7 +206,7 @@ def add():
     branch_id = request.form.get('branch_id')
     
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
     
     branch = Branch.query.get(branch_id)
     new_asset = Asset(
@@ -140,7 +216,8 @@ def add():
     db.session.add(new_asset)
     db.session.commit()
     
-    log_history(new_asset, "Purchase", "Vendor", f"Stock ({branch.name})", doc_path=doc_filename)
+    log_history(new_asset, "Purchase", "Vendor", f"Stock ({branch.name})", proof=proof,
+                to_branch=branch.id)
     db.session.commit()
     flash('Asset Created Successfully', 'success')
     return redirect(url_for('assets.list_assets'))
@@ -169,16 +246,19 @@ def allocate():
     asset_id = request.form.get('asset_id')
     emp_id = request.form.get('employee_id')
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
 
     asset = Asset.query.get(asset_id)
     employee = Employee.query.get(emp_id)
     
     old_loc = f"Stock ({asset.branch.name})" if asset.branch else "Unknown"
+    old_branch_id = asset.current_branch_id
     asset.status = 'Allocated'
     asset.current_employee_id = emp_id
     
-    log_history(asset, "Allocation", old_loc, f"{employee.name} ({employee.emp_id})", doc_path=doc_filename)
+    hist = log_history(asset, "Allocation", old_loc, f"{employee.name} ({employee.emp_id})", proof=proof,
+                       from_branch=old_branch_id, to_emp=employee.id)
+    asset.allocated_at = hist.timestamp
     db.session.commit()
     flash('Asset Allocated', 'success')
     if 'assets' in request.referrer and 'asset/' not in request.referrer:
@@ -192,17 +272,20 @@ def return_asset():
     branch_id = request.form.get('branch_id')
     remarks = request.form.get('remarks')
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
     
     asset = Asset.query.get(asset_id)
     branch = Branch.query.get(branch_id)
     old_holder = asset.holder.name if asset.holder else "Unknown"
+    old_holder_id = asset.current_employee_id
     
     asset.status = 'In Stock'
     asset.current_employee_id = None
     asset.current_branch_id = branch_id
+    asset.allocated_at = None
     
-    log_history(asset, "Return", old_holder, f"Stock ({branch.name})", notes=remarks, doc_path=doc_filename)
+    log_history(asset, "Return", old_holder, f"Stock ({branch.name})", notes=remarks, proof=proof,
+                from_emp=old_holder_id, to_branch=branch.id)
     db.session.commit()
     flash('Asset Returned to Stock', 'success')
     return redirect(url_for('assets.detail', asset_id=asset_id))
@@ -215,17 +298,20 @@ def transfer():
     courier = request.form.get('courier')
     remarks = request.form.get('remarks')
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
     
     asset = Asset.query.get(asset_id)
     target_branch = Branch.query.get(target_branch_id)
     old_loc = asset.branch.name if asset.branch else "Transit"
+    old_branch_id = asset.current_branch_id
     
     asset.status = 'In Transit'
     asset.current_employee_id = None
     asset.current_branch_id = target_branch_id 
+    asset.allocated_at = None
     
-    log_history(asset, "Transfer Initiated", f"Branch {old_loc}", f"Branch {target_branch.name}", courier=courier, notes=remarks, doc_path=doc_filename)
+    log_history(asset, "Transfer Initiated", f"Branch {old_loc}", f"Branch {target_branch.name}", courier=courier, notes=remarks, proof=proof,
+                from_branch=old_branch_id, to_branch=target_branch.id)
     db.session.commit()
     flash('Transfer Initiated', 'success')
     if request.referrer and 'asset/' not in request.referrer: 
@@ -237,11 +323,12 @@ def transfer():
 def receive():
     asset_id = request.form.get('asset_id')
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
 
     asset = Asset.query.get(asset_id)
     asset.status = 'In Stock'
-    log_history(asset, "Transfer Received", "Courier", f"Stock ({asset.branch.name})", doc_path=doc_filename)
+    log_history(asset, "Transfer Received", "Courier", f"Stock ({asset.branch.name})", proof=proof,
+                to_branch=asset.current_branch_id)
     db.session.commit()
     flash('Asset Received', 'success')
     return redirect(url_for('assets.detail', asset_id=asset_id))
@@ -252,7 +339,7 @@ def repair():
     asset_id = request.form.get('asset_id')
     notes = request.form.get('notes')
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
 
     asset = Asset.query.get(asset_id)
     from_who = "Unknown"
@@ -262,7 +349,9 @@ def repair():
         from_who = f"Stock ({asset.branch.name})"
         
     asset.status = 'Repair'
-    log_history(asset, "Sent to Repair", from_who, "Repair Center", notes=notes, doc_path=doc_filename)
+    log_history(asset, "Sent to Repair", from_who, "Repair Center", notes=notes, proof=proof,
+                from_emp=asset.current_employee_id,
+                from_branch=None if asset.current_employee_id else asset.current_branch_id)
     db.session.commit()
     flash('Asset marked as Under Repair', 'success')
     return redirect(url_for('assets.detail', asset_id=asset_id))
@@ -273,7 +362,7 @@ def complete_repair():
     asset_id = request.form.get('asset_id')
     notes = request.form.get('notes')
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
 
     asset = Asset.query.get(asset_id)
     if asset.current_employee_id:
@@ -285,7 +374,9 @@ def complete_repair():
         to_detail = f"Stock ({asset.branch.name})"
         flash_msg = 'Repair Complete. Asset returned to Stock.'
     
-    log_history(asset, "Repair Completed", "Repair Center", to_detail, notes=notes, doc_path=doc_filename)
+    log_history(asset, "Repair Completed", "Repair Center", to_detail, notes=notes, proof=proof,
+                to_emp=asset.current_employee_id,
+                to_branch=None if asset.current_employee_id else asset.current_branch_id)
     db.session.commit()
     flash(flash_msg, 'success')
     return redirect(url_for('assets.detail', asset_id=asset_id))
@@ -296,7 +387,7 @@ def retire_asset():
     asset_id = request.form.get('asset_id')
     remarks = request.form.get('remarks')
     doc_file = request.files.get('document')
-    doc_filename = save_proof(doc_file)
+    proof = save_proof(doc_file)
 
     asset = Asset.query.get_or_404(asset_id)
     if asset.holder:
@@ -306,75 +397,284 @@ def retire_asset():
     old_status = asset.status
     asset.status = 'Retired'
     asset.current_employee_id = None 
+    asset.allocated_at = None
     
-    log_history(asset, "Retired/Scrapped", old_status, "Retired", notes=remarks, doc_path=doc_filename)
+    log_history(asset, "Retired/Scrapped", old_status, "Retired", notes=remarks, proof=proof)
     db.session.commit()
     flash('Asset has been Retired/Scrapped.', 'success')
     return redirect(url_for('assets.detail', asset_id=asset_id))
 
-@assets_bp.route('/export')
+# --- BULK ACTIONS ---
+# One POST applies a lifecycle action to many assets: they are loaded and
+# validated in one query, every valid one is updated and all history rows are
+# bulk-inserted in a single transaction. Assets that are not in a state the
+# action allows are skipped and reported back with the reason.
+BULK_ACTION_LIMIT = 1000
+
+def _bulk_allocate(asset, ctx):
+    employee = ctx['employee']
+    old_loc = f"Stock ({asset.branch.name})" if asset.branch else "Unknown"
+    old_branch_id = asset.current_branch_id
+    asset.status = 'Allocated'
+    asset.current_employee_id = employee.id
+    asset.allocated_at = ctx['timestamp']
+    return ("Allocation", old_loc, f"{employee.name} ({employee.emp_id})",
+            dict(from_branch=old_branch_id, to_emp=employee.id))
+
+def _bulk_return(asset, ctx):
+    branch = ctx['branch']
+    old_holder = asset.holder.name if asset.holder else "Unknown"
+    old_holder_id = asset.current_employee_id
+    asset.status = 'In Stock'
+    asset.current_employee_id = None
+    asset.current_branch_id = branch.id
+    asset.allocated_at = None
+    return ("Return", old_holder, f"Stock ({branch.name})", dict(from_emp=old_holder_id, to_branch=branch.id))
+
+def _bulk_transfer(asset, ctx):
+    branch = ctx['branch']
+    old_loc = asset.branch.name if asset.branch else "Transit"
+    old_branch_id = asset.current_branch_id
+    asset.status = 'In Transit'
+    asset.current_employee_id = None
+    asset.current_branch_id = branch.id
+    asset.allocated_at = None
+    return ("Transfer Initiated", f"Branch {old_loc}", f"Branch {branch.name}",
+            dict(courier=ctx['courier'], from_branch=old_branch_id, to_branch=branch.id))
+
+def _bulk_receive(asset, ctx):
+    asset.status = 'In Stock'
+    to_detail = f"Stock ({asset.branch.name})" if asset.branch else "Stock"
+    return ("Transfer Received", "Courier", to_detail, dict(to_branch=asset.current_branch_id))
+
+def _bulk_repair(asset, ctx):
+    from_who = "Unknown"
+    if asset.holder:
+        from_who = f"{asset.holder.name} (Allocated)"
+    elif asset.branch:
+        from_who = f"Stock ({asset.branch.name})"
+    asset.status = 'Repair'
+    return ("Sent to Repair", from_who, "Repair Center",
+            dict(from_emp=asset.current_employee_id,
+                 from_branch=None if asset.current_employee_id else asset.current_branch_id))
+
+def _bulk_complete_repair(asset, ctx):
+    if asset.current_employee_id:
+        asset.status = 'Allocated'
+        to_detail = f"{asset.holder.name} (Owner)"
+    else:
+        asset.status = 'In Stock'
+        to_detail = f"Stock ({asset.branch.name})" if asset.branch else "Stock"
+    return ("Repair Completed", "Repair Center", to_detail,
+            dict(to_emp=asset.current_employee_id,
+                 to_branch=None if asset.current_employee_id else asset.current_branch_id))
+
+def _bulk_retire(asset, ctx):
+    old_status = asset.status
+    asset.status = 'Retired'
+    asset.current_employee_id = None
+    asset.allocated_at = None
+    return ("Retired/Scrapped", old_status, "Retired", {})
+
+# action -> (transition, statuses it may start from, required target)
+BULK_ACTIONS = {
+    'allocate': (_bulk_allocate, ('In Stock',), 'employee'),
+    'return': (_bulk_return, ('Allocated',), 'branch'),
+    'transfer': (_bulk_transfer, ('In Stock',), 'branch'),
+    'receive': (_bulk_receive, ('In Transit',), None),
+    'repair': (_bulk_repair, ('In Stock', 'Allocated'), None),
+    'complete_repair': (_bulk_complete_repair, ('Repair',), None),
+    'retire': (_bulk_retire, ('In Stock', 'Repair'), None),
+}
+
+def _bulk_list(params, key):
+    """List parameter from a form (repeated fields) or a JSON body (array)."""
+    values = params.getlist(key) if hasattr(params, 'getlist') else (params.get(key) or [])
+    if isinstance(values, (str, int)):
+        values = [values]
+    return [str(v).strip() for v in values if str(v).strip()]
+
+@assets_bp.route('/action/bulk', methods=['POST'])
 @login_required
-def export_csv():
-    mode = request.args.get('mode', 'summary')
-    status_filter = request.args.get('status')
-    branch_filter = request.args.get('branch_id')
-    search = request.args.get('search')
+def bulk_action():
+    params = request.get_json(silent=True)
+    if not isinstance(params, dict):
+        params = request.form
+    action = params.get('action')
+    if action not in BULK_ACTIONS:
+        return jsonify({'success': False, 'message': f"Unknown action '{action}'"}), 400
+    transition, allowed, target = BULK_ACTIONS[action]
 
-    query = Asset.query.outerjoin(Branch, Asset.current_branch_id == Branch.id)\
-                       .outerjoin(Employee, Asset.current_employee_id == Employee.id)
+    asset_ids = _bulk_list(params, 'asset_ids')
+    serials = _bulk_list(params, 'serials')
+    if not asset_ids and not serials:
+        return jsonify({'success': False, 'message': 'No assets selected'}), 400
+    if len(asset_ids) + len(serials) > BULK_ACTION_LIMIT:
+        return jsonify({'success': False, 'message': f'At most {BULK_ACTION_LIMIT} assets per request'}), 400
+    if not all(i.isdigit() for i in asset_ids):
+        return jsonify({'success': False, 'message': 'asset_ids must be integers'}), 400
 
-    if status_filter and status_filter != 'undefined': 
-        query = query.filter(Asset.status == status_filter)
-    if branch_filter and branch_filter != 'undefined': 
-        query = query.filter(Asset.current_branch_id == branch_filter)
-    
-    if search and search != 'undefined':
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Asset.serial_number.ilike(search_term),
-                Asset.model.ilike(search_term),
-                Employee.name.ilike(search_term),
-                Branch.name.ilike(search_term)
-            )
-        )
-    
-    assets = query.all()
+    ctx = {'timestamp': datetime.now(), 'courier': params.get('courier') or ""}
+    if target == 'employee':
+        ctx['employee'] = db.session.get(Employee, params.get('employee_id')) if str(params.get('employee_id') or '').isdigit() else None
+        if not ctx['employee'] or ctx['employee'].status != 'Active':
+            return jsonify({'success': False, 'message': 'A valid active employee_id is required'}), 400
+    elif target == 'branch':
+        ctx['branch'] = db.session.get(Branch, params.get('branch_id')) if str(params.get('branch_id') or '').isdigit() else None
+        if not ctx['branch']:
+            return jsonify({'success': False, 'message': 'A valid branch_id is required'}), 400
+
+    # One query for the whole selection (ids and serials may be mixed)
+    found = Asset.query.options(*asset_rows()).filter(or_(
+        Asset.id.in_([int(i) for i in asset_ids]), Asset.serial_number.in_(serials))).all()
+    by_id = dict((a.id, a) for a in found)
+    by_serial = dict((a.serial_number, a) for a in found)
+
+    notes = params.get('remarks') or params.get('notes')
+    results, rows, seen = [], [], set()
+    requested = [('asset_id', i, by_id.get(int(i))) for i in asset_ids] + \
+                [('serial', s, by_serial.get(s)) for s in serials]
+    for key, value, asset in requested:
+        result = {key: int(value) if key == 'asset_id' else value}
+        if asset is None:
+            result.update(success=False, message='Asset not found')
+        elif asset.id in seen:
+            result.update(asset_id=asset.id, success=False, message='Duplicate in request')
+        elif asset.status not in allowed:
+            result.update(asset_id=asset.id, success=False, message=f"Cannot {action.replace('_', ' ')} an asset that is {asset.status}")
+        elif action == 'allocate' and asset.current_employee_id:
+            result.update(asset_id=asset.id, success=False, message=f'Already held by {asset.holder.name}')
+        elif action == 'retire' and asset.current_employee_id:
+            result.update(asset_id=asset.id, success=False, message=f'Asset is currently allocated to {asset.holder.name}')
+        else:
+            seen.add(asset.id)
+            hist_action, from_d, to_d, extra = transition(asset, ctx)
+            rows.append(history_row(asset, hist_action, from_d, to_d, notes=notes,
+                                    timestamp=ctx['timestamp'], **extra))
+            result.update(asset_id=asset.id, serial=asset.serial_number, success=True, status=asset.status)
+        results.append(result)
+
+    if rows:
+        # Stored only now that some row will reference it (none = nothing to clean up)
+        proof = save_proof(request.files.get('document'))
+        for row in rows:
+            row['document_path'] = proof.path if proof else None
+        db.session.flush()
+        db.session.execute(insert(AssetHistory), rows)
+        add_references(proof, len(rows))  # one stored file for the whole batch
+        db.session.commit()
+
+    return jsonify({'success': bool(rows), 'action': action, 'applied': len(rows),
+                    'failed': len(results) - len(rows), 'results': results})
+
+# --- HELPER: Streaming CSV ---
+EXPORT_BATCH_SIZE = 500
+
+class _CsvLine:
+    """File-like target that hands back each formatted CSV line."""
+    def write(self, line):
+        return line
+
+def stream_csv(header, rows, lines_per_chunk=200):
+    """Yield UTF-8 CSV chunks as rows are produced (constant memory)."""
+    writer = csv.writer(_CsvLine())
+    chunk = [writer.writerow(header)]
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= lines_per_chunk:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
+
+def export_rows(mode, status_filter=None, branch_filter=None, search=None):
+    """(header, rows, count query) for the asset CSV export; rows are streamed in batches."""
+    def apply_filters(query):
+        query = query.outerjoin(Branch, Asset.current_branch_id == Branch.id)\
+                     .outerjoin(Employee, Asset.current_employee_id == Employee.id)
+        if status_filter and status_filter != 'undefined': 
+            query = query.filter(Asset.status == status_filter)
+        if branch_filter and branch_filter != 'undefined': 
+            query = query.filter(Asset.current_branch_id == branch_filter)
+        if search and search != 'undefined':
+            query, _ = filter_assets(query, search)
+        return query
 
-    si = io.StringIO()
-    cw = csv.writer(si)
-    
     if mode == 'detailed':
-        cw.writerow(['Date', 'Serial', 'Brand', 'Model', 'Action', 'From', 'To', 'Courier', 'Remarks', 'Doc', 'User'])
-        filtered_ids = [a.id for a in assets]
-        history = AssetHistory.query.filter(AssetHistory.asset_id.in_(filtered_ids))\
-            .order_by(AssetHistory.timestamp.desc()).all()
-            
-        for h in history:
-            cw.writerow([
-                h.timestamp.strftime('%Y-%m-%d %H:%M'),
-                h.asset.serial_number, h.asset.brand, h.asset.model,
-                h.action, h.from_detail, h.to_detail, h.courier_details, h.notes,
-                "Yes" if h.document_path else "No",
-                h.created_by_user_id
-            ])
+        header = ['Date', 'Serial', 'Brand', 'Model', 'Action', 'From', 'To', 'Courier', 'Remarks', 'Doc', 'User']
+        # History of the filtered assets via a join, not an IN list of every asset ID
+        history = apply_filters(AssetHistory.query.join(Asset, AssetHistory.asset_id == Asset.id))\
+            .options(*history_with_joined_asset())\
+            .order_by(AssetHistory.timestamp.desc(), AssetHistory.id.desc())
+
+        def rows():
+            for h in history.yield_per(EXPORT_BATCH_SIZE):
+                yield [
+                    h.timestamp.strftime('%Y-%m-%d %H:%M'),
+                    h.asset.serial_number, h.asset.brand, h.asset.model,
+                    h.action, h.from_detail, h.to_detail, h.courier_details, h.notes,
+                    "Yes" if h.document_path else "No",
+                    h.created_by_user_id
+                ]
+        return header, rows(), history.order_by(None)
     else:
-        cw.writerow(['Serial', 'Brand', 'Model', 'Status', 'Current Branch', 'Current Holder', 'Emp ID', 'Allocation Date'])
-        for a in assets:
-            branch_name = a.branch.name if a.branch else "N/A"
-            holder_name = "N/A"
-            emp_id = "N/A"
-            allocation_date = "N/A"
-            if a.holder:
-                holder_name = a.holder.name
-                emp_id = a.holder.emp_id
-                last_alloc = AssetHistory.query.filter_by(asset_id=a.id, action='Allocation').order_by(AssetHistory.timestamp.desc()).first()
-                if last_alloc:
-                    allocation_date = last_alloc.timestamp.strftime('%Y-%m-%d')
-            cw.writerow([a.serial_number, a.brand, a.model, a.status, branch_name, holder_name, emp_id, allocation_date])
-        
-    output = io.BytesIO()
-    output.write(si.getvalue().encode('utf-8'))
-    output.seek(0)
+        header = ['Serial', 'Brand', 'Model', 'Status', 'Current Branch', 'Current Holder', 'Emp ID', 'Allocation Date']
+        assets = apply_filters(Asset.query).options(*asset_rows_joined()).order_by(Asset.id)
+
+        def rows():
+            for a in assets.yield_per(EXPORT_BATCH_SIZE):
+                branch_name = a.branch.name if a.branch else "N/A"
+                holder_name = "N/A"
+                emp_id = "N/A"
+                allocation_date = "N/A"
+                if a.holder:
+                    holder_name = a.holder.name
+                    emp_id = a.holder.emp_id
+                    if a.allocated_at:
+                        allocation_date = a.allocated_at.strftime('%Y-%m-%d')
+                yield [a.serial_number, a.brand, a.model, a.status, branch_name, holder_name, emp_id, allocation_date]
+        return header, rows(), assets.order_by(None)
+
+EXPORT_FILTERS = ('mode', 'status', 'branch_id', 'search')
+
+@assets_bp.route('/export')
+@login_required
+def export_csv():
+    mode = request.args.get('mode', 'summary')
+    header, rows, _ = export_rows(mode, request.args.get('status'), request.args.get('branch_id'),
+                                  request.args.get('search'))
     fname = f'asset_{mode}_{datetime.now().date()}.csv'
-    return send_file(output, mimetype='text/csv', as_attachment=True, download_name=fname)
\ No newline at end of file
+    return Response(stream_with_context(stream_csv(header, rows)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={fname}'})
+
+@assets_bp.route('/export/job', methods=['POST'])
+@login_required
+def export_csv_job():
+    """Queue the export as a background job (the detailed log of a large fleet
+    can take longer than a request may); answers with the job to poll."""
+    params = dict((k, request.form.get(k)) for k in EXPORT_FILTERS if request.form.get(k))
+    job = submit_job('export_csv', params, user_id=current_user.id, base_url=request.host_url)
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({'success': True, 'job_id': job.id, 'status_url': url_for('jobs.status', job_id=job.id),
+                        'page_url': url_for('jobs.detail', job_id=job.id)})
+    return redirect(url_for('jobs.detail', job_id=job.id))
+
+@job_handler('export_csv')
+def run_export_csv(ctx):
+    mode = ctx.params.get('mode', 'summary')
+    header, rows, count = export_rows(mode, ctx.params.get('status'), ctx.params.get('branch_id'),
+                                      ctx.params.get('search'))
+    total = count.count()
+    ctx.progress(0, total, force=True)
+
+    def counted(rows):
+        for done, row in enumerate(rows, 1):
+            yield row
+            if done % EXPORT_BATCH_SIZE == 0:
+                ctx.progress(done)
+
+    with ctx.open_result(f'asset_{mode}_{datetime.now().date()}.csv', 'text/csv') as out:
+        for chunk in stream_csv(header, counted(rows)):
+            out.write(chunk)
+    ctx.progress(total, force=True)
+    return f"{total:,} rows exported."
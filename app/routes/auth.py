@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from app.extensions import db
 from app.models import User
+from app.cache import forget_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -68,6 +69,7 @@ def delete_user(user_id):
         return redirect(url_for('auth.manage_users'))
         
     db.session.delete(user)
+    forget_user(user.id)
     db.session.commit()
     flash(f'User {user.name} has been deleted.', 'success')
     return redirect(url_for('auth.manage_users'))
@@ -88,6 +90,7 @@ def update_password(user_id):
         return redirect(url_for('auth.manage_users'))
         
     user.password = new_password # Use hashing in production!
+    forget_user(user.id)
     db.session.commit()
     flash(f'Password for {user.name} has been updated.', 'success')
     return redirect(url_for('auth.manage_users'))
\ No newline at end of file
@@ -1,9 +1,13 @@
 # Path: app/routes/employees.py
+from datetime import datetime
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required
 from sqlalchemy import or_
 from app.extensions import db
-from app.models import Employee, AssetHistory, Branch, Asset
+from app.models import Employee, AssetHistory, Branch
+from app.loading import employee_rows_joined, history_with_asset
+from app.search import filter_employees
+from app.pagination import encode_cursor, decode_cursor, seek, fetch_page
 
 employees_bp = Blueprint('employees', __name__)
 
@@ -13,26 +17,16 @@ def list_employees():
     search = request.args.get('search')
     status_filter = request.args.get('status', 'Active') # Default to Active
     
-    query = Employee.query.outerjoin(Branch, Employee.branch_id == Branch.id)\
-                          .outerjoin(Asset, Employee.id == Asset.current_employee_id)
+    query = Employee.query.outerjoin(Branch, Employee.branch_id == Branch.id)
 
     # Apply Status Filter
     if status_filter and status_filter != 'All':
         query = query.filter(Employee.status == status_filter)
 
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Employee.name.ilike(search_term),
-                Employee.emp_id.ilike(search_term),
-                Branch.name.ilike(search_term),
-                Asset.serial_number.ilike(search_term),
-                Asset.model.ilike(search_term)
-            )
-        )
+        query = filter_employees(query, search)
     
-    employees = query.distinct().all()
+    employees = query.options(*employee_rows_joined()).all()
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return render_template('employees/_table_rows.html', employees=employees)
@@ -40,16 +34,29 @@ def list_employees():
     branches = Branch.query.all()
     return render_template('employees/list.html', employees=employees, branches=branches, current_status=status_filter)
 
+TIMELINE_PAGE_SIZE = 25
+
 @employees_bp.route('/<int:emp_id>')
 @login_required
 def detail(emp_id):
     employee = Employee.query.get_or_404(emp_id)
     current_assets = employee.assets_holding
-    history_entries = AssetHistory.query.filter(
-        or_(AssetHistory.to_detail.contains(f"{employee.name}"),
-            AssetHistory.from_detail.contains(f"{employee.name}"))
-    ).order_by(AssetHistory.timestamp.desc()).all()
-    return render_template('employees/detail.html', employee=employee, current_assets=current_assets, history=history_entries)
+
+    # Timeline: events where this employee is the from/to party, newest first,
+    # served from the (employee, timestamp) indexes one page at a time
+    cursor = decode_cursor(request.args.get('cursor'), datetime.fromisoformat, int)
+    query = AssetHistory.query.options(*history_with_asset()).filter(
+        or_(AssetHistory.to_employee_id == employee.id,
+            AssetHistory.from_employee_id == employee.id)
+    )
+    query = seek(query, [AssetHistory.timestamp, AssetHistory.id], cursor, descending=True)
+    history_entries, has_more = fetch_page(query, TIMELINE_PAGE_SIZE)
+    next_cursor = None
+    if has_more:
+        last = history_entries[-1]
+        next_cursor = encode_cursor(last.timestamp.isoformat(), last.id)
+    return render_template('employees/detail.html', employee=employee, current_assets=current_assets,
+                           history=history_entries, next_cursor=next_cursor, is_first_page=cursor is None)
 
 @employees_bp.route('/add', methods=['POST'])
 @login_required
@@ -0,0 +1,159 @@
+# Path: app/routes/jobs.py
+import os
+import re
+import sys
+import uuid
+import hashlib
+import subprocess
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, current_app, send_from_directory
+from flask_login import login_required, current_user
+from app.extensions import db
+from app.models import Job, User
+from app.jobs import submit_job, job_handler, result_folder, JobError
+
+jobs_bp = Blueprint('jobs', __name__)
+
+JOB_LIST_SIZE = 50
+JOB_TITLES = {
+    'export_csv': 'CSV export',
+    'generate_all_missing': 'Generate missing QR codes',
+    'print_stickers': 'Sticker sheet',
+    'import_assets': 'Asset import',
+    'import_history': 'History import',
+}
+
+def is_super_admin():
+    return current_user.email == 'admin@company.com'
+
+def get_job_or_404(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or (job.created_by_user_id != current_user.id and not is_super_admin()):
+        abort(404)
+    return job
+
+def job_state(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'title': JOB_TITLES.get(job.kind, job.kind),
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': int(100 * job.progress / job.total) if job.total else None,
+        'message': job.message,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'result_url': url_for('jobs.result', job_id=job.id) if job.result_name else None,
+    }
+
+@jobs_bp.route('/')
+@login_required
+def list_jobs():
+    query = Job.query
+    if not is_super_admin():
+        query = query.filter(Job.created_by_user_id == current_user.id)
+    jobs = query.order_by(Job.id.desc()).limit(JOB_LIST_SIZE).all()
+    user_ids = {job.created_by_user_id for job in jobs if job.created_by_user_id}
+    users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    return render_template('jobs/list.html', jobs=jobs, users=users, titles=JOB_TITLES,
+                           can_import=is_super_admin())
+
+@jobs_bp.route('/<int:job_id>')
+@login_required
+def detail(job_id):
+    job = get_job_or_404(job_id)
+    return render_template('jobs/detail.html', job=job, state=job_state(job))
+
+@jobs_bp.route('/<int:job_id>/status')
+@login_required
+def status(job_id):
+    return jsonify(job_state(get_job_or_404(job_id)))
+
+@jobs_bp.route('/<int:job_id>/result')
+@login_required
+def result(job_id):
+    job = get_job_or_404(job_id)
+    if not job.result_name:
+        abort(404)
+    # Sticker sheets open in the browser to print; everything else downloads
+    inline = job.result_mimetype in ('text/html', 'application/pdf')
+    return send_from_directory(result_folder(job.id), job.result_name, mimetype=job.result_mimetype,
+                               as_attachment=not inline, download_name=job.result_name)
+
+# --- CSV imports ---
+# The scripts in scripts/ run in a child process of the job (they build their
+# own app and commit in chunks); their "[OK]" lines become the job's progress
+# and their whole output is the job's result.
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+IMPORT_SCRIPTS = {
+    'import_assets': ('import_legacy_data.py', re.compile(r'\[OK\] (\d+)/(\d+) assets')),
+    'import_history': ('import_history.py', re.compile(r'\[OK\] (\d+) rows')),
+}
+
+@jobs_bp.route('/import', methods=['POST'])
+@login_required
+def submit_import():
+    if not is_super_admin():
+        flash('Access Denied: Only Super Admin can run imports.', 'error')
+        return redirect(url_for('jobs.list_jobs'))
+    kind = request.form.get('kind')
+    upload = request.files.get('csv_file')
+    if kind not in IMPORT_SCRIPTS or not upload or not upload.filename.lower().endswith('.csv'):
+        flash('Choose an import type and a .csv file.', 'error')
+        return redirect(url_for('jobs.list_jobs'))
+    folder = os.path.join(current_app.config['JOB_RESULT_FOLDER'], 'uploads')
+    os.makedirs(folder, exist_ok=True)
+    # Named by content: import_history.py checkpoints per file name, so
+    # uploading the same CSV again after a failure resumes where it stopped
+    tmp = os.path.join(folder, f"{uuid.uuid4().hex}.tmp")
+    upload.save(tmp)
+    digest = hashlib.sha256()
+    with open(tmp, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    path = os.path.join(folder, f"{digest.hexdigest()[:24]}.csv")
+    os.replace(tmp, path)
+    job = submit_job(kind, {'input': path, 'filename': upload.filename}, user_id=current_user.id,
+                     base_url=request.host_url)
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({'success': True, 'job_id': job.id, 'status_url': url_for('jobs.status', job_id=job.id)})
+    return redirect(url_for('jobs.detail', job_id=job.id))
+
+def run_import_script(ctx, kind):
+    script, progress_line = IMPORT_SCRIPTS[kind]
+    source = ctx.params['input']
+    with open(source, 'rb') as f:
+        total = max(sum(1 for _ in f) - 1, 0)  # data rows, for scripts that only report rows done
+    ctx.progress(0, total, force=True)
+    env = dict(os.environ, PYTHONUNBUFFERED='1', DATABASE_URL=current_app.config['SQLALCHEMY_DATABASE_URI'])
+    summary, done = '', 0
+    try:
+        with ctx.open_result('import.log', 'text/plain', mode='w') as log:
+            proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, script), source],
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env,
+                                    cwd=os.path.dirname(SCRIPTS_DIR))
+            for line in proc.stdout:
+                log.write(line)
+                match = progress_line.search(line)
+                if match:
+                    done = int(match.group(1))
+                    ctx.progress(done, int(match.group(2)) if match.lastindex > 1 else None)
+                if line.startswith('---'):
+                    summary = line.strip().strip('-').strip()
+            code = proc.wait()
+        ctx.progress(done, force=True)
+    finally:
+        if os.path.exists(source):
+            os.remove(source)
+    if code != 0 or summary.startswith(('ABORTED', 'IMPORT STOPPED')):
+        raise JobError(summary or f"Import exited with code {code}; see the log.")
+    return summary
+
+@job_handler('import_assets')
+def run_import_assets(ctx):
+    return run_import_script(ctx, 'import_assets')
+
+@job_handler('import_history')
+def run_import_history(ctx):
+    return run_import_script(ctx, 'import_history')
@@ -1,26 +1,35 @@
 # Path: app/routes/qr.py
 import uuid
-import io
-import base64
-import qrcode
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, jsonify, make_response, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy import func
 from app.extensions import db
 from app.models import Asset, Branch, AssetHistory, PreGeneratedQR, ScanLog, SystemSetting
+from app.cache import scan_flag_cache, scan_page_cache
+from app.loading import asset_rows
+from app.pagination import encode_cursor, decode_cursor, seek, fetch_page, day_range, cached_total
+from app.scan_stats import top_scanned
+from app.qr_images import FORMATS, qr_images, sticker_image
+from app.sticker_pdf import stream_sticker_pdf
+from app.jobs import submit_job, job_handler
 
 qr_bp = Blueprint('qr', __name__)
 
+def global_scan_enabled():
+    enabled = scan_flag_cache.get('global_qr_scan')
+    if enabled is None:
+        global_scan = SystemSetting.query.filter_by(key='global_qr_scan').first()
+        enabled = not global_scan or global_scan.value != '0'
+        scan_flag_cache.set('global_qr_scan', enabled)
+    return enabled
+
 def log_scan_event(qr_hash, asset_id=None):
-    try:
-        ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-        if ip and ',' in ip:
-            ip = ip.split(',')[0].strip()
-        agent = request.headers.get('User-Agent')
-        log = ScanLog(qr_hash=qr_hash, ip_address=ip, user_agent=agent[:200], linked_asset_id=asset_id)
-        db.session.add(log)
-        db.session.commit()
-    except: pass
+    ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    if ip and ',' in ip:
+        ip = ip.split(',')[0].strip()
+    agent = request.headers.get('User-Agent')
+    current_app.extensions['scanlog'].submit(qr_hash, ip, agent, asset_id)
 
 @qr_bp.route('/manage')
 @login_required
@@ -42,28 +51,39 @@ def manage():
     statuses = db.session.query(Asset.status).distinct().all()
     unique_statuses = [s[0] for s in statuses]
     
-    global_scan = SystemSetting.query.filter_by(key='global_qr_scan').first()
-    global_scan_enabled = True if not global_scan or global_scan.value == '1' else False
-    
     return render_template('qr/manage.html', assets=assets, unassigned_qrs=unassigned_qrs, 
                            branches=branches, statuses=unique_statuses, 
-                           global_scan_enabled=global_scan_enabled,
+                           global_scan_enabled=global_scan_enabled(),
                            assets_without_qr=assets_without_qr)
 
 # --- NEW: GENERATE ALL MISSING ---
+# Runs as a background job (app/jobs.py): on a large fleet it touches every asset
+GENERATE_BATCH_SIZE = 500
+
 @qr_bp.route('/generate_all_missing', methods=['POST'])
 @login_required
 def generate_all_missing():
+    job = submit_job('generate_all_missing', user_id=current_user.id, base_url=request.host_url)
+    flash('Generating QR codes for all assets that lack one.', 'success')
+    return redirect(url_for('jobs.detail', job_id=job.id))
+
+@job_handler('generate_all_missing')
+def run_generate_all_missing(ctx):
     # Find all active assets without a QR code
-    targets = Asset.query.filter(Asset.qr_code_hash == None, Asset.status != 'Retired').all()
+    ids = [i for (i,) in db.session.query(Asset.id).filter(Asset.qr_code_hash == None, Asset.status != 'Retired')]
+    ctx.progress(0, len(ids), force=True)
     count = 0
-    for asset in targets:
-        asset.qr_code_hash = uuid.uuid4().hex
-        asset.is_qr_active = True
-        count += 1
-    db.session.commit()
-    flash(f'Successfully generated QR codes for {count} assets.', 'success')
-    return redirect(url_for('qr.manage'))
+    for start in range(0, len(ids), GENERATE_BATCH_SIZE):
+        targets = Asset.query.filter(Asset.id.in_(ids[start:start + GENERATE_BATCH_SIZE]),
+                                     Asset.qr_code_hash == None).all()
+        for asset in targets:
+            asset.qr_code_hash = uuid.uuid4().hex
+            asset.is_qr_active = True
+            count += 1
+        db.session.commit()
+        ctx.progress(start + GENERATE_BATCH_SIZE if start + GENERATE_BATCH_SIZE < len(ids) else len(ids))
+    ctx.progress(len(ids), force=True)
+    return f'Generated QR codes for {count} assets.'
 
 # --- NEW: MANUAL LINK (Assign Sticker from UI) ---
 @qr_bp.route('/manual_link', methods=['POST'])
@@ -100,7 +120,9 @@ def manual_link():
         to_detail="Manual Assignment via Dashboard",
         created_by_user_id=current_user.id,
         timestamp=datetime.now(),
-        post_action_status=asset.status
+        post_action_status=asset.status,
+        post_action_branch_id=asset.current_branch_id,
+        post_action_employee_id=asset.current_employee_id
     )
     db.session.add(hist)
     db.session.commit()
@@ -108,6 +130,8 @@ def manual_link():
     flash(f'QR Sticker successfully linked to {asset.serial_number}', 'success')
     return redirect(url_for('qr.manage'))
 
+SCAN_HISTORY_PAGE_SIZE = 50
+
 @qr_bp.route('/history')
 @login_required
 def scan_history():
@@ -115,12 +139,32 @@ def scan_history():
         flash('Access Denied', 'error')
         return redirect(url_for('qr.manage'))
         
-    page = request.args.get('page', 1, type=int)
-    logs = db.session.query(ScanLog, Asset).outerjoin(Asset, ScanLog.linked_asset_id == Asset.id)\
-        .order_by(ScanLog.timestamp.desc())\
-        .paginate(page=page, per_page=50)
-        
-    return render_template('qr/history.html', logs=logs)
+    current_app.extensions['scanlog'].flush()  # include this worker's buffered scans
+
+    # Newest first, paged by a (timestamp, id) cursor; filters use the
+    # scan_log (asset, timestamp) / (qr_hash, timestamp) / timestamp indexes
+    filters = dict((k, request.args.get(k, '').strip()) for k in ('serial', 'qr', 'start', 'end'))
+    conditions = day_range(ScanLog.timestamp, filters['start'], filters['end'])
+    if filters['serial']:
+        asset_id = db.session.query(Asset.id).filter(Asset.serial_number == filters['serial']).scalar()
+        conditions.append(ScanLog.linked_asset_id == (asset_id or 0))
+    if filters['qr']:
+        prefix = filters['qr'].lower()
+        conditions += [ScanLog.qr_hash >= prefix, ScanLog.qr_hash < prefix + '~']  # hex prefix as a range
+
+    cursor = decode_cursor(request.args.get('cursor'), datetime.fromisoformat, int)
+    query = db.session.query(ScanLog, Asset).outerjoin(Asset, ScanLog.linked_asset_id == Asset.id).filter(*conditions)
+    query = seek(query, [ScanLog.timestamp, ScanLog.id], cursor, descending=True)
+    logs, has_more = fetch_page(query, SCAN_HISTORY_PAGE_SIZE)
+    next_cursor = encode_cursor(logs[-1][0].timestamp.isoformat(), logs[-1][0].id) if has_more else None
+
+    total = cached_total(('scan_history',) + tuple(sorted(filters.items())),
+                         db.session.query(func.count(ScanLog.id)).filter(*conditions))
+    # Most scanned stickers this month, from the daily rollups (not the raw log)
+    top = top_scanned(datetime.utcnow().replace(day=1)) if cursor is None and not any(filters.values()) else []
+    return render_template('qr/history.html', logs=logs, next_cursor=next_cursor, is_first_page=cursor is None,
+                           total=total, filters=filters, filter_args=dict((k, v) for k, v in filters.items() if v),
+                           top=top)
 
 @qr_bp.route('/generate/<int:asset_id>', methods=['POST'])
 @login_required
@@ -154,21 +198,31 @@ def toggle_status(asset_id):
 
 @qr_bp.route('/scan/<qr_hash>')
 def public_scan(qr_hash):
-    global_scan = SystemSetting.query.filter_by(key='global_qr_scan').first()
-    if global_scan and global_scan.value == '0':
+    if not global_scan_enabled():
         return render_template('qr/public_error.html', message="SYSTEM LOCKDOWN: Scanning is temporarily disabled.")
 
-    asset = Asset.query.filter_by(qr_code_hash=qr_hash).first()
+    # Fast path: one indexed lookup for (id, version); the page itself is
+    # rendered once per asset version and then served from memory / 304.
+    asset = db.session.query(Asset.id, Asset.version, Asset.is_qr_active).filter_by(qr_code_hash=qr_hash).first()
     
     if asset:
         log_scan_event(qr_hash, asset.id)
         if not asset.is_qr_active:
             return render_template('qr/public_error.html', message="This QR Code has been deactivated.")
-        allocation_date = "N/A"
-        if asset.holder:
-            last_alloc = AssetHistory.query.filter_by(asset_id=asset.id, action='Allocation').order_by(AssetHistory.timestamp.desc()).first()
-            if last_alloc: allocation_date = last_alloc.timestamp.strftime('%d %b %Y')
-        return render_template('qr/public_view.html', asset=asset, allocation_date=allocation_date)
+        etag = f"{asset.id}-{asset.version}"
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            cached = scan_page_cache.get(qr_hash)
+            if cached and cached[0] == etag:
+                html = cached[1]
+            else:
+                html = render_public_view(asset.id)
+                scan_page_cache.set(qr_hash, (etag, html))
+            response = make_response(html)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'  # revalidate (and log) every scan
+        return response
 
     pre_gen = PreGeneratedQR.query.filter_by(qr_hash=qr_hash, status='Available').first()
     if pre_gen:
@@ -181,6 +235,13 @@ def public_scan(qr_hash):
 
     return render_template('qr/public_error.html', message="Invalid QR Code.")
 
+def render_public_view(asset_id):
+    asset = Asset.query.options(*asset_rows()).filter_by(id=asset_id).first()
+    allocation_date = "N/A"
+    if asset.holder and asset.allocated_at:
+        allocation_date = asset.allocated_at.strftime('%d %b %Y')
+    return render_template('qr/public_view.html', asset=asset, allocation_date=allocation_date)
+
 @qr_bp.route('/link', methods=['POST'])
 @login_required
 def link_qr():
@@ -197,49 +258,84 @@ def link_qr():
     asset.is_qr_active = True
     pre_gen.status = 'Consumed'
     
-    hist = AssetHistory(asset_id=asset.id, action="QR Linked", from_detail="Unassigned Sticker", to_detail=f"Linked Hash", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=asset.status)
+    hist = AssetHistory(asset_id=asset.id, action="QR Linked", from_detail="Unassigned Sticker", to_detail=f"Linked Hash", created_by_user_id=current_user.id, timestamp=datetime.now(), post_action_status=asset.status, post_action_branch_id=asset.current_branch_id, post_action_employee_id=asset.current_employee_id)
     db.session.add(hist)
     db.session.commit()
     flash(f'Sticker linked to {asset.serial_number}', 'success')
     return redirect(url_for('assets.detail', asset_id=asset.id))
 
-@qr_bp.route('/print', methods=['POST'])
-@login_required
-def print_stickers():
-    asset_ids = request.form.getlist('asset_ids')
-    pregen_ids = request.form.getlist('pregen_ids')
-    start_pos = int(request.form.get('start_position', 1)) - 1
-    cols = int(request.form.get('grid_columns', 3))
-    rows = int(request.form.get('grid_rows', 8))
-    
-    qr_data = []
-    for _ in range(start_pos): qr_data.append(None)
-        
+def sticker_labels(asset_ids, pregen_ids):
+    """(qr_hash, scan url, line 1, line 2) per sticker; assets without a hash get one (commits)."""
+    labels = []
     if asset_ids:
         assets = Asset.query.filter(Asset.id.in_(asset_ids)).all()
         for asset in assets:
             if not asset.qr_code_hash: asset.qr_code_hash = uuid.uuid4().hex
             scan_url = url_for('qr.public_scan', qr_hash=asset.qr_code_hash, _external=True)
-            qr_data.append(generate_qr_img(scan_url, asset.serial_number, f"{asset.brand} {asset.model}"))
+            labels.append((asset.qr_code_hash, scan_url, asset.serial_number, f"{asset.brand} {asset.model}"))
         db.session.commit()
 
     if pregen_ids:
         stickers = PreGeneratedQR.query.filter(PreGeneratedQR.id.in_(pregen_ids)).all()
         for sticker in stickers:
             scan_url = url_for('qr.public_scan', qr_hash=sticker.qr_hash, _external=True)
-            qr_data.append(generate_qr_img(scan_url, "UNASSIGNED", "Scan to Link"))
-
-    return render_template('qr/print.html', qr_items=qr_data, cols=cols, rows=rows)
-
-def generate_qr_img(url, text1, text2):
-    qr = qrcode.QRCode(box_size=10, border=1)
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill='black', back_color='white')
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    return {
-        'img': base64.b64encode(buffer.getvalue()).decode(),
-        'serial': text1,
-        'model': text2
-    }
\ No newline at end of file
+            labels.append((sticker.qr_hash, scan_url, "UNASSIGNED", "Scan to Link"))
+    return labels
+
+@qr_bp.route('/print', methods=['POST'])
+@login_required
+def print_stickers():
+    asset_ids = request.form.getlist('asset_ids')
+    pregen_ids = request.form.getlist('pregen_ids')
+    start_pos = int(request.form.get('start_position', 1)) - 1
+    cols = int(request.form.get('grid_columns', 3))
+    rows = int(request.form.get('grid_rows', 8))
+    fmt = request.form.get('image_format') or current_app.config.get('QR_STICKER_FORMAT', 'png')
+    if fmt not in FORMATS: fmt = 'png'
+
+    # Large sheets are rendered by a background job; the page it redirects to
+    # links the finished sheet
+    if len(asset_ids) + len(pregen_ids) > current_app.config.get('PRINT_JOB_THRESHOLD', 200):
+        params = dict(asset_ids=asset_ids, pregen_ids=pregen_ids, start_pos=start_pos, cols=cols, rows=rows, fmt=fmt)
+        job = submit_job('print_stickers', params, user_id=current_user.id, base_url=request.host_url)
+        return redirect(url_for('jobs.detail', job_id=job.id))
+
+    labels = sticker_labels(asset_ids, pregen_ids)
+    if fmt == 'pdf':
+        filename = f"stickers_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+        return Response(stream_with_context(stream_sticker_pdf(labels, cols, rows, start_pos)),
+                        mimetype='application/pdf',
+                        headers={'Content-Disposition': f'inline; filename={filename}'})
+
+    qr_data = [None] * start_pos + generate_qr_imgs(labels, fmt)
+    return render_template('qr/print.html', qr_items=qr_data, cols=cols, rows=rows, image_format=fmt)
+
+STICKER_JOB_BATCH = 100
+
+@job_handler('print_stickers')
+def run_print_stickers(ctx):
+    p = ctx.params
+    labels = sticker_labels(p.get('asset_ids'), p.get('pregen_ids'))
+    ctx.progress(0, len(labels), force=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+    if p['fmt'] == 'pdf':
+        with ctx.open_result(f"stickers_{stamp}.pdf", 'application/pdf') as out:
+            for chunk in stream_sticker_pdf(labels, p['cols'], p['rows'], p['start_pos']):
+                out.write(chunk)
+    else:
+        items = []
+        for start in range(0, len(labels), STICKER_JOB_BATCH):
+            items += generate_qr_imgs(labels[start:start + STICKER_JOB_BATCH], p['fmt'])
+            ctx.progress(len(items))
+        html = render_template('qr/print.html', qr_items=[None] * p['start_pos'] + items,
+                               cols=p['cols'], rows=p['rows'], image_format=p['fmt'])
+        with ctx.open_result(f"stickers_{stamp}.html", 'text/html', mode='w') as out:
+            out.write(html)
+    ctx.progress(len(labels), force=True)
+    return f"{len(labels)} stickers ready to print."
+
+def generate_qr_imgs(labels, fmt='png'):
+    """Sticker dicts for (qr_hash, url, serial, model) tuples; images come from the cache or a render pool."""
+    images = qr_images([(qr_hash, url) for qr_hash, url, _, _ in labels], fmt=fmt, box_size=10, border=1)
+    return [dict(sticker_image(fmt, data), serial=text1, model=text2)
+            for (_, _, text1, text2), data in zip(labels, images)]
@@ -0,0 +1,90 @@
+# Path: app/scan_archive.py
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func
+from app.extensions import db
+from app.models import ScanLog
+
+# --- ScanLog retention ---
+# Raw scans older than SCANLOG_RETENTION_DAYS are moved out of scan_log into
+# one gzip JSON-lines file per day:
+#   SCANLOG_ARCHIVE_FOLDER/YYYY/MM/scan_log-YYYY-MM-DD.jsonl.gz
+# A day is always moved whole: its file is written (to a temp name, then
+# renamed) before its rows are deleted, so an interrupted run never loses a
+# scan, and a re-run merges into an existing file without duplicating ids.
+# The hourly/daily counts stay in ScanRollup (app/scan_stats.py).
+# `flask scan-archive` runs it; `flask scan-query` reads the files back.
+
+FIELDS = ('id', 'timestamp', 'qr_hash', 'ip_address', 'user_agent', 'linked_asset_id')
+
+def archive_path(day):
+    folder = current_app.config['SCANLOG_ARCHIVE_FOLDER']
+    return os.path.join(folder, f"{day:%Y}", f"{day:%m}", f"scan_log-{day:%Y-%m-%d}.jsonl.gz")
+
+def _read_day(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def _write_day(day, rows):
+    """Write (merge) one day's file; returns the number of new scans in it."""
+    path = archive_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    written = 0
+    with gzip.open(tmp, 'wt', encoding='utf-8') as out:
+        seen = set()
+        if os.path.exists(path):  # left by a run that stopped before its delete
+            for record in _read_day(path):
+                seen.add(record['id'])
+                out.write(json.dumps(record, separators=(',', ':')) + '\n')
+        for row in rows:
+            if row.id in seen:
+                continue
+            record = dict((name, getattr(row, name)) for name in FIELDS)
+            record['timestamp'] = row.timestamp.isoformat()
+            out.write(json.dumps(record, separators=(',', ':')) + '\n')
+            written += 1
+    os.replace(tmp, path)
+    return written
+
+def archive_scan_logs(retention_days=None, batch_size=5000):
+    """Move whole days of scans older than the retention period to archive files.
+
+    Commits once per day; returns (days, scans) archived.
+    """
+    if retention_days is None:
+        retention_days = current_app.config['SCANLOG_RETENTION_DAYS']
+    cutoff = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=retention_days)
+    days = scans = 0
+    while True:
+        oldest = db.session.query(func.min(ScanLog.timestamp)).filter(ScanLog.timestamp < cutoff).scalar()
+        if oldest is None:
+            break
+        day = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+        in_day = (ScanLog.timestamp >= day, ScanLog.timestamp < day + timedelta(days=1))
+        rows = db.session.query(*[getattr(ScanLog, name) for name in FIELDS])\
+            .filter(*in_day).order_by(ScanLog.id).yield_per(batch_size)
+        scans += _write_day(day, rows)
+        db.session.execute(delete(ScanLog).where(*in_day))
+        db.session.commit()
+        days += 1
+    return days, scans
+
+def archived_scans(start, end, qr_hash=None, asset_id=None):
+    """Yield archived scan dicts from the day files between `start` and `end` (dates), oldest first."""
+    day = start
+    while day <= end:
+        path = archive_path(day)
+        if os.path.exists(path):
+            for record in _read_day(path):
+                if qr_hash and not record['qr_hash'].startswith(qr_hash):
+                    continue
+                if asset_id is not None and record['linked_asset_id'] != asset_id:
+                    continue
+                yield record
+        day += timedelta(days=1)
@@ -0,0 +1,79 @@
+# Path: app/scan_stats.py
+from collections import Counter
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Asset, ScanLog, ScanRollup
+
+# --- Scan rollups ---
+# ScanRollup keeps a scan count per hour and per day for each (qr_hash, linked
+# asset) pair, so a sticker that is reset or moved to another asset starts a
+# new count for the new asset. The scan log writer folds every batch it
+# inserts into these counters in the same transaction, so "most scanned this
+# month" reads a few hundred rollup rows instead of the raw log, and the counts
+# survive the retention job moving old raw rows into archive files.
+
+PERIODS = ('hour', 'day')
+
+def bucket_start(when, period):
+    if period == 'hour':
+        return when.replace(minute=0, second=0, microsecond=0)
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _count(events):
+    counts = Counter()
+    for e in events:
+        for period in PERIODS:
+            counts[(period, bucket_start(e['timestamp'], period), e['qr_hash'], e.get('linked_asset_id') or 0)] += 1
+    return counts
+
+def add_to_rollups(events, session=None):
+    """Add scan event dicts (timestamp, qr_hash, linked_asset_id) to the counters. Does not commit."""
+    counts = _count(events)
+    table = ScanRollup.__table__
+    conn = (session or db.session).connection()
+
+    def bump(key, n):
+        period, bucket, qr_hash, asset_id = key
+        return conn.execute(update(table).where(table.c.period == period, table.c.bucket == bucket,
+                                                table.c.qr_hash == qr_hash, table.c.linked_asset_id == asset_id)
+                            .values(count=table.c.count + n)).rowcount
+
+    for key, n in counts.items():
+        if bump(key, n):
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(table).values(period=key[0], bucket=key[1], qr_hash=key[2],
+                                                  linked_asset_id=key[3], count=n))
+        except IntegrityError:
+            bump(key, n)  # another worker created the row first
+
+def rebuild_scan_rollups(batch_size=5000):
+    """Recount the rollups from the raw scans still in scan_log. Commits.
+
+    Buckets before the oldest raw day are left alone: those scans are in the
+    archive files now (the retention job always moves whole days).
+    """
+    oldest = db.session.query(func.min(ScanLog.timestamp)).scalar()
+    if oldest is None:
+        return 0
+    db.session.execute(delete(ScanRollup).where(ScanRollup.bucket >= bucket_start(oldest, 'day')))
+    raw = db.session.query(ScanLog.timestamp, ScanLog.qr_hash, ScanLog.linked_asset_id).yield_per(batch_size)
+    counts = _count(dict(timestamp=ts, qr_hash=h, linked_asset_id=a) for ts, h, a in raw)
+    rows = [dict(period=p, bucket=b, qr_hash=h, linked_asset_id=a, count=n) for (p, b, h, a), n in counts.items()]
+    for i in range(0, len(rows), batch_size):
+        db.session.execute(insert(ScanRollup.__table__), rows[i:i + batch_size])
+    db.session.commit()
+    return len(rows)
+
+# --- Reading ---
+def top_scanned(since, limit=10):
+    """[(Asset or None, qr_hash, scans)] for the most scanned sticker/asset pairs since `since`, from day rollups."""
+    scans = func.sum(ScanRollup.count).label('scans')
+    rows = db.session.query(ScanRollup.qr_hash, ScanRollup.linked_asset_id, scans)\
+        .filter(ScanRollup.period == 'day', ScanRollup.bucket >= bucket_start(since, 'day'))\
+        .group_by(ScanRollup.qr_hash, ScanRollup.linked_asset_id).order_by(scans.desc()).limit(limit).all()
+    asset_ids = [asset_id for _, asset_id, _ in rows if asset_id]
+    assets = dict((a.id, a) for a in Asset.query.filter(Asset.id.in_(asset_ids))) if asset_ids else {}
+    return [(assets.get(asset_id), qr_hash, total) for qr_hash, asset_id, total in rows]
@@ -0,0 +1,53 @@
+# Path: app/scanlog.py
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app.extensions import db
+from app.models import ScanLog
+from app.cache import TTLCache
+from app.scan_stats import add_to_rollups
+from app.workers import BackgroundWorker
+
+# --- Buffered ScanLog writer ---
+# Public scans used to add + commit a ScanLog row inside the request. Events are
+# now queued and a background thread bulk-inserts them, flushing whenever
+# SCANLOG_BATCH_SIZE events are waiting or SCANLOG_FLUSH_INTERVAL seconds have
+# passed, and once more at interpreter exit. With SCANLOG_COALESCE_SECONDS > 0,
+# repeat scans of the same hash from the same IP inside that window are dropped
+# (e.g. a stock-take app re-reading a sticker). Each batch also updates the
+# hourly/daily scan counters (app/scan_stats.py) in the same transaction.
+
+class ScanLogWriter(BackgroundWorker):
+    name = 'scanlog-writer'
+
+    def __init__(self, app):
+        super().__init__(app, run_async=app.config.get('SCANLOG_ASYNC', True))
+        self.batch_size = app.config.get('SCANLOG_BATCH_SIZE', 100)
+        self.flush_interval = app.config.get('SCANLOG_FLUSH_INTERVAL', 2.0)
+        window = app.config.get('SCANLOG_COALESCE_SECONDS', 0)
+        self._recent = TTLCache(ttl=window, maxsize=10000) if window else None
+
+    def submit(self, qr_hash, ip_address=None, user_agent=None, linked_asset_id=None):
+        """Queue one scan event. Returns False if it was coalesced away."""
+        if self._recent is not None:
+            key = (qr_hash, ip_address)
+            if self._recent.get(key):
+                return False
+            self._recent.set(key, True)
+        self.put(dict(qr_hash=qr_hash, ip_address=ip_address, user_agent=(user_agent or '')[:200],
+                      linked_asset_id=linked_asset_id, timestamp=datetime.utcnow()))
+        return True
+
+    def handle(self, events):
+        if not events:
+            return
+        try:
+            db.session.execute(insert(ScanLog), events)
+            add_to_rollups(events)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            self.app.logger.exception(f"Failed to write {len(events)} scan log event(s)")
+
+def init_scan_log(app):
+    app.extensions['scanlog'] = ScanLogWriter(app)
@@ -0,0 +1,219 @@
+# Path: app/search.py
+import re
+from flask import current_app
+from sqlalchemy import Float, bindparam, event, inspect, literal_column, or_, select, table, column, text, type_coerce
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app.extensions import db
+from app.models import Asset, Branch, Employee
+
+# --- Search Index ---
+# Live search used to run ILIKE '%term%' across outer joins, i.e. a full scan per
+# keystroke. Assets and employees are now mirrored into a dedicated full-text
+# index (FTS5 on SQLite, FULLTEXT/ngram on MySQL) that is kept in sync by an
+# after_flush hook. Other databases, or SQLite builds without FTS5, fall back
+# to the old ILIKE filters.
+
+asset_search = table('asset_search', column('rowid'), column('doc_id'), column('rank'),
+                     column('serial'), column('model'), column('holder'), column('branch'))
+employee_search = table('employee_search', column('rowid'), column('doc_id'), column('rank'),
+                        column('name'), column('emp_id'), column('branch'))
+
+# Column holding the asset/employee id in each backend's index table
+DOC_KEY = {'fts5': 'rowid', 'mysql': 'doc_id'}
+
+SCHEMA = {
+    'fts5': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS asset_search USING fts5(serial, model, holder, branch, prefix='2 3')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS employee_search USING fts5(name, emp_id, branch, prefix='2 3')",
+    ],
+    'mysql': [
+        "CREATE TABLE IF NOT EXISTS asset_search (doc_id INTEGER PRIMARY KEY, serial VARCHAR(100), model VARCHAR(100), "
+        "holder VARCHAR(100), branch VARCHAR(100), "
+        "FULLTEXT KEY ft_asset_all (serial, model, holder, branch) WITH PARSER ngram, "
+        "FULLTEXT KEY ft_asset_item (serial, model) WITH PARSER ngram) ENGINE=InnoDB",
+        "CREATE TABLE IF NOT EXISTS employee_search (doc_id INTEGER PRIMARY KEY, name VARCHAR(100), emp_id VARCHAR(50), "
+        "branch VARCHAR(100), FULLTEXT KEY ft_employee_all (name, emp_id, branch) WITH PARSER ngram) ENGINE=InnoDB",
+    ],
+}
+
+ASSET_DOCS = """
+    SELECT a.id, a.serial_number, COALESCE(a.model, ''), COALESCE(e.name, ''), COALESCE(b.name, '')
+    FROM asset a
+    LEFT JOIN employee e ON e.id = a.current_employee_id
+    LEFT JOIN branch b ON b.id = a.current_branch_id
+"""
+EMPLOYEE_DOCS = """
+    SELECT e.id, e.name, e.emp_id, COALESCE(b.name, '')
+    FROM employee e
+    LEFT JOIN branch b ON b.id = e.branch_id
+"""
+ASSET_SCOPE = "WHERE a.id IN :assets OR a.current_employee_id IN :employees OR a.current_branch_id IN :branches"
+EMPLOYEE_SCOPE = "WHERE e.id IN :employees OR e.branch_id IN :branches"
+
+def search_backend():
+    return current_app.extensions.get('search_backend')
+
+def _detect_backend(engine):
+    if engine.dialect.name == 'sqlite':
+        return 'fts5'
+    if engine.dialect.name == 'mysql':
+        return 'mysql'
+    return None
+
+def init_search_index(app):
+    """Create the index tables if needed (filling them on first creation)."""
+    backend = _detect_backend(db.engine)
+    fresh = False
+    if backend:
+        try:
+            fresh = not inspect(db.engine).has_table('asset_search')
+            with db.engine.begin() as conn:
+                for ddl in SCHEMA[backend]:
+                    conn.execute(text(ddl))
+        except (OperationalError, ProgrammingError) as e:
+            app.logger.warning(f"Full-text search unavailable, using ILIKE search: {e}")
+            backend = None
+    app.extensions['search_backend'] = backend
+    if backend and fresh:
+        rebuild_search_index()
+    if not event.contains(db.session, 'after_flush', _sync_index):
+        event.listen(db.session, 'after_flush', _sync_index)
+
+INDEX_TABLES = (
+    ('asset_search', 'serial, model, holder, branch', ASSET_DOCS, "SELECT a.id FROM asset a", ASSET_SCOPE),
+    ('employee_search', 'name, emp_id, branch', EMPLOYEE_DOCS, "SELECT e.id FROM employee e", EMPLOYEE_SCOPE),
+)
+
+def _write_docs(conn, backend, assets=(), employees=(), branches=(), full=False):
+    key = DOC_KEY[backend]
+    scope = {
+        'assets': list(assets) or [-1],
+        'employees': list(employees) or [-1],
+        'branches': list(branches) or [-1],
+    }
+    for name, cols, docs, ids, where in INDEX_TABLES:
+        if full:
+            conn.execute(text(f"DELETE FROM {name}"))
+            conn.execute(text(f"INSERT INTO {name} ({key}, {cols}) {docs}"))
+            continue
+        params = dict((p, v) for p, v in scope.items() if f':{p}' in where)
+        binds = [bindparam(p, expanding=True) for p in params]
+        conn.execute(text(f"DELETE FROM {name} WHERE {key} IN ({ids} {where})").bindparams(*binds), params)
+        conn.execute(text(f"INSERT INTO {name} ({key}, {cols}) {docs} {where}").bindparams(*binds), params)
+
+def _drop_docs(conn, backend, assets=(), employees=()):
+    key = DOC_KEY[backend]
+    for name, ids in (('asset_search', assets), ('employee_search', employees)):
+        if ids:
+            conn.execute(text(f"DELETE FROM {name} WHERE {key} IN :ids")
+                         .bindparams(bindparam('ids', expanding=True)), {'ids': list(ids)})
+
+def rebuild_search_index():
+    """Re-index every asset and employee. Commits."""
+    backend = search_backend()
+    if backend:
+        _write_docs(db.session.connection(), backend, full=True)
+        db.session.commit()
+    return backend
+
+INDEXED_FIELDS = {
+    Asset: ('serial_number', 'model', 'current_employee_id', 'current_branch_id'),
+    Employee: ('name', 'emp_id', 'branch_id'),
+    Branch: ('name',),
+}
+
+def _changed(obj):
+    state = inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in INDEXED_FIELDS[type(obj)])
+
+def _sync_index(session, flush_context):
+    backend = search_backend()
+    if not backend:
+        return
+    touched = {Asset: set(), Employee: set(), Branch: set()}
+    gone = {Asset: set(), Employee: set()}
+    for obj in list(session.new) + [o for o in session.dirty if type(o) in touched and _changed(o)]:
+        if type(obj) in touched:
+            touched[type(obj)].add(obj.id)
+    for obj in session.deleted:
+        if type(obj) in gone:
+            gone[type(obj)].add(obj.id)
+    if not any(touched.values()) and not any(gone.values()):
+        return
+    conn = session.connection()
+    _drop_docs(conn, backend, assets=gone[Asset], employees=gone[Employee])
+    if any(touched.values()):
+        # A renamed employee/branch changes the holder/branch text of their assets too
+        _write_docs(conn, backend, assets=touched[Asset] - gone[Asset],
+                    employees=touched[Employee] - gone[Employee], branches=touched[Branch])
+
+# --- Query Helpers ---
+def _tokens(term):
+    return re.findall(r'\w+', term or '')
+
+def _match_expr(backend, tbl, columns, term, restrict=None):
+    tokens = _tokens(term)
+    if backend == 'fts5':
+        # Every word must match as a prefix: "5cg elite" -> "5cg"* "elite"*
+        q = ' '.join(f'"{t}"*' for t in tokens)
+        if restrict:
+            q = '{%s} : (%s)' % (' '.join(restrict), q)
+        expr = literal_column(tbl.name).match(q)
+        return expr, tbl.c.rank
+    # ngram parser: each quoted word is a required substring
+    q = ' '.join(f'+"{t}"' for t in tokens)
+    expr = mysql_match(*[tbl.c[c] for c in (restrict or columns)], against=q).in_boolean_mode()
+    return expr, type_coerce(expr, Float) * -1
+
+def _hits(backend, tbl, columns, term, restrict=None):
+    expr, score = _match_expr(backend, tbl, columns, term, restrict)
+    return select(tbl.c[DOC_KEY[backend]].label('id'), score.label('score')).where(expr).subquery()
+
+def filter_assets(query, term):
+    """Restrict an Asset query (already joined to Branch/Employee) to `term`.
+
+    Returns (query, score); score is a "lower is better" relevance column, or
+    None when the ILIKE fallback was used.
+    """
+    backend = search_backend()
+    if not backend or not _tokens(term):
+        search_term = f"%{term}%"
+        return query.filter(
+            or_(
+                Asset.serial_number.ilike(search_term),
+                Asset.model.ilike(search_term),
+                Employee.name.ilike(search_term),
+                Branch.name.ilike(search_term)
+            )
+        ), None
+    hits = _hits(backend, asset_search, ('serial', 'model', 'holder', 'branch'), term)
+    return query.join(hits, hits.c.id == Asset.id), hits.c.score
+
+def filter_employees(query, term):
+    """Restrict an Employee query (already joined to Branch) to `term`.
+
+    Matches name, employee ID and branch, or the serial/model of any asset the
+    employee currently holds. Direct matches are ranked first.
+    """
+    backend = search_backend()
+    if not backend or not _tokens(term):
+        search_term = f"%{term}%"
+        holding = select(Asset.current_employee_id).where(or_(
+            Asset.serial_number.ilike(search_term),
+            Asset.model.ilike(search_term)
+        ))
+        return query.filter(
+            or_(
+                Employee.name.ilike(search_term),
+                Employee.emp_id.ilike(search_term),
+                Branch.name.ilike(search_term),
+                Employee.id.in_(holding)
+            )
+        )
+    hits = _hits(backend, employee_search, ('name', 'emp_id', 'branch'), term)
+    asset_hits = _hits(backend, asset_search, ('serial', 'model'), term, restrict=('serial', 'model'))
+    holding = select(Asset.current_employee_id).join(asset_hits, asset_hits.c.id == Asset.id)
+    return query.outerjoin(hits, hits.c.id == Employee.id)\
+        .filter(or_(hits.c.id.isnot(None), Employee.id.in_(holding)))\
+        .order_by(hits.c.score.is_(None), hits.c.score)
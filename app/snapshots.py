@@ -0,0 +1,149 @@
+# Path: app/snapshots.py
+from datetime import datetime, time, timedelta
+from sqlalchemy import event, inspect, select, insert, delete, func, literal, union_all, exists
+from app.extensions import db
+from app.models import Asset, AssetHistory, AssetSnapshot, Branch, FleetSnapshot
+from app.stats import summarize_fleet
+
+# --- Point-in-time fleet state ---
+# Every AssetHistory row stores the asset's state after the action
+# (post_action_status/branch/employee), so an asset's state at time T is the
+# one left by its last event at or before T. asset_states(T) works that out in
+# SQL for the whole fleet, starting from the newest FleetSnapshot at or before
+# T and only looking at events after it.
+#
+# Snapshots are taken at month starts (`flask fleet-snapshots`, e.g. from a
+# daily cron; missing months are filled in oldest first, each one built from
+# the previous). A history write dated at or before an existing snapshot
+# (revert, historical import) deletes the snapshots it makes stale; the next
+# run rebuilds them.
+#
+# Events written before post-action state was recorded have no status; they
+# count as 'In Stock' with no branch or holder, as in admin.revert_transaction.
+#
+# History timestamps are local time (datetime.now() in the routes), so "now"
+# and month starts here are local too.
+
+def month_start(when):
+    return datetime(when.year, when.month, 1)
+
+def parse_as_of(value):
+    """End of the given YYYY-MM-DD day, or None when blank/invalid."""
+    try:
+        day = datetime.strptime(value or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    return datetime.combine(day, time.max)
+
+def latest_snapshot(when):
+    return FleetSnapshot.query.filter(FleetSnapshot.taken_at <= when)\
+        .order_by(FleetSnapshot.taken_at.desc()).first()
+
+def asset_states(when, snapshot=None):
+    """Subquery of (asset_id, status, branch_id, employee_id) for every asset known at `when`.
+
+    Only assets that had an event by then (or are in the starting snapshot)
+    appear; join it to Asset to drop assets deleted since.
+    """
+    snapshot = snapshot if snapshot is not None else latest_snapshot(when)
+    h = AssetHistory
+    window = [h.timestamp <= when]
+    if snapshot:
+        window.append(h.timestamp > snapshot.taken_at)
+    ranked = select(
+        h.asset_id,
+        func.coalesce(h.post_action_status, 'In Stock').label('status'),
+        h.post_action_branch_id.label('branch_id'),
+        h.post_action_employee_id.label('employee_id'),
+        func.row_number().over(partition_by=h.asset_id, order_by=(h.timestamp.desc(), h.id.desc())).label('rn'),
+    ).where(*window).subquery()
+    states = select(ranked.c.asset_id, ranked.c.status, ranked.c.branch_id, ranked.c.employee_id)\
+        .where(ranked.c.rn == 1)
+    if snapshot:
+        s = AssetSnapshot
+        moved = exists().where(h.asset_id == s.asset_id, *window)
+        carried = select(s.asset_id, s.status, s.branch_id, s.employee_id)\
+            .where(s.snapshot_id == snapshot.id, ~moved)
+        states = union_all(states, carried)
+    return states.subquery('asset_state')
+
+def fleet_stats_as_of(when, ho_name='HO'):
+    """The dashboard stats (see stats.fleet_stats) reconstructed for `when`."""
+    state = asset_states(when)
+    rows = db.session.query(state.c.status, state.c.branch_id, Branch.name, func.count())\
+        .join(Asset, Asset.id == state.c.asset_id)\
+        .outerjoin(Branch, state.c.branch_id == Branch.id)\
+        .group_by(state.c.status, state.c.branch_id, Branch.name).all()
+    return summarize_fleet(rows, ho_name)
+
+# --- Taking snapshots ---
+def take_snapshot(taken_at):
+    """Store every asset's state at `taken_at` in one INSERT ... SELECT. Commits."""
+    snapshot = FleetSnapshot.query.filter_by(taken_at=taken_at).first()
+    if snapshot:
+        return snapshot
+    state = asset_states(taken_at)
+    snapshot = FleetSnapshot(taken_at=taken_at)
+    db.session.add(snapshot)
+    db.session.flush()
+    rows = select(literal(snapshot.id), state.c.asset_id, state.c.status, state.c.branch_id, state.c.employee_id)\
+        .join(Asset, Asset.id == state.c.asset_id)
+    result = db.session.execute(insert(AssetSnapshot).from_select(
+        ['snapshot_id', 'asset_id', 'status', 'branch_id', 'employee_id'], rows))
+    snapshot.asset_count = result.rowcount
+    db.session.commit()
+    return snapshot
+
+def take_monthly_snapshots(until=None):
+    """Take every missing month-start snapshot up to `until` (default now), oldest first."""
+    first = db.session.query(func.min(AssetHistory.timestamp)).scalar()
+    if first is None:
+        return []
+    until = until or datetime.now()
+    existing = set(t for (t,) in db.session.query(FleetSnapshot.taken_at))
+    taken = []
+    month = month_start(first + timedelta(days=31))
+    while month <= until:
+        if month not in existing:
+            taken.append(take_snapshot(month))
+        month = month_start(month + timedelta(days=31))
+    return taken
+
+def drop_snapshots(since=None, session=None):
+    """Delete snapshots taken at or after `since` (all when None). Does not commit."""
+    session = session or db.session
+    stale = [FleetSnapshot.taken_at >= since] if since is not None else []
+    session.execute(delete(AssetSnapshot).where(
+        AssetSnapshot.snapshot_id.in_(select(FleetSnapshot.id).where(*stale))))
+    session.execute(delete(FleetSnapshot).where(*stale))
+
+# --- Invalidation ---
+STATE_COLUMNS = ('timestamp', 'asset_id', 'post_action_status', 'post_action_branch_id', 'post_action_employee_id')
+
+def _state_changed(entry):
+    attrs = inspect(entry).attrs
+    return any(attrs[name].history.has_changes() for name in STATE_COLUMNS)
+
+def _stale_since(session):
+    """Earliest event time touched by this flush's history inserts, edits and deletes."""
+    entries = [o for o in session.new if isinstance(o, AssetHistory)]
+    entries += [o for o in session.deleted if isinstance(o, AssetHistory)]
+    entries += [o for o in session.dirty if isinstance(o, AssetHistory) and _state_changed(o)]
+    stamps = []
+    for entry in entries:
+        stamps.append(entry.timestamp)
+        deleted = inspect(entry).attrs.timestamp.history.deleted
+        stamps.extend(deleted)  # an edited timestamp also changes the state at the old time
+    stamps = [t for t in stamps if t is not None]
+    return min(stamps) if stamps else None
+
+def _invalidate(session, flush_context, instances):
+    since = _stale_since(session)
+    # Snapshots are only taken at month starts up to now; a new row dated
+    # later than the current month start (the usual case) cannot be behind one
+    if since is not None and since <= month_start(datetime.now()):
+        drop_snapshots(since, session)
+
+def register_snapshot_tracking():
+    if not event.contains(db.session, 'before_flush', _invalidate):
+        event.listen(db.session, 'before_flush', _invalidate)
@@ -0,0 +1,129 @@
+# Path: app/stats.py
+from sqlalchemy import event, inspect, select, func
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Asset, Branch, FleetStat
+
+# --- Fleet Counters ---
+# FleetStat keeps one row per (status, branch) with the number of assets in it.
+# Rather than touching every route that moves an asset, a before_flush hook
+# diffs new/changed/deleted Asset rows and applies +1/-1 deltas in the same
+# transaction, so the routes, revert and the import scripts all stay in sync.
+# Assets without a branch count under branch_id 0, not NULL: the unique key
+# would let concurrent inserts create NULL rows twice.
+
+def _as_id(value):
+    return int(value) if value not in (None, '') else 0
+
+def _key(status, branch_id):
+    return (status, _as_id(branch_id))
+
+def _changed(asset):
+    state = inspect(asset)
+    return state.attrs.status.history.has_changes() or state.attrs.current_branch_id.history.has_changes()
+
+def _collect_deltas(session):
+    deltas = {}
+
+    def bump(key, n):
+        deltas[key] = deltas.get(key, 0) + n
+
+    for obj in session.new:
+        if isinstance(obj, Asset):
+            bump(_key(obj.status or 'In Stock', obj.current_branch_id), 1)
+
+    moved = [o for o in session.dirty if isinstance(o, Asset) and o.id and _changed(o)]
+    removed = [o for o in session.deleted if isinstance(o, Asset) and o.id]
+    ids = [o.id for o in moved + removed]
+    if ids:
+        # The database still holds the pre-flush values; read them in one go
+        # rather than trusting attribute history (expired attrs have none).
+        with session.no_autoflush:
+            before = dict((r.id, _key(r.status, r.current_branch_id)) for r in session.execute(
+                select(Asset.id, Asset.status, Asset.current_branch_id).where(Asset.id.in_(ids))))
+        for obj in moved:
+            if obj.id in before:
+                bump(before[obj.id], -1)
+                bump(_key(obj.status, obj.current_branch_id), 1)
+        for obj in removed:
+            if obj.id in before:
+                bump(before[obj.id], -1)
+
+    return dict((k, n) for k, n in deltas.items() if n)
+
+def _match(key):
+    status, branch_id = key
+    table = FleetStat.__table__
+    return (table.c.status.is_(None) if status is None else table.c.status == status,
+            table.c.branch_id == branch_id)
+
+def _apply_deltas(session, flush_context, instances):
+    deltas = _collect_deltas(session)
+    if not deltas:
+        return
+    table = FleetStat.__table__
+    conn = session.connection()
+
+    def bump(key, n):
+        return conn.execute(table.update().where(*_match(key)).values(count=table.c.count + n)).rowcount
+
+    for key, n in deltas.items():
+        if bump(key, n):
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(table.insert().values(status=key[0], branch_id=key[1], count=max(n, 0)))
+        except IntegrityError:
+            bump(key, n)  # another worker created the row first
+
+def register_stat_tracking():
+    if not event.contains(db.session, 'before_flush', _apply_deltas):
+        event.listen(db.session, 'before_flush', _apply_deltas)
+
+def rebuild_fleet_stats():
+    """Recount FleetStat from the asset table (backfill / repair). Commits."""
+    branch_id = func.coalesce(Asset.current_branch_id, 0)
+    rows = db.session.query(Asset.status, branch_id, func.count(Asset.id))\
+        .group_by(Asset.status, branch_id).all()
+    db.session.query(FleetStat).delete()
+    db.session.add_all([FleetStat(status=s, branch_id=b, count=n) for s, b, n in rows])
+    db.session.commit()
+    return len(rows)
+
+# --- Dashboard ---
+STATUS_KEYS = {'Allocated': 'allocated', 'In Stock': 'instock', 'Repair': 'repair', 'In Transit': 'transit'}
+
+def fleet_stats(ho_name='HO'):
+    """Dashboard stats from a single read of the counter table."""
+    rows = db.session.query(FleetStat.status, FleetStat.branch_id, Branch.name, FleetStat.count)\
+        .outerjoin(Branch, FleetStat.branch_id == Branch.id)\
+        .filter(FleetStat.count > 0).all()
+    if not rows and Asset.query.first() is not None:
+        rebuild_fleet_stats()
+        return fleet_stats(ho_name)
+    return summarize_fleet(rows, ho_name)
+
+def summarize_fleet(rows, ho_name='HO'):
+    """Dashboard stats from (status, branch_id, branch name, count) rows; branch_id None or 0 is no branch."""
+    stats = dict(total=0, allocated=0, instock=0, repair=0, transit=0,
+                 ho_stock=0, ho_allocated=0, branch_stock=0, branch_allocated=0)
+    by_branch = {}
+    for status, branch_id, branch_name, count in rows:
+        stats['total'] += count
+        if status in STATUS_KEYS:
+            stats[STATUS_KEYS[status]] += count
+        if branch_id:
+            scope = 'ho' if branch_name == ho_name else 'branch'
+            if status == 'In Stock':
+                stats[f'{scope}_stock'] += count
+            elif status == 'Allocated':
+                stats[f'{scope}_allocated'] += count
+            label = branch_name or f'Branch #{branch_id}'
+        else:
+            label = 'Transit/Unknown'
+        branch_counts = by_branch.setdefault(label, {'total': 0})
+        branch_counts[status] = branch_counts.get(status, 0) + count
+        branch_counts['total'] += count
+
+    stats['by_branch'] = sorted(by_branch.items())
+    return stats
@@ -0,0 +1,113 @@
+# Path: app/sticker_pdf.py
+import zlib
+from flask import current_app
+from app.qr_images import qr_images
+
+# --- PDF sticker sheets ---
+# Same A4 grid as qr/print.html (10mm padding, 5mm gap, cols x rows, start
+# offset), laid out server-side and written page by page so a sheet of
+# thousands of labels streams out as it is built. QR codes are drawn as vector
+# rectangles (cached by qr_images in the 'pdf' format) and the text uses the
+# standard PDF fonts, so nothing is embedded.
+#
+# Object numbers: 1 catalog, 2 page tree (written last, once every page is
+# known), 3-5 fonts, then a (page, content stream) pair per page.
+
+MM = 72 / 25.4
+PAGE_W, PAGE_H = 210 * MM, 297 * MM
+PADDING, GAP = 10 * MM, 5 * MM
+QR_SIZE, INSET = 25 * MM, 1.5 * MM
+
+FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold', 'F3': 'Courier-Bold'}
+
+def _pdf_text(value):
+    text = str(value or '').encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def _fmt(n):
+    return f"{n:.2f}".rstrip('0').rstrip('.')
+
+class _Writer:
+    def __init__(self):
+        self.offset = 0
+        self.xref = {}
+
+    def raw(self, data):
+        self.offset += len(data)
+        return data
+
+    def obj(self, num, body, stream=None):
+        self.xref[num] = self.offset
+        if stream is not None:
+            data = b"%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n" % (num, body, stream)
+        else:
+            data = b"%d 0 obj\n%s\nendobj\n" % (num, body)
+        return self.raw(data)
+
+    def trailer(self):
+        size = max(self.xref) + 1
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.xref.get(n, 0):010d} 00000 {'n' if n in self.xref else 'f'} \n" for n in range(1, size)]
+        lines.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{self.offset}\n%%EOF\n")
+        return ''.join(lines).encode('ascii')
+
+def _sticker(x, top, width, height, ops, serial, model):
+    size_line, _, rects = ops.decode('ascii').partition('\n')
+    qr = min(QR_SIZE, height - 2 * INSET, width / 2)
+    scale = qr / int(size_line)
+    qr_x = x + INSET
+    qr_top = top - (height - qr) / 2
+    text_x = qr_x + qr + 2.5 * MM
+    baseline = top - height / 2 + 14
+    return (
+        f"q {_fmt(x)} {_fmt(top - height)} {_fmt(width)} {_fmt(height)} re W n\n"
+        f"q {scale:.4f} 0 0 {-scale:.4f} {_fmt(qr_x)} {_fmt(qr_top)} cm {rects} f Q\n"
+        f"BT /F2 7.5 Tf {_fmt(text_x)} {_fmt(baseline)} Td (PROPERTY OF COMPANY) Tj"
+        f" /F3 9 Tf 0 -10.5 Td ({_pdf_text(serial)}) Tj"
+        f" /F1 7.5 Tf 0 -10 Td ({_pdf_text(model)}) Tj"
+        f" 0 -10 Td (SCAN FOR INFO) Tj ET\nQ\n"
+    )
+
+def stream_sticker_pdf(labels, cols=3, rows=8, start_pos=0):
+    """Yield a PDF sheet for (qr_hash, url, serial, model) labels, one page at a time."""
+    cols, rows, start_pos = max(cols, 1), max(rows, 1), max(start_pos, 0)
+    per_page = cols * rows
+    width = (PAGE_W - 2 * PADDING - GAP * (cols - 1)) / cols
+    height = (PAGE_H - 2 * PADDING - GAP * (rows - 1)) / rows
+    # Render whole pages at a time, enough of them to use the render pool
+    threshold = current_app.config.get('QR_PARALLEL_THRESHOLD', 64)
+    batch = per_page * max(1, -(-threshold // per_page))
+
+    out = _Writer()
+    yield out.raw(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield out.obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    font_refs = []
+    for num, (name, base) in enumerate(FONTS.items(), start=3):
+        yield out.obj(num, f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>".encode('ascii'))
+        font_refs.append(f"/{name} {num} 0 R")
+    resources = f"<< /Font << {' '.join(font_refs)} >> >>"
+
+    slots = [None] * start_pos + list(labels)
+    kids, num = [], 3 + len(FONTS)
+    for first in range(0, max(len(slots), 1), batch):
+        chunk = slots[first:first + batch]
+        wanted = [label for label in chunk if label]
+        images = iter(qr_images([(qr_hash, url) for qr_hash, url, _, _ in wanted], fmt='pdf', border=1))
+        for page_start in range(0, max(len(chunk), 1), per_page):
+            content = []
+            for i, label in enumerate(chunk[page_start:page_start + per_page]):
+                if not label:
+                    continue  # blank for offset
+                row, col = divmod(i, cols)
+                x = PADDING + col * (width + GAP)
+                top = PAGE_H - PADDING - row * (height + GAP)
+                content.append(_sticker(x, top, width, height, next(images), label[2], label[3]))
+            stream = zlib.compress(''.join(content).encode('latin-1'))
+            yield out.obj(num, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_fmt(PAGE_W)} {_fmt(PAGE_H)}] "
+                                f"/Resources {resources} /Contents {num + 1} 0 R >>").encode('ascii'))
+            yield out.obj(num + 1, f"<< /Filter /FlateDecode /Length {len(stream)} >>".encode('ascii'), stream)
+            kids.append(f"{num} 0 R")
+            num += 2
+
+    yield out.obj(2, f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode('ascii'))
+    yield out.trailer()
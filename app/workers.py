@@ -0,0 +1,112 @@
+# Path: app/workers.py
+import atexit
+import os
+import queue
+import threading
+import time
+
+# --- Background workers ---
+# The scan log writer, proof renditions and the job runner all hand work from
+# requests to daemon threads. BackgroundWorker is what they share: a queue,
+# threads started on first use in each process (threads don't survive a
+# fork), optional batching, and a stop/drain at interpreter exit. Subclasses
+# only implement handle(items), which runs inside an app context. With
+# run_async off (tests, CLI) put() handles each item in the calling thread.
+
+_STOP = object()
+
+class BackgroundWorker:
+    name = 'worker'       # thread name (suffixed with a number when threads > 1)
+    threads = 1
+    batch_size = 1        # handle() gets up to this many items...
+    flush_interval = 0    # ...once the first has waited this many seconds
+    idle_interval = None  # seconds without items after which handle([]) runs (None: never)
+    join_timeout = 10     # seconds close() waits for each thread
+
+    def __init__(self, app, run_async=True):
+        self.app = app
+        self.run_async = run_async
+        self._queue = queue.Queue()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def handle(self, items):
+        raise NotImplementedError
+
+    def put(self, item):
+        """Queue one item for the threads, or handle it now when run_async is off."""
+        if not self.run_async:
+            self._handle([item])
+            return
+        self.ensure_started()
+        self._queue.put(item)
+
+    def _running(self):
+        return self._pid == os.getpid() and bool(self._threads) and all(t.is_alive() for t in self._threads)
+
+    def ensure_started(self):
+        """Start this process's threads unless they are running (no-op when run_async is off)."""
+        if not self.run_async or self._running():
+            return
+        with self._lock:
+            if not self._running():
+                self._pid = os.getpid()
+                names = [f'{self.name}-{i}' for i in range(self.threads)] if self.threads > 1 else [self.name]
+                self._threads = [threading.Thread(target=self._run, name=name, daemon=True) for name in names]
+                for thread in self._threads:
+                    thread.start()
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            timeout = self.idle_interval if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                if batch:
+                    self._handle(batch)
+                return
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            elif deadline is None:
+                self._handle([])  # idle_interval passed
+                continue
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._handle(batch)
+                batch, deadline = [], None
+
+    def _handle(self, items):
+        with self.app.app_context():
+            try:
+                self.handle(items)
+            except Exception:
+                self.app.logger.exception(f"{self.name} failed on {len(items)} item(s)")
+
+    def flush(self):
+        """Handle everything queued so far in the calling thread (tests, CLI)."""
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                items.append(item)
+        for i in range(0, len(items), self.batch_size):
+            self._handle(items[i:i + self.batch_size])
+
+    def close(self):
+        """Stop this process's threads after what is queued, or handle it here if none run."""
+        if self._running():
+            for _ in self._threads:
+                self._queue.put(_STOP)
+            for thread in self._threads:
+                thread.join(timeout=self.join_timeout)
+        else:
+            self.flush()
@@ -5,11 +5,56 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-for-fallback'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///production_assets.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Engine tuning (app/engine.py): 'production' = MySQL pool settings or
+    # SQLite WAL/busy-timeout pragmas; 'stock' = driver defaults
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'production')
+    DB_POOL_SIZE = int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None
+    DB_MAX_OVERFLOW = int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+    DB_BUSY_TIMEOUT = int(os.environ['DB_BUSY_TIMEOUT']) if os.environ.get('DB_BUSY_TIMEOUT') else None  # ms, SQLite
     
     # Robust Upload Configuration for Production (AWS/Linux)
     # Uses the directory of this file as the base anchor
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    UPLOAD_FOLDER = os.path.join(BASE_DIR, 'app', 'static', 'uploads')
+    # Proof documents are served only through /assets/documents/ (login
+    # required), so they live outside app/static
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(BASE_DIR, 'uploads')
+    LEGACY_UPLOAD_FOLDER = os.path.join(BASE_DIR, 'app', 'static', 'uploads')  # moved by scripts/update_db.py
+    
+    QR_CACHE_FOLDER = os.path.join(BASE_DIR, 'qr_cache')  # rendered sticker images
+    QR_STICKER_FORMAT = os.environ.get('QR_STICKER_FORMAT', 'png1')  # png1 | svg | png | pdf
+    QR_PARALLEL_THRESHOLD = 64  # uncached stickers before rendering moves to a process pool
+    QR_RENDER_WORKERS = int(os.environ.get('QR_RENDER_WORKERS', 0)) or None  # None = one per CPU
     
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024 # 16MB Max Size
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'doc', 'docx'}
\ No newline at end of file
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'doc', 'docx'}
+
+    # Photo proofs get a downscaled display copy and a thumbnail, rendered by
+    # a background thread (app/proof_images.py); sizes are the longest side in px
+    PROOF_IMAGES_ASYNC = os.environ.get('PROOF_IMAGES_ASYNC', '1') != '0'
+    PROOF_DISPLAY_SIZE = int(os.environ.get('PROOF_DISPLAY_SIZE', 1600))
+    PROOF_THUMB_SIZE = int(os.environ.get('PROOF_THUMB_SIZE', 320))
+
+    # Public scan logging: events are buffered and bulk-inserted by a background
+    # thread. Repeat scans of one QR from the same IP within the coalesce window
+    # are logged once (0 = log every scan).
+    SCANLOG_ASYNC = os.environ.get('SCANLOG_ASYNC', '1') != '0'
+    SCANLOG_BATCH_SIZE = int(os.environ.get('SCANLOG_BATCH_SIZE', 100))
+    SCANLOG_FLUSH_INTERVAL = float(os.environ.get('SCANLOG_FLUSH_INTERVAL', 2.0))
+    SCANLOG_COALESCE_SECONDS = int(os.environ.get('SCANLOG_COALESCE_SECONDS', 0))
+
+    # Retention (`flask scan-archive`, app/scan_archive.py): raw scans older
+    # than this many days move to gzip JSON-lines files, one per day
+    SCANLOG_RETENTION_DAYS = int(os.environ.get('SCANLOG_RETENTION_DAYS', 90))
+    SCANLOG_ARCHIVE_FOLDER = os.environ.get('SCANLOG_ARCHIVE_FOLDER') or os.path.join(BASE_DIR, 'scan_archive')
+
+    # Background jobs (app/jobs.py): exports, imports and sticker batches run
+    # in JOB_WORKERS threads per web process; results are kept for download
+    # under JOB_RESULT_FOLDER for JOB_RETENTION_DAYS (`flask prune-jobs`)
+    JOBS_ASYNC = os.environ.get('JOBS_ASYNC', '1') != '0'
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2.0))
+    JOB_STALE_SECONDS = 900  # no progress for this long: the process running it died
+    JOB_RESULT_FOLDER = os.environ.get('JOB_RESULT_FOLDER') or os.path.join(BASE_DIR, 'job_results')
+    JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+    PRINT_JOB_THRESHOLD = 200  # stickers per print request before it becomes a job
@@ -1,3 +1,4 @@
+import click
 from app import create_app, db
 from app.models import User
 
@@ -17,5 +18,92 @@ def create_admin():
     else:
         print("Admin user already exists.")
 
+# Month-start fleet snapshots for the "as of" views (see app/snapshots.py)
+# Run via terminal (e.g. daily from cron): flask fleet-snapshots
+@app.cli.command("fleet-snapshots")
+@click.option('--rebuild', is_flag=True, help="Drop every snapshot and take them again from history.")
+def fleet_snapshots(rebuild):
+    """Takes any missing monthly fleet snapshots."""
+    from app.snapshots import take_monthly_snapshots, drop_snapshots
+    if rebuild:
+        drop_snapshots()
+        db.session.commit()
+    taken = take_monthly_snapshots()
+    for snapshot in taken:
+        print(f"  [OK] {snapshot.taken_at:%Y-%m-%d}: {snapshot.asset_count} assets")
+    print(f"{len(taken)} snapshot(s) taken.")
+
+# Moves raw scans past the retention period into daily archive files (see app/scan_archive.py)
+# Run via terminal (e.g. nightly from cron): flask scan-archive
+@app.cli.command("scan-archive")
+@click.option('--days', type=int, help="Keep this many days of raw scans (default SCANLOG_RETENTION_DAYS).")
+def scan_archive(days):
+    """Archives old scan log rows to gzip JSON-lines files."""
+    from app.scan_archive import archive_scan_logs
+    archived_days, scans = archive_scan_logs(days)
+    print(f"{scans} scan(s) from {archived_days} day(s) archived to {app.config['SCANLOG_ARCHIVE_FOLDER']}")
+
+# Reads scans back out of the archive files, one JSON object per line
+# Run via terminal: flask scan-query --from 2025-01-01 --to 2025-01-31 --qr 3fa2
+@app.cli.command("scan-query")
+@click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d']), required=True)
+@click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d']), required=True)
+@click.option('--qr', 'qr_hash', help="QR hash or its first characters.")
+@click.option('--asset', 'asset_id', type=int, help="Linked asset id.")
+@click.option('--count', is_flag=True, help="Only print the number of matching scans.")
+def scan_query(start, end, qr_hash, asset_id, count):
+    """Queries archived scans between two dates (inclusive)."""
+    import json
+    from app.scan_archive import archived_scans
+    scans = archived_scans(start, end, qr_hash=qr_hash and qr_hash.lower(), asset_id=asset_id)
+    if count:
+        print(sum(1 for _ in scans))
+        return
+    for record in scans:
+        click.echo(json.dumps(record))
+
+# Run via terminal: flask scan-rollups
+@app.cli.command("scan-rollups")
+def scan_rollups():
+    """Recounts the hourly/daily scan rollups from the raw scan log."""
+    from app.scan_stats import rebuild_scan_rollups
+    print(f"{rebuild_scan_rollups()} rollup bucket(s) rebuilt.")
+
+# Deletes stored proof files that no history row references (see app/documents.py)
+# Run via terminal (e.g. weekly from cron): flask prune-documents
+@app.cli.command("prune-documents")
+def prune_documents():
+    """Removes unreferenced proof documents from the upload store."""
+    from app.documents import prune_orphans
+    print(f"{prune_orphans()} unreferenced document(s) removed.")
+
+# Renders missing display copies/thumbnails of photo proofs (see app/proof_images.py)
+# Run via terminal (e.g. after update_db.py moved old uploads into the store): flask proof-images
+@app.cli.command("proof-images")
+def proof_images():
+    """Renders any missing proof image renditions."""
+    from app.models import StoredDocument
+    from app.proof_images import is_image, render_renditions
+    worker = app.extensions['proof_images']
+    written = failed = 0
+    for (path,) in db.session.query(StoredDocument.path).filter(StoredDocument.ref_count > 0):
+        if not is_image(path):
+            continue
+        try:
+            written += render_renditions(worker.folder, path, worker.sizes)
+        except Exception as e:
+            failed += 1
+            print(f"  [FAIL] {path}: {e}")
+    print(f"{written} rendition(s) written, {failed} image(s) failed.")
+
+# Deletes finished background jobs and their result files (see app/jobs.py)
+# Run via terminal (e.g. daily from cron): flask prune-jobs
+@app.cli.command("prune-jobs")
+@click.option('--days', type=int, help="Keep finished jobs this many days (default JOB_RETENTION_DAYS).")
+def prune_jobs(days):
+    """Removes old finished jobs and their results."""
+    from app.jobs import prune_jobs as prune
+    print(f"{prune(days)} finished job(s) removed.")
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
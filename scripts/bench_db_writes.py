@@ -0,0 +1,129 @@
+import sys
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+# Add parent directory to path so we can import the app
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from config import Config
+from app import create_app, db
+from app.models import Asset, AssetHistory, Branch
+from app.stats import rebuild_fleet_stats
+from app.search import rebuild_search_index
+
+# --- Concurrent write benchmark ---
+# Starts N processes (standing in for gunicorn workers) that each loop over a
+# request-sized unit of work for a fixed time: read one asset, change its
+# status, log an AssetHistory row and commit, with a list-page read in between.
+# Every engine profile (app/engine.py) is run against its own freshly seeded
+# database so results compare like with like.
+#
+#   python scripts/bench_db_writes.py                      # SQLite, every profile
+#   python scripts/bench_db_writes.py --workers 8 --seconds 20
+#   python scripts/bench_db_writes.py --database-url mysql+pymysql://... --profile production
+#
+# A MySQL URL is used as-is (the benchmark writes into it), so point it at a
+# scratch database.
+
+STATUSES = ['In Stock', 'Repair']
+
+def bench_config(uri, profile):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = uri
+        DB_PROFILE = profile
+        SCANLOG_ASYNC = False
+    return BenchConfig
+
+def seed(config, assets):
+    app = create_app(config)
+    with app.app_context():
+        if Asset.query.first():
+            return app
+        branch = Branch(name='HO', location='HO')
+        db.session.add(branch)
+        db.session.commit()
+        rows = [dict(serial_number=f'BENCH{i:06}', brand='HP', model=f'M{i % 20}', status='In Stock',
+                     current_branch_id=branch.id, is_qr_active=True, version=1) for i in range(assets)]
+        db.session.execute(insert(Asset.__table__), rows)
+        db.session.commit()
+        rebuild_fleet_stats()
+        rebuild_search_index()
+    return app
+
+def worker(config, seconds, assets, results):
+    app = create_app(config)
+    done = locked = 0
+    latencies = []
+    with app.app_context():
+        ids = [row[0] for row in db.session.query(Asset.id).all()]
+        db.session.remove()
+        rng = random.Random(os.getpid())
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                # List-page read, then the write of a lifecycle action
+                Asset.query.filter_by(status='Repair').order_by(Asset.id.desc()).limit(20).all()
+                asset = db.session.get(Asset, rng.choice(ids))
+                old = asset.status
+                asset.status = STATUSES[1 - STATUSES.index(old)] if old in STATUSES else 'In Stock'
+                db.session.add(AssetHistory(asset_id=asset.id, action='Bench', from_detail=old, to_detail=asset.status,
+                                            timestamp=datetime.utcnow(), post_action_status=asset.status,
+                                            post_action_branch_id=asset.current_branch_id))
+                db.session.commit()
+                done += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e) and 'busy' not in str(e).lower():
+                    raise
+                locked += 1
+            finally:
+                db.session.remove()
+    results.put((done, locked, latencies))
+
+def run(uri, profile, workers, seconds, assets):
+    config = bench_config(uri, profile)
+    seed(config, assets)
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(config, seconds, assets, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    outcomes = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    done = sum(o[0] for o in outcomes)
+    locked = sum(o[1] for o in outcomes)
+    latencies = sorted(l for o in outcomes for l in o[2])
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    print(f"  {profile:<11} {done / seconds:>9,.0f} commits/s {locked:>7} locked errors "
+          f"{p95:>9.1f} ms p95 ({done} commits)")
+
+if __name__ == '__main__':
+    from app.engine import PROFILES
+    parser = argparse.ArgumentParser(description="Measure concurrent write throughput per engine profile.")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent processes (default 4)")
+    parser.add_argument('--seconds', type=float, default=10, help="run time per profile (default 10)")
+    parser.add_argument('--assets', type=int, default=5000, help="assets to seed (default 5000)")
+    parser.add_argument('--profile', choices=list(PROFILES), action='append', help="profile(s) to run (default all)")
+    parser.add_argument('--database-url', help="benchmark this database instead of a temporary SQLite file")
+    args = parser.parse_args()
+
+    print(f"--- {args.workers} workers x {args.seconds:g}s ---")
+    for profile in args.profile or list(PROFILES):
+        if args.database_url:
+            run(args.database_url, profile, args.workers, args.seconds, args.assets)
+            continue
+        folder = tempfile.mkdtemp(prefix='bench_db_')
+        try:
+            run('sqlite:///' + os.path.join(folder, 'bench.db'), profile, args.workers, args.seconds, args.assets)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
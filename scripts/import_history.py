@@ -1,161 +1,258 @@
 import sys
 import os
 import csv
+import json
+import time
+import argparse
 from datetime import datetime
 
 # Add parent directory to path so we can import the app
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from sqlalchemy import insert
 from app import create_app, db
-from app.models import Asset, Branch, Employee, AssetHistory, User
+from app.models import Asset, Branch, Employee, AssetHistory, User, SystemSetting
+from app.snapshots import drop_snapshots
 
 app = create_app()
 
-def get_or_create_branch(name):
-    branch = Branch.query.filter_by(name=name).first()
-    if not branch:
-        # Default location to name if not specified
-        branch = Branch(name=name, location=name)
-        db.session.add(branch)
-        db.session.commit()
-        print(f"  [+] Created Branch: {name}")
-    return branch
-
-def get_or_create_employee(emp_id, name, branch_id):
-    emp = Employee.query.filter_by(emp_id=emp_id).first()
-    if not emp:
-        emp = Employee(emp_id=emp_id, name=name, branch_id=branch_id)
-        db.session.add(emp)
+# --- Replay State ---
+# Events are applied to in-memory maps (serial -> Asset, branch/employee
+# lookups) and written in chunked transactions: one flush for the asset
+# changes and one bulk insert for the history rows per chunk. The number of
+# CSV rows done is saved in SystemSetting in the same transaction, so an
+# interrupted import re-run with the same file continues after the last
+# committed chunk instead of replaying it twice.
+
+class Replay:
+    def __init__(self, sys_user_id):
+        self.sys_user_id = sys_user_id
+        self.assets = dict((a.serial_number, a) for a in Asset.query.all())
+        self.branches = dict((b.name, b) for b in Branch.query.all())
+        self.branch_names = dict((b.id, b.name) for b in self.branches.values())
+        self.employees = dict((e.emp_id, e) for e in Employee.query.all())
+        self.employee_names = dict((e.id, e.name) for e in self.employees.values())
+        self.history = []  # (asset, column values) waiting for the chunk's bulk insert
+
+    def get_or_create_branch(self, name):
+        branch = self.branches.get(name)
+        if not branch:
+            # Default location to name if not specified
+            branch = Branch(name=name, location=name)
+            db.session.add(branch)
+            db.session.flush()
+            self.branches[name] = branch
+            self.branch_names[branch.id] = name
+            print(f"  [+] Created Branch: {name}")
+        return branch
+
+    def get_or_create_employee(self, emp_id, name, branch_id):
+        emp = self.employees.get(emp_id)
+        if not emp:
+            emp = Employee(emp_id=emp_id, name=name, branch_id=branch_id)
+            db.session.add(emp)
+            db.session.flush()
+            self.employees[emp_id] = emp
+            self.employee_names[emp.id] = name
+            print(f"  [+] Created Employee: {name} ({emp_id})")
+        return emp
+
+    def log(self, asset, event_date, **values):
+        # Snapshot the post-action state now; the asset may change again in this chunk
+        values.update(timestamp=event_date, created_by_user_id=self.sys_user_id,
+                      post_action_status=asset.status, post_action_branch_id=asset.current_branch_id,
+                      post_action_employee_id=asset.current_employee_id)
+        self.history.append((asset, values))
+
+    def apply(self, row):
+        """Apply one CSV event; returns an error message or None."""
+        # Parse Date (Format: YYYY-MM-DD)
+        event_date = datetime.strptime(row['Date'], '%Y-%m-%d')
+        action = row['Action'].upper() # PURCHASE, ALLOCATE, RETURN, TRANSFER, REPAIR
+        serial = row['Serial']
+
+        # 1. Handle PURCHASE (Creates the Asset)
+        if action == 'PURCHASE':
+            if serial in self.assets:
+                return f"Asset {serial} already exists."
+            branch = self.get_or_create_branch(row['Location_Branch'])
+            asset = Asset(
+                serial_number=serial,
+                brand=row['Brand'],
+                model=row['Model'],
+                status='In Stock',
+                current_branch_id=branch.id,
+                purchase_date=event_date
+            )
+            db.session.add(asset)
+            self.assets[serial] = asset
+            self.log(asset, event_date, action="Purchase", from_detail="Vendor",
+                     to_detail=f"Stock ({branch.name})", to_branch_id=branch.id)
+            return None
+
+        asset = self.assets.get(serial)
+        if not asset:
+            return f"Asset {serial} not found."
+
+        # 2. Handle ALLOCATION
+        if action == 'ALLOCATE':
+            # Get Employee details
+            branch = self.get_or_create_branch(row['Location_Branch']) # Emp Branch
+            emp = self.get_or_create_employee(row['Emp_ID'], row['Emp_Name'], branch.id)
+
+            branch_name = self.branch_names.get(asset.current_branch_id)
+            old_loc = f"Stock ({branch_name})" if branch_name else "Unknown"
+            old_branch_id = asset.current_branch_id
+
+            # Update Asset State
+            asset.status = 'Allocated'
+            asset.current_employee_id = emp.id
+            asset.allocated_at = event_date
+            self.log(asset, event_date, action="Allocation", from_detail=old_loc,
+                     to_detail=f"{emp.name} ({emp.emp_id})", from_branch_id=old_branch_id, to_employee_id=emp.id)
+
+        # 3. Handle RETURN (To Stock)
+        elif action == 'RETURN':
+            branch = self.get_or_create_branch(row['Location_Branch'])
+            from_who = self.employee_names.get(asset.current_employee_id, "Unknown")
+            from_emp_id = asset.current_employee_id
+
+            asset.status = 'In Stock'
+            asset.current_employee_id = None
+            asset.current_branch_id = branch.id
+            asset.allocated_at = None
+            self.log(asset, event_date, action="Return", from_detail=from_who,
+                     to_detail=f"Stock ({branch.name})", from_employee_id=from_emp_id, to_branch_id=branch.id)
+
+        # 4. Handle TRANSFER
+        elif action == 'TRANSFER':
+            target_branch = self.get_or_create_branch(row['Location_Branch'])
+            old_loc = self.branch_names.get(asset.current_branch_id, "Transit")
+            old_branch_id = asset.current_branch_id
+
+            # Assumption: Historic data implies transfer completed.
+            # We set it to 'In Stock' at new branch for simplicity of "History Replay"
+            asset.status = 'In Stock'
+            asset.current_branch_id = target_branch.id
+            asset.current_employee_id = None
+            asset.allocated_at = None
+            self.log(asset, event_date, action="Transfer", from_detail=f"Branch {old_loc}",
+                     to_detail=f"Branch ({target_branch.name})", courier_details=row.get('Courier', ''),
+                     from_branch_id=old_branch_id, to_branch_id=target_branch.id)
+
+        # 5. Handle REPAIR (holder, if any, keeps the asset on record)
+        elif action == 'REPAIR':
+            if asset.current_employee_id:
+                from_who = f"{self.employee_names.get(asset.current_employee_id, 'Unknown')} (Allocated)"
+            else:
+                branch_name = self.branch_names.get(asset.current_branch_id)
+                from_who = f"Stock ({branch_name})" if branch_name else "Unknown"
+            asset.status = 'Repair'
+            self.log(asset, event_date, action="Sent to Repair", from_detail=from_who, to_detail="Repair Center",
+                     from_employee_id=asset.current_employee_id,
+                     from_branch_id=None if asset.current_employee_id else asset.current_branch_id)
+
+        else:
+            return f"Unknown action {action} for {serial}."
+        return None
+
+    def write_chunk(self, checkpoint_key, rows_done):
+        """Flush asset changes, bulk-insert the chunk's history and record the checkpoint."""
+        db.session.flush()  # new assets get their ids here
+        if self.history:
+            rows = []
+            for asset, values in self.history:
+                row = dict(HISTORY_DEFAULTS, asset_id=asset.id)
+                row.update(values)
+                rows.append(row)
+            db.session.execute(insert(AssetHistory.__table__), rows)
+            drop_snapshots(min(row['timestamp'] for row in rows))  # replayed events are back-dated
+        save_checkpoint(checkpoint_key, rows_done)
         db.session.commit()
-        print(f"  [+] Created Employee: {name} ({emp_id})")
-    return emp
+        written = len(self.history)
+        self.history = []
+        return written
+
+# Every history dict carries the same keys so a chunk goes out as one executemany
+HISTORY_DEFAULTS = dict(courier_details=None, from_employee_id=None, to_employee_id=None,
+                        from_branch_id=None, to_branch_id=None)
+
+# --- Checkpoints ---
+def checkpoint_key(filename):
+    return f"import_history:{os.path.basename(filename)}"[:50]
+
+def load_checkpoint(key):
+    setting = SystemSetting.query.filter_by(key=key).first()
+    return json.loads(setting.value)['rows'] if setting and setting.value else 0
+
+def save_checkpoint(key, rows_done):
+    setting = SystemSetting.query.filter_by(key=key).first()
+    if not setting:
+        setting = SystemSetting(key=key)
+        db.session.add(setting)
+    setting.value = json.dumps({'rows': rows_done, 'at': datetime.now().isoformat(timespec='seconds')})
 
-def process_csv(filename):
+def process_csv(filename, chunk_size=500, restart=False):
+    started = time.perf_counter()
     with app.app_context():
+        # Assets stay in the serial map across chunk commits
+        db.session().expire_on_commit = False
+
         # Ensure we have a system user for the logs
         system_user = User.query.filter_by(email='admin@company.com').first()
         sys_user_id = system_user.id if system_user else None
 
+        key = checkpoint_key(filename)
+        skip = 0 if restart else load_checkpoint(key)
+        replay = Replay(sys_user_id)
+
         with open(filename, 'r') as f:
             reader = csv.DictReader(f)
-            
-            print("--- STARTING HISTORICAL IMPORT ---")
-            
+
+            if skip:
+                print(f"--- RESUMING HISTORICAL IMPORT after row {skip} ---")
+            else:
+                print("--- STARTING HISTORICAL IMPORT ---")
+
+            done = applied = errors = history_count = 0
             for row in reader:
-                # Parse Date (Format: YYYY-MM-DD)
-                event_date = datetime.strptime(row['Date'], '%Y-%m-%d')
-                action = row['Action'].upper() # PURCHASE, ALLOCATE, RETURN, TRANSFER, REPAIR
-                serial = row['Serial']
-                
-                print(f"Processing {row['Date']}: {action} for {serial}")
-
-                # 1. Handle PURCHASE (Creates the Asset)
-                if action == 'PURCHASE':
-                    branch = get_or_create_branch(row['Location_Branch'])
-                    
-                    asset = Asset(
-                        serial_number=serial,
-                        brand=row['Brand'],
-                        model=row['Model'],
-                        status='In Stock',
-                        current_branch_id=branch.id,
-                        purchase_date=event_date
-                    )
-                    db.session.add(asset)
-                    db.session.commit()
-                    
-                    # Log History manually with PAST date
-                    hist = AssetHistory(
-                        asset_id=asset.id,
-                        action="Purchase",
-                        from_detail="Vendor",
-                        to_detail=f"Stock ({branch.name})",
-                        timestamp=event_date,
-                        created_by_user_id=sys_user_id
-                    )
-                    db.session.add(hist)
-
-                # 2. Handle ALLOCATION
-                elif action == 'ALLOCATE':
-                    asset = Asset.query.filter_by(serial_number=serial).first()
-                    if not asset:
-                        print(f"  [!] Error: Asset {serial} not found.")
-                        continue
-                        
-                    # Get Employee details
-                    branch = get_or_create_branch(row['Location_Branch']) # Emp Branch
-                    emp = get_or_create_employee(row['Emp_ID'], row['Emp_Name'], branch.id)
-                    
-                    old_loc = f"Stock ({asset.branch.name})" if asset.branch else "Unknown"
-                    
-                    # Update Asset State
-                    asset.status = 'Allocated'
-                    asset.current_employee_id = emp.id
-                    
-                    # Log History
-                    hist = AssetHistory(
-                        asset_id=asset.id,
-                        action="Allocation",
-                        from_detail=old_loc,
-                        to_detail=f"{emp.name} ({emp.emp_id})",
-                        timestamp=event_date,
-                        created_by_user_id=sys_user_id
-                    )
-                    db.session.add(hist)
-
-                # 3. Handle RETURN (To Stock)
-                elif action == 'RETURN':
-                    asset = Asset.query.filter_by(serial_number=serial).first()
-                    branch = get_or_create_branch(row['Location_Branch'])
-                    
-                    from_who = asset.holder.name if asset.holder else "Unknown"
-                    
-                    asset.status = 'In Stock'
-                    asset.current_employee_id = None
-                    asset.current_branch_id = branch.id
-                    
-                    hist = AssetHistory(
-                        asset_id=asset.id,
-                        action="Return",
-                        from_detail=from_who,
-                        to_detail=f"Stock ({branch.name})",
-                        timestamp=event_date,
-                        created_by_user_id=sys_user_id
-                    )
-                    db.session.add(hist)
-
-                # 4. Handle TRANSFER
-                elif action == 'TRANSFER':
-                    asset = Asset.query.filter_by(serial_number=serial).first()
-                    target_branch = get_or_create_branch(row['Location_Branch'])
-                    
-                    old_loc = asset.branch.name if asset.branch else "Transit"
-                    
-                    # Assumption: Historic data implies transfer completed.
-                    # We set it to 'In Stock' at new branch for simplicity of "History Replay"
-                    asset.status = 'In Stock' 
-                    asset.current_branch_id = target_branch.id
-                    asset.current_employee_id = None
-                    
-                    hist = AssetHistory(
-                        asset_id=asset.id,
-                        action="Transfer",
-                        from_detail=f"Branch {old_loc}",
-                        to_detail=f"Branch ({target_branch.name})",
-                        courier_details=row.get('Courier', ''),
-                        timestamp=event_date,
-                        created_by_user_id=sys_user_id
-                    )
-                    db.session.add(hist)
-
-                db.session.commit()
-            
-            print("--- IMPORT COMPLETE ---")
+                done += 1
+                if done <= skip:
+                    continue
+                try:
+                    error = replay.apply(row)
+                except (KeyError, ValueError) as e:
+                    error = f"Bad row ({e})"
+                if error:
+                    errors += 1
+                    print(f"  [!] Row {done}: {error}")
+                else:
+                    applied += 1
+
+                if (done - skip) % chunk_size == 0:
+                    history_count += replay.write_chunk(key, done)
+                    elapsed = time.perf_counter() - started
+                    print(f"  [OK] {done} rows ({(done - skip) / elapsed:,.0f} rows/s)")
+
+            history_count += replay.write_chunk(key, done)
+
+        elapsed = time.perf_counter() - started
+        print(f"--- IMPORT COMPLETE: {done - skip} rows replayed ({applied} applied, {errors} errors), "
+              f"{history_count} history rows in {elapsed:.2f}s ({(done - skip) / elapsed if elapsed else 0:,.0f} rows/s) ---")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay historical asset events from CSV.")
     # Point this to your CSV file
-    csv_file = 'old_data.csv' 
-    if os.path.exists(csv_file):
-        process_csv(csv_file)
+    parser.add_argument('csv_file', nargs='?', default='old_data.csv')
+    parser.add_argument('--chunk-size', type=int, default=500, help="rows per transaction (default 500)")
+    parser.add_argument('--restart', action='store_true', help="ignore the saved checkpoint and start from row 1")
+    args = parser.parse_args()
+    if os.path.exists(args.csv_file):
+        try:
+            process_csv(args.csv_file, chunk_size=max(args.chunk_size, 1), restart=args.restart)
+        except Exception as e:
+            print(f"--- IMPORT STOPPED: {e} ---")
+            print("Everything up to the last [OK] line is saved; run the same command again to resume.")
+            raise SystemExit(1)
     else:
-        print(f"File {csv_file} not found. Please create it first.")
\ No newline at end of file
+        print(f"File {args.csv_file} not found. Please create it first.")
@@ -1,6 +1,9 @@
 import sys
 import os
 import csv
+import time
+import argparse
+from types import SimpleNamespace
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -8,8 +11,13 @@ from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from sqlalchemy import insert, select
 from app import create_app, db
 from app.models import Asset, Branch, Employee, AssetHistory, User
+from app.stats import rebuild_fleet_stats
+from app.search import rebuild_search_index
+from app.cache import bump_data_version
+from app.snapshots import drop_snapshots
 
 app = create_app()
 
@@ -49,173 +57,250 @@ def parse_date(date_str):
     except ValueError:
         return None
 
-def get_or_create_branch(name):
-    clean_name = name.strip()
-    branch = Branch.query.filter_by(name=clean_name).first()
-    if not branch:
-        branch = Branch(name=clean_name, location=clean_name)
-        db.session.add(branch)
-        db.session.commit()
-    return branch
+def insert_assets(assets):
+    """Bulk-insert asset dicts; returns {serial_number: id}."""
+    if db.session.get_bind().dialect.insert_returning:
+        return dict((serial, asset_id) for asset_id, serial in db.session.execute(
+            insert(Asset).returning(Asset.id, Asset.serial_number), assets))
+    # MySQL has no INSERT ... RETURNING: read the new ids back by serial (unique)
+    db.session.execute(insert(Asset), assets)
+    serials = [a['serial_number'] for a in assets]
+    return dict((serial, asset_id) for asset_id, serial in db.session.execute(
+        select(Asset.id, Asset.serial_number).where(Asset.serial_number.in_(serials))))
 
-def get_or_create_employee(emp_id, name, branch_id):
-    if not emp_id or not emp_id.strip():
-        return None
-    
-    clean_id = emp_id.strip()
-    emp = Employee.query.filter_by(emp_id=clean_id).first()
-    if not emp:
-        emp = Employee(emp_id=clean_id, name=name.strip(), branch_id=branch_id, status='Active')
-        db.session.add(emp)
-        db.session.commit()
-    return emp
+def load_rows(filename):
+    """Read the CSV and sort it by issue date (earliest allocation gets earliest stock)."""
+    rows = []
+    with open(filename, 'r', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        for line_no, row in enumerate(reader, start=2):
+            # Add a sorting key: Use Issue Date. 
+            # If NA, use max date (so they appear last and get latest purchase dates)
+            issue_date = parse_date(row['ISSUE_DATE'])
+            transfer_date = parse_date(row.get('TRANSFER_DATE')) # New Column
+            
+            sort_date = issue_date if issue_date else datetime.max
+            rows.append({
+                'data': row,
+                'line': line_no,
+                'sort_date': sort_date,
+                'real_issue_date': issue_date,
+                'real_transfer_date': transfer_date
+            })
+    rows.sort(key=lambda x: x['sort_date'])
+    return rows
+
+def clean(row, key):
+    return (row.get(key) or '').strip()
+
+def validate(rows, existing_serials):
+    """Split rows into (to_import, skipped, errors) without touching the database."""
+    to_import, skipped, errors = [], [], []
+    seen = set()
+    for index, item in enumerate(rows):
+        row = item['data']
+        item['index'] = index  # position in the purchase schedule
+        serial = clean(row, 'S/N')
+        if not serial:
+            errors.append((item['line'], 'missing S/N'))
+        elif not clean(row, 'BRANCH'):
+            errors.append((item['line'], f'{serial}: missing BRANCH'))
+        elif serial in seen:
+            errors.append((item['line'], f'{serial}: duplicate serial in file'))
+        elif serial in existing_serials:
+            skipped.append(serial)
+        else:
+            seen.add(serial)
+            to_import.append(item)
+    return to_import, skipped, errors
+
+def resolve_parties(rows, branches, employees):
+    """Create every branch/employee the rows need in one flush; fills the lookup maps."""
+    new_branches = {}
+    for name in ["HO"] + [clean(item['data'], 'BRANCH') for item in rows]:
+        if name not in branches and name not in new_branches:
+            new_branches[name] = Branch(name=name, location=name)
+    db.session.add_all(new_branches.values())
+    db.session.flush()
+    branches.update(new_branches)
+
+    new_employees = {}
+    for item in rows:
+        row = item['data']
+        emp_id = clean(row, 'EMP_ID')
+        if emp_id and emp_id not in employees and emp_id not in new_employees:
+            new_employees[emp_id] = Employee(emp_id=emp_id, name=clean(row, 'NAME'),
+                                             branch_id=branches[clean(row, 'BRANCH')].id, status='Active')
+    db.session.add_all(new_employees.values())
+    db.session.flush()
+    employees.update(new_employees)
+    return len(new_branches), len(new_employees)
+
+# Every history dict carries the same keys so a chunk goes out as one executemany
+PARTY_COLUMNS = dict(from_employee_id=None, to_employee_id=None, from_branch_id=None, to_branch_id=None)
+
+def history_rows(asset_id, item, purchase_date, ho_branch, target_branch, employee, admin_id):
+    issue_date = item['real_issue_date']
+    transfer_date = item['real_transfer_date']
+    # If Issue Date is NA, use Purchase Date for logic, or Today
+    # Logic: If it's stock (NA), it arrived on purchase date.
+    effective_date = issue_date if issue_date else purchase_date
+
+    # 1. PURCHASE (Always at HO)
+    rows = [dict(
+        asset_id=asset_id,
+        action="Purchase",
+        from_detail="Vendor",
+        to_detail="Stock (HO)",
+        timestamp=purchase_date, # Date from your schedule
+        created_by_user_id=admin_id,
+        post_action_status='In Stock',
+        post_action_branch_id=ho_branch.id,
+        post_action_employee_id=None,
+        to_branch_id=ho_branch.id
+    )]
+
+    # 2. TRANSFER (If Branch is NOT HO)
+    # Logic: If current branch != HO, it must have moved.
+    # Date Priority: Transfer Date > Issue Date > Purchase Date
+    if target_branch.name.upper() != "HO":
+        txn_date = transfer_date if transfer_date else effective_date
+        rows.append(dict(
+            asset_id=asset_id,
+            action="Branch Transfer",
+            from_detail="Stock (HO)",
+            to_detail=f"Stock ({target_branch.name})",
+            timestamp=txn_date, 
+            created_by_user_id=admin_id,
+            post_action_status='In Stock',
+            post_action_branch_id=target_branch.id,
+            post_action_employee_id=None,
+            from_branch_id=ho_branch.id,
+            to_branch_id=target_branch.id
+        ))
 
-def import_data(filename):
+    # 3. ALLOCATION (If Employee exists)
+    if employee:
+        rows.append(dict(
+            asset_id=asset_id,
+            action="Allocation",
+            from_detail=f"Stock ({target_branch.name})",
+            to_detail=f"{employee.name} ({employee.emp_id})",
+            timestamp=effective_date,
+            created_by_user_id=admin_id,
+            post_action_status='Allocated',
+            post_action_branch_id=target_branch.id,
+            post_action_employee_id=employee.id,
+            from_branch_id=target_branch.id,
+            to_employee_id=employee.id
+        ))
+    return [dict(PARTY_COLUMNS, **r) for r in rows]
+
+def import_data(filename, batch_size=1000, dry_run=False):
+    started = time.perf_counter()
     with app.app_context():
         # Get System Admin for logs
         admin = User.query.filter_by(email='admin@company.com').first()
         admin_id = admin.id if admin else None
-        
-        # Ensure HO branch exists for initial purchase logic
-        ho_branch = get_or_create_branch("HO")
-
-        # 1. READ AND SORT CSV DATA
-        rows = []
-        with open(filename, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Add a sorting key: Use Issue Date. 
-                # If NA, use max date (so they appear last and get latest purchase dates)
-                issue_date = parse_date(row['ISSUE_DATE'])
-                transfer_date = parse_date(row.get('TRANSFER_DATE')) # New Column
-                
-                sort_date = issue_date if issue_date else datetime.max
-                rows.append({
-                    'data': row,
-                    'sort_date': sort_date,
-                    'real_issue_date': issue_date,
-                    'real_transfer_date': transfer_date
-                })
-        
-        # Sort rows by Issue Date (Earliest allocation gets Earliest stock)
-        rows.sort(key=lambda x: x['sort_date'])
-        
+
+        # 1. PRELOAD LOOKUPS (one query each instead of one per row)
+        branches = dict((b.name, b) for b in Branch.query.all())
+        employees = dict((e.emp_id, e) for e in Employee.query.all())
+        existing_serials = set(s for (s,) in db.session.query(Asset.serial_number))
+
+        # 2. READ, SORT AND VALIDATE CSV DATA
+        rows = load_rows(filename)
+        to_import, skipped, errors = validate(rows, existing_serials)
+        print(f"--- {'VALIDATING' if dry_run else 'STARTING IMPORT'}: {len(rows)} rows, "
+              f"{len(to_import)} new, {len(skipped)} existing, {len(errors)} invalid ---")
+        for line_no, message in errors[:20]:
+            print(f"  [Error] line {line_no}: {message}")
+        if len(errors) > 20:
+            print(f"  ... {len(errors) - 20} more errors")
+        for serial in skipped[:10]:
+            print(f"  [Skip] {serial} exists.")
+        if len(skipped) > 10:
+            print(f"  ... {len(skipped) - 10} more existing serials skipped")
+        if dry_run:
+            print(f"--- DRY RUN COMPLETE ({time.perf_counter() - started:.2f}s), nothing written ---")
+            return
+        if errors:
+            print("--- ABORTED: fix the invalid rows (or run with --dry-run to list them) ---")
+            return
+
+        new_branch_count, new_emp_count = resolve_parties(to_import, branches, employees)
+        # Plain copies, taken before the commit expires the ORM objects
+        branches = dict((name, SimpleNamespace(id=b.id, name=b.name)) for name, b in branches.items())
+        employees = dict((code, SimpleNamespace(id=e.id, name=e.name, emp_id=e.emp_id)) for code, e in employees.items())
+        db.session.commit()
+        ho_branch = branches["HO"]
+
         # Get Purchase Dates
         purchase_dates = generate_purchase_date_list()
-        
-        print(f"--- STARTING IMPORT: {len(rows)} Assets ---")
-        
-        for index, item in enumerate(rows):
-            row = item['data']
-            issue_date = item['real_issue_date']
-            transfer_date = item['real_transfer_date']
-            
-            # Assign Purchase Date from schedule (cycle if we have more rows than dates)
-            if index < len(purchase_dates):
-                purchase_date = purchase_dates[index]
-            else:
-                purchase_date = purchase_dates[-1] # Fallback to last known date
-
-            # If Issue Date is NA, use Purchase Date for logic, or Today
-            # Logic: If it's stock (NA), it arrived on purchase date.
-            effective_date = issue_date if issue_date else purchase_date
-
-            # Data Extraction
-            serial = row['S/N'].strip()
-            brand = row['BRAND'].strip()
-            model = row['MODEL'].strip()
-            branch_name = row['BRANCH'].strip()
-            emp_id = row['EMP_ID'].strip()
-            emp_name = row['NAME'].strip()
-
-            # Check duplicates
-            if Asset.query.filter_by(serial_number=serial).first():
-                print(f"  [Skip] {serial} exists.")
-                continue
-
-            # Resolve Entities
-            target_branch = get_or_create_branch(branch_name)
-            employee = get_or_create_employee(emp_id, emp_name, target_branch.id)
-
-            # Determine Status
-            if employee:
-                status = 'Allocated'
-                curr_emp_id = employee.id
-            else:
-                status = 'In Stock'
-                curr_emp_id = None
-
-            # --- CREATE ASSET ---
-            asset = Asset(
-                serial_number=serial,
-                brand=brand,
-                model=model,
-                status=status,
-                current_branch_id=target_branch.id,
-                current_employee_id=curr_emp_id,
-                purchase_date=purchase_date
-            )
-            db.session.add(asset)
+
+        # 3. ASSETS + HISTORY IN CHUNKS (one bulk insert each per chunk). These
+        # skip the ORM flush hooks, so counters, search index and data version
+        # are brought up to date once at the end, and fleet snapshots the
+        # back-dated events make stale are dropped with each chunk.
+        imported = history_count = 0
+        for start in range(0, len(to_import), batch_size):
+            chunk = to_import[start:start + batch_size]
+            assets, plans = [], []
+            for item in chunk:
+                row = item['data']
+                index = item['index']
+                # Assign Purchase Date from schedule (cycle if we have more rows than dates)
+                purchase_date = purchase_dates[index] if index < len(purchase_dates) else purchase_dates[-1]
+                effective_date = item['real_issue_date'] or purchase_date
+                target_branch = branches[clean(row, 'BRANCH')]
+                employee = employees.get(clean(row, 'EMP_ID'))
+
+                assets.append(dict(
+                    serial_number=clean(row, 'S/N'),
+                    brand=clean(row, 'BRAND'),
+                    model=clean(row, 'MODEL'),
+                    status='Allocated' if employee else 'In Stock',
+                    current_branch_id=target_branch.id,
+                    current_employee_id=employee.id if employee else None,
+                    allocated_at=effective_date if employee else None,
+                    purchase_date=purchase_date
+                ))
+                plans.append((item, purchase_date, target_branch, employee))
+            ids = insert_assets(assets)
+
+            history = []
+            for (item, purchase_date, target_branch, employee), values in zip(plans, assets):
+                history.extend(history_rows(ids[values['serial_number']], item, purchase_date, ho_branch, target_branch, employee, admin_id))
+            # Core insert: the ORM variant drops None values, which splits the executemany
+            db.session.execute(insert(AssetHistory.__table__), history)
+            if history:
+                drop_snapshots(min(h['timestamp'] for h in history))  # back-dated events
             db.session.commit()
 
-            # --- HISTORY JOURNEY ---
-            
-            # 1. PURCHASE (Always at HO)
-            h1 = AssetHistory(
-                asset_id=asset.id,
-                action="Purchase",
-                from_detail="Vendor",
-                to_detail="Stock (HO)",
-                timestamp=purchase_date, # Date from your schedule
-                created_by_user_id=admin_id,
-                post_action_status='In Stock',
-                post_action_branch_id=ho_branch.id,
-                post_action_employee_id=None
-            )
-            db.session.add(h1)
-
-            # 2. TRANSFER (If Branch is NOT HO)
-            # Logic: If current branch != HO, it must have moved.
-            # Date Priority: Transfer Date > Issue Date > Purchase Date
-            if target_branch.name.upper() != "HO":
-                txn_date = transfer_date if transfer_date else effective_date
-                
-                h2 = AssetHistory(
-                    asset_id=asset.id,
-                    action="Branch Transfer",
-                    from_detail="Stock (HO)",
-                    to_detail=f"Stock ({target_branch.name})",
-                    timestamp=txn_date, 
-                    created_by_user_id=admin_id,
-                    post_action_status='In Stock',
-                    post_action_branch_id=target_branch.id,
-                    post_action_employee_id=None
-                )
-                db.session.add(h2)
-
-            # 3. ALLOCATION (If Employee exists)
-            if employee:
-                h3 = AssetHistory(
-                    asset_id=asset.id,
-                    action="Allocation",
-                    from_detail=f"Stock ({target_branch.name})",
-                    to_detail=f"{employee.name} ({employee.emp_id})",
-                    timestamp=effective_date,
-                    created_by_user_id=admin_id,
-                    post_action_status='Allocated',
-                    post_action_branch_id=target_branch.id,
-                    post_action_employee_id=employee.id
-                )
-                db.session.add(h3)
+            imported += len(chunk)
+            history_count += len(history)
+            elapsed = time.perf_counter() - started
+            print(f"  [OK] {imported}/{len(to_import)} assets ({imported / elapsed:,.0f} rows/s)")
 
+        # Also after an import that stopped part-way and was re-run
+        if imported or skipped:
+            rebuild_fleet_stats()
+            rebuild_search_index()
+            bump_data_version()
             db.session.commit()
-            print(f"  [OK] {serial}: Pur {purchase_date.date()} -> Loc {target_branch.name} -> {status}")
 
-        print("--- IMPORT COMPLETE ---")
+        elapsed = time.perf_counter() - started
+        print(f"--- IMPORT COMPLETE: {imported} assets, {history_count} history rows, "
+              f"{new_branch_count} new branches, {new_emp_count} new employees, {len(skipped)} skipped "
+              f"in {elapsed:.2f}s ({imported / elapsed if elapsed else 0:,.0f} rows/s) ---")
 
 if __name__ == '__main__':
-    csv_file = 'initial_data.csv'
-    if os.path.exists(csv_file):
-        import_data(csv_file)
+    parser = argparse.ArgumentParser(description="Import legacy assets from CSV.")
+    parser.add_argument('csv_file', nargs='?', default='initial_data.csv')
+    parser.add_argument('--batch-size', type=int, default=1000, help="assets per transaction (default 1000)")
+    parser.add_argument('--dry-run', action='store_true', help="validate the file and report, without writing")
+    args = parser.parse_args()
+    if os.path.exists(args.csv_file):
+        import_data(args.csv_file, batch_size=max(args.batch_size, 1), dry_run=args.dry_run)
     else:
-        print(f"Error: {csv_file} not found. Please create it.")
\ No newline at end of file
+        print(f"Error: {args.csv_file} not found. Please create it.")
@@ -1,6 +1,7 @@
 # Path: scripts/update_db.py
 import sys
 import os
+import re
 from sqlalchemy import text, inspect
 from dotenv import load_dotenv
 
@@ -8,10 +9,130 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import create_app, db
-from app.models import PreGeneratedQR, ScanLog, SystemSetting
+from app.models import PreGeneratedQR, ScanLog, ScanRollup, SystemSetting, AssetHistory, Employee, Branch, Asset
+from app.stats import rebuild_fleet_stats
+from app.search import rebuild_search_index
+from app.scan_stats import rebuild_scan_rollups
+from app.documents import migrate_legacy_documents, move_public_uploads
+from app.snapshots import drop_snapshots
 
 app = create_app()
 
+def ensure_indexes(table):
+    """Create any index declared on the model that the live table lacks."""
+    existing = {ix['name'] for ix in inspect(db.engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(db.engine)
+            print(f"  [OK] Index {index.name} created")
+
+# --- Backfill: structured from/to parties on AssetHistory ---
+# Older rows only carry display text such as "Stock (HO)", "Branch Pune",
+# "Jane Doe (E042)" or "Jane Doe (Allocated)"; parse them back into IDs.
+BRANCH_TEXT = re.compile(r'^(?:Stock \((?P<a>.+)\)|Branch \((?P<b>.+)\)|Branch (?P<c>.+))$')
+PERSON_TEXT = re.compile(r'^(?P<name>.+?) \((?P<tag>.+)\)$')
+
+def parse_party(detail, branches, emp_codes, emp_names):
+    """Returns (employee_id, branch_id) for a from/to detail string."""
+    if not detail:
+        return None, None
+    detail = detail.strip()
+    m = BRANCH_TEXT.match(detail)
+    if m:
+        return None, branches.get(m.group('a') or m.group('b') or m.group('c'))
+    m = PERSON_TEXT.match(detail)
+    if m:
+        if m.group('tag') in emp_codes:
+            return emp_codes[m.group('tag')], None
+        return emp_names.get(m.group('name')), None
+    return emp_names.get(detail), None
+
+def backfill_history_parties(batch_size=1000):
+    branches = {b.name: b.id for b in Branch.query.all()}
+    emp_codes, emp_names, seen = {}, {}, set()
+    for e in Employee.query.all():
+        emp_codes[e.emp_id] = e.id
+        # Names shared by two people are ambiguous; leave those rows unlinked
+        if e.name in seen:
+            emp_names.pop(e.name, None)
+        else:
+            emp_names[e.name] = e.id
+            seen.add(e.name)
+
+    pending = AssetHistory.query.filter(
+        AssetHistory.from_employee_id.is_(None), AssetHistory.to_employee_id.is_(None),
+        AssetHistory.from_branch_id.is_(None), AssetHistory.to_branch_id.is_(None)
+    ).with_entities(AssetHistory.id, AssetHistory.from_detail, AssetHistory.to_detail)
+
+    updates, linked = [], 0
+    for hid, from_d, to_d in pending.yield_per(batch_size):
+        from_emp, from_branch = parse_party(from_d, branches, emp_codes, emp_names)
+        to_emp, to_branch = parse_party(to_d, branches, emp_codes, emp_names)
+        if from_emp or from_branch or to_emp or to_branch:
+            updates.append(dict(id=hid, from_employee_id=from_emp, from_branch_id=from_branch,
+                                to_employee_id=to_emp, to_branch_id=to_branch))
+    for i in range(0, len(updates), batch_size):
+        db.session.bulk_update_mappings(AssetHistory, updates[i:i + batch_size])
+        db.session.commit()
+        linked += len(updates[i:i + batch_size])
+    return linked
+
+# --- Scan rollups: unique key gains linked_asset_id ---
+def migrate_scan_rollups():
+    """Recreate a scan_rollup table still unique on (period, bucket, qr_hash). Returns True if it did."""
+    table = ScanRollup.__table__
+    inspector = inspect(db.engine)
+    if table.name not in inspector.get_table_names():
+        return False
+    keys = [set(u['column_names']) for u in inspector.get_unique_constraints(table.name)]
+    keys += [set(ix['column_names']) for ix in inspector.get_indexes(table.name) if ix.get('unique')]
+    if {'period', 'bucket', 'qr_hash'} not in keys:
+        return False
+    existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in existing:
+            index.drop(db.engine)  # index names are global on SQLite; free them for the new table
+    with db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE scan_rollup RENAME TO scan_rollup_old"))
+    table.create(db.engine)
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO scan_rollup (period, bucket, qr_hash, linked_asset_id, count)"
+            " SELECT period, bucket, qr_hash, COALESCE(linked_asset_id, 0), count FROM scan_rollup_old"))
+        conn.execute(text("DROP TABLE scan_rollup_old"))
+    return True
+
+# --- Backfill: holder/branch on QR history rows ---
+# QR rows used to record only post_action_status, so an "as of" view that
+# takes an asset's state from its latest row showed no branch or holder after
+# a sticker change. Carry the state of the asset's previous row forward.
+QR_ACTIONS = ('QR Reset', 'QR Assigned', 'QR Unassigned', 'QR Linked')
+
+def backfill_qr_history_state(batch_size=1000):
+    h = AssetHistory
+    asset_ids = [a for (a,) in db.session.query(h.asset_id).filter(
+        h.action.in_(QR_ACTIONS), h.post_action_branch_id.is_(None), h.post_action_employee_id.is_(None)
+    ).distinct()]
+    fixed, oldest = 0, None
+    for i in range(0, len(asset_ids), batch_size):
+        rows = db.session.query(h.id, h.asset_id, h.timestamp, h.action, h.post_action_branch_id,
+                                h.post_action_employee_id)\
+            .filter(h.asset_id.in_(asset_ids[i:i + batch_size])).order_by(h.asset_id, h.timestamp, h.id).all()
+        updates, previous = [], {}
+        for hid, asset_id, timestamp, action, branch_id, employee_id in rows:
+            if action in QR_ACTIONS and branch_id is None and employee_id is None:
+                branch_id, employee_id = previous.get(asset_id, (None, None))
+                if branch_id is not None or employee_id is not None:
+                    updates.append(dict(id=hid, post_action_branch_id=branch_id, post_action_employee_id=employee_id))
+                    oldest = timestamp if oldest is None or timestamp < oldest else oldest
+            previous[asset_id] = (branch_id, employee_id)
+        db.session.bulk_update_mappings(AssetHistory, updates)
+        fixed += len(updates)
+    if oldest is not None:
+        drop_snapshots(oldest)  # taken from the incomplete rows; `flask fleet-snapshots` retakes them
+    db.session.commit()
+    return fixed
+
 if __name__ == '__main__':
     print("--- UPDATING DATABASE SCHEMA ---")
     
@@ -39,6 +160,19 @@ if __name__ == '__main__':
                     conn.execute(text("ALTER TABLE asset_history ADD COLUMN post_action_branch_id INTEGER"))
                     conn.execute(text("ALTER TABLE asset_history ADD COLUMN post_action_employee_id INTEGER"))
                     conn.commit()
+            if 'to_employee_id' not in existing_cols:
+                with db.engine.connect() as conn:
+                    conn.execute(text("ALTER TABLE asset_history ADD COLUMN from_employee_id INTEGER REFERENCES employee(id)"))
+                    conn.execute(text("ALTER TABLE asset_history ADD COLUMN to_employee_id INTEGER REFERENCES employee(id)"))
+                    conn.execute(text("ALTER TABLE asset_history ADD COLUMN from_branch_id INTEGER REFERENCES branch(id)"))
+                    conn.execute(text("ALTER TABLE asset_history ADD COLUMN to_branch_id INTEGER REFERENCES branch(id)"))
+                    conn.commit()
+            ensure_indexes(AssetHistory.__table__)
+            linked = backfill_history_parties()
+            print(f"  [OK] History parties backfilled ({linked} rows linked)")
+            fixed = backfill_qr_history_state()
+            if fixed:
+                print(f"  [OK] Branch/holder filled in on {fixed} QR history rows")
 
         if 'asset' in inspector.get_table_names():
             existing_cols = [c['name'] for c in inspector.get_columns('asset')]
@@ -47,5 +181,62 @@ if __name__ == '__main__':
                     conn.execute(text("ALTER TABLE asset ADD COLUMN qr_code_hash VARCHAR(64)"))
                     conn.execute(text("ALTER TABLE asset ADD COLUMN is_qr_active BOOLEAN DEFAULT 1"))
                     conn.commit()
+            if 'version' not in existing_cols:
+                with db.engine.connect() as conn:
+                    conn.execute(text("ALTER TABLE asset ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+                    conn.commit()
+            if 'allocated_at' not in existing_cols:
+                with db.engine.connect() as conn:
+                    conn.execute(text("ALTER TABLE asset ADD COLUMN allocated_at DATETIME"))
+                    conn.commit()
+            # Backfill from the latest Allocation event, in one statement
+            with db.engine.connect() as conn:
+                result = conn.execute(text(
+                    "UPDATE asset SET allocated_at = ("
+                    "  SELECT MAX(h.timestamp) FROM asset_history h"
+                    "  WHERE h.asset_id = asset.id AND h.action = 'Allocation'"
+                    ") WHERE current_employee_id IS NOT NULL AND allocated_at IS NULL"))
+                conn.commit()
+                print(f"  [OK] Allocation dates backfilled ({result.rowcount} assets)")
+
+        # Composite indexes for the list filters, timelines and scan history
+        # (asset_history's were handled above, after its column additions)
+        for model in (Asset, Employee, ScanLog, PreGeneratedQR):
+            if model.__table__.name in inspector.get_table_names():
+                ensure_indexes(model.__table__)
+
+        # Recount the dashboard counters from the asset table (this also
+        # turns the old NULL "no branch" rows into branch_id 0)
+        groups = rebuild_fleet_stats()
+        print(f"  [OK] Fleet counters rebuilt ({groups} status/branch groups)")
+
+        # Re-index assets and employees for live search
+        backend = rebuild_search_index()
+        print(f"  [OK] Search index rebuilt ({backend})" if backend else "  [--] Full-text search not available, using ILIKE")
+
+        # Proofs used to be saved under app/static/uploads, readable without
+        # a login; move them to UPLOAD_FOLDER
+        relocated = move_public_uploads(app.config['LEGACY_UPLOAD_FOLDER'])
+        if relocated:
+            print(f"  [OK] {relocated} proof files moved out of app/static")
+
+        # Move proof files uploaded before content-addressed storage into the
+        # store (one copy per distinct content, reference counted)
+        moved, missing = migrate_legacy_documents()
+        if moved or missing:
+            print(f"  [OK] Proof documents moved to the store ({moved} files, {missing} missing on disk)")
+
+        # Rollups keyed by hash only (before per-asset counts): rebuild the
+        # table, keep its counts (they include archived days) and recount the
+        # days still in scan_log per asset
+        if migrate_scan_rollups():
+            buckets = rebuild_scan_rollups()
+            print(f"  [OK] Scan rollups re-keyed by asset ({buckets} recent buckets recounted)")
+
+        # Count existing scans into the hourly/daily rollups (first run only;
+        # the scan log writer keeps them current afterwards)
+        if not ScanRollup.query.first():
+            buckets = rebuild_scan_rollups()
+            print(f"  [OK] Scan rollups backfilled ({buckets} buckets)")
 
     print("--- UPDATE COMPLETE ---")
\ No newline at end of file
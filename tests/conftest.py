@@ -0,0 +1,124 @@
+# Path: tests/conftest.py
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import Config
+from app import create_app, db
+from app.models import User, Branch, Employee, Asset, AssetHistory, ScanLog
+
+# --- App on a temporary SQLite database ---
+# One app per test session, seeded with a small fleet: branches, employees,
+# assets with purchase/allocation history from early 2025 (for the "as of"
+# views) and a few QR scans. Background work runs inline so every statement
+# a request causes happens in the test's own thread.
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('app')
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp / 'test.db'}"
+        UPLOAD_FOLDER = str(tmp / 'uploads')
+        QR_CACHE_FOLDER = str(tmp / 'qr_cache')
+        SCANLOG_ARCHIVE_FOLDER = str(tmp / 'scan_archive')
+        JOB_RESULT_FOLDER = str(tmp / 'job_results')
+        SCANLOG_ASYNC = False
+        PROOF_IMAGES_ASYNC = False
+        JOBS_ASYNC = False
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        admin = User(email='admin@company.com', name='System Admin', password='admin123')
+        db.session.add(admin)
+        db.session.add_all([Branch(name='HO', location='Head Office'), Branch(name='Pune', location='Pune')])
+        db.session.commit()
+        add_fleet(30)
+    return app
+
+def add_fleet(count):
+    """Add `count` assets (a third of them allocated) with their history and scans. Commits."""
+    admin = User.query.filter_by(email='admin@company.com').one()
+    branches = Branch.query.order_by(Branch.id).all()
+    start = Asset.query.count()
+    employees = []
+    for i in range(start, start + count, 3):
+        branch = branches[i % len(branches)]
+        employees.append(Employee(emp_id=f'E{i:04}', name=f'Employee {i}', branch_id=branch.id, status='Active'))
+    db.session.add_all(employees)
+    db.session.flush()
+    for i in range(start, start + count):
+        branch = branches[i % len(branches)]
+        holder = employees[(i - start) // 3] if i % 3 == 0 else None
+        asset = Asset(serial_number=f'SN{i:05}', brand='Dell', model=f'Latitude {i % 4}',
+                      status='Allocated' if holder else 'In Stock', current_branch_id=branch.id,
+                      current_employee_id=holder.id if holder else None, qr_code_hash=f'{i:032x}')
+        db.session.add(asset)
+        db.session.flush()
+        db.session.add(AssetHistory(asset_id=asset.id, action='Purchase', from_detail='Vendor',
+                                    to_detail=f'Stock ({branch.name})', created_by_user_id=admin.id,
+                                    timestamp=datetime(2025, 1, 1) + timedelta(hours=i),
+                                    post_action_status='In Stock', post_action_branch_id=branch.id))
+        if holder:
+            db.session.add(AssetHistory(asset_id=asset.id, action='Allocation', from_detail=f'Stock ({branch.name})',
+                                        to_detail=f'{holder.name} ({holder.emp_id})', created_by_user_id=admin.id,
+                                        timestamp=datetime(2025, 2, 1) + timedelta(hours=i),
+                                        post_action_status='Allocated', post_action_branch_id=branch.id,
+                                        post_action_employee_id=holder.id))
+        db.session.add(ScanLog(qr_hash=asset.qr_code_hash, linked_asset_id=asset.id,
+                               timestamp=datetime(2025, 1, 10) + timedelta(hours=i)))
+    db.session.commit()
+
+@pytest.fixture
+def grow_fleet(app):
+    """grow_fleet(count) adds more seeded assets to the session's database."""
+    def grow(count):
+        with app.app_context():
+            add_fleet(count)
+    return grow
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the super admin."""
+    with app.app_context():
+        admin_id = User.query.filter_by(email='admin@company.com').one().id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+        session['_fresh'] = True
+    return client
+
+@pytest.fixture
+def run_route(app, client):
+    """run_route(url) -> (status, [(statement, parameters, executemany)]) for the SQL the request ran.
+
+    Streamed bodies (CSV export) are drained inside the capture; statements
+    from other threads (job runner, scan log writer) are not recorded.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    def run(url):
+        statements = []
+        thread = threading.get_ident()
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            if threading.get_ident() == thread:
+                statements.append((statement, parameters, executemany))
+
+        event.listen(engine, 'before_cursor_execute', _record)
+        try:
+            response = client.get(url)
+            response.get_data()
+            response.close()
+        finally:
+            event.remove(engine, 'before_cursor_execute', _record)
+        return response.status_code, statements
+
+    return run
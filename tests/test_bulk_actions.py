@@ -0,0 +1,34 @@
+# Path: tests/test_bulk_actions.py
+import io
+import os
+from app.extensions import db
+from app.models import Asset, AssetHistory, StoredDocument
+
+def stored_files(app):
+    folder = app.config['UPLOAD_FOLDER']
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(folder) for name in names)
+
+def test_rejected_selection_stores_no_proof(app, client):
+    before = stored_files(app)
+    with app.app_context():
+        allocated = Asset.query.filter_by(status='Allocated').first().id
+    response = client.post('/assets/action/bulk', content_type='multipart/form-data', data={
+        'action': 'complete_repair', 'asset_ids': [str(allocated), '999999'],
+        'document': (io.BytesIO(b'%PDF-1.4 rejected batch'), 'slip.pdf')})
+    assert response.get_json()['applied'] == 0
+    assert stored_files(app) == before
+
+def test_applied_selection_references_its_proof(app, client):
+    with app.app_context():
+        ids = [a.id for a in Asset.query.filter_by(status='In Stock').order_by(Asset.id).limit(2)]
+    response = client.post('/assets/action/bulk', content_type='multipart/form-data', data={
+        'action': 'repair', 'asset_ids': [str(i) for i in ids],
+        'document': (io.BytesIO(b'%PDF-1.4 repair batch'), 'slip.pdf')})
+    assert response.get_json()['applied'] == 2
+    with app.app_context():
+        paths = {h.document_path for h in AssetHistory.query.filter(AssetHistory.asset_id.in_(ids),
+                                                                    AssetHistory.action == 'Sent to Repair')}
+        assert len(paths) == 1
+        path = paths.pop()
+        assert db.session.query(StoredDocument.ref_count).filter_by(path=path).scalar() == 2
+    assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], path))
@@ -0,0 +1,49 @@
+# Path: tests/test_data_version.py
+from sqlalchemy import event
+from app.extensions import db
+from app.models import DataVersion, Employee, User
+from app.cache import data_version, bump_data_version, forget_user, USERS_VERSION
+
+def users_version():
+    return db.session.query(DataVersion.version).filter(DataVersion.id == USERS_VERSION).scalar() or 0
+
+def test_one_bump_per_transaction(app):
+    with app.app_context():
+        before = data_version()[0]
+        updates = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE data_version'):
+                updates.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            for i in range(3):
+                db.session.add(Employee(emp_id=f'DV{i}', name=f'Version {i}', status='Active'))
+                db.session.flush()
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert len(updates) == 1
+        assert data_version()[0] == before + 1
+
+def test_rollback_drops_pending_bump(app):
+    with app.app_context():
+        before = data_version()[0]
+        db.session.add(Employee(emp_id='DV-RB', name='Rolled Back', status='Active'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert data_version()[0] == before
+
+def test_explicit_bumps_create_missing_rows(app):
+    with app.app_context():
+        db.session.query(DataVersion).filter(DataVersion.id == USERS_VERSION).delete()
+        db.session.commit()
+        admin = User.query.filter_by(email='admin@company.com').one()
+        forget_user(admin.id)
+        db.session.commit()
+        assert users_version() == 1
+        bump_data_version(row=USERS_VERSION)
+        db.session.commit()
+        assert users_version() == 2
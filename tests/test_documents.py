@@ -0,0 +1,48 @@
+# Path: tests/test_documents.py
+import io
+import os
+from werkzeug.datastructures import FileStorage
+from app.extensions import db
+from app.models import Asset, AssetHistory, StoredDocument
+from app.documents import store_upload, add_references, release_reference, remove_unused, migrate_legacy_documents
+
+def upload(content):
+    return FileStorage(io.BytesIO(content), 'slip.pdf')
+
+def test_reference_stores_a_file_removed_since_upload(app):
+    content = b'%PDF-1.4 removed before its history row'
+    with app.app_context():
+        stored = store_upload(upload(content), 'pdf')
+        full = os.path.join(app.config['UPLOAD_FOLDER'], stored.path)
+        os.remove(full)  # e.g. remove_unused for the last reference of the same content
+        add_references(stored)
+        db.session.commit()
+        assert open(full, 'rb').read() == content
+        assert StoredDocument.query.filter_by(path=stored.path).one().size == len(content)
+        release_reference(stored.path)
+        db.session.commit()
+        remove_unused(stored.path)
+        assert not os.path.exists(full)
+
+def test_legacy_proofs_move_into_the_store(app):
+    content = b'%PDF-1.4 legacy proof'
+    with app.app_context():
+        folder = app.config['UPLOAD_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        for name in ('proof_1_a.pdf', 'proof_2_b.pdf'):  # the same slip uploaded twice
+            with open(os.path.join(folder, name), 'wb') as f:
+                f.write(content)
+        asset = Asset.query.order_by(Asset.id).first()
+        entries = [AssetHistory(asset_id=asset.id, action='Note', document_path=name)
+                   for name in ('proof_1_a.pdf', 'proof_2_b.pdf', 'proof_2_b.pdf')]
+        db.session.add_all(entries)
+        db.session.commit()
+        assert migrate_legacy_documents() == (2, 0)
+        paths = {db.session.get(AssetHistory, e.id).document_path for e in entries}
+        assert len(paths) == 1
+        row = StoredDocument.query.filter_by(path=paths.pop()).one()
+        assert (row.ref_count, row.size) == (3, len(content))
+        assert not os.path.exists(os.path.join(folder, 'proof_1_a.pdf'))
+        for e in entries:
+            db.session.delete(e)
+        db.session.commit()
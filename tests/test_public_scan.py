@@ -0,0 +1,38 @@
+# Path: tests/test_public_scan.py
+from app.extensions import db
+from app.models import Asset, Branch, Employee
+
+def held_asset(app):
+    with app.app_context():
+        asset = Asset.query.filter(Asset.current_employee_id.isnot(None), Asset.is_qr_active.isnot(False))\
+            .order_by(Asset.id).first()
+        return asset.qr_code_hash, asset.current_employee_id, asset.current_branch_id
+
+def test_holder_rename_changes_scan_page(app):
+    qr_hash, employee_id, _ = held_asset(app)
+    client = app.test_client()
+    first = client.get(f'/qr/scan/{qr_hash}')
+    assert first.status_code == 200
+    with app.app_context():
+        db.session.get(Employee, employee_id).name = 'Renamed Holder'
+        db.session.commit()
+    response = client.get(f'/qr/scan/{qr_hash}', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert b'Renamed Holder' in response.data
+
+def test_branch_rename_changes_scan_page(app):
+    qr_hash, _, branch_id = held_asset(app)
+    client = app.test_client()
+    first = client.get(f'/qr/scan/{qr_hash}')
+    with app.app_context():
+        branch = db.session.get(Branch, branch_id)
+        old_name, branch.name = branch.name, 'Renamed Branch'
+        db.session.commit()
+    try:
+        response = client.get(f'/qr/scan/{qr_hash}', headers={'If-None-Match': first.headers['ETag']})
+        assert response.status_code == 200
+        assert b'Renamed Branch' in response.data
+    finally:
+        with app.app_context():
+            db.session.get(Branch, branch_id).name = old_name
+            db.session.commit()
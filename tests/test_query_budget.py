@@ -0,0 +1,32 @@
+# Path: tests/test_query_budget.py
+import pytest
+
+# Upper bound of SQL statements per page, independent of how many rows it
+# shows (see the loading strategies in app/loading.py)
+ROUTE_BUDGETS = {
+    '/': 4,
+    '/?as_of=2025-01-15': 4,
+    '/assets/': 4,
+    '/assets/?as_of=2025-01-15': 5,  # + the snapshot lookup
+    '/employees/': 4,
+    '/admin/transactions': 4,
+    '/assets/export': 3,
+    '/assets/export?mode=detailed': 3,
+    '/jobs/': 3,
+}
+
+@pytest.mark.parametrize('url', ROUTE_BUDGETS)
+def test_route_within_budget(run_route, url):
+    run_route(url)  # first request warms the per-worker caches (current_user, totals)
+    status, statements = run_route(url)
+    assert status == 200
+    assert len(statements) <= ROUTE_BUDGETS[url], [s for s, _, _ in statements]
+
+@pytest.mark.parametrize('url', ['/assets/', '/employees/', '/admin/transactions', '/assets/export?mode=detailed'])
+def test_statements_do_not_grow_with_rows(run_route, grow_fleet, url):
+    run_route(url)
+    _, before = run_route(url)
+    grow_fleet(15)
+    run_route(url)
+    _, after = run_route(url)
+    assert len(after) == len(before), [s for s, _, _ in after]
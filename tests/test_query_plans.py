@@ -0,0 +1,118 @@
+# Path: tests/test_query_plans.py
+import re
+import sqlite3
+import pytest
+from sqlalchemy import text
+from app.extensions import db
+from app.models import Asset, Employee
+
+# --- Query Plan Check ---
+# Captures every SELECT a route runs and asks SQLite for its plan
+# (EXPLAIN QUERY PLAN). A plan step that walks a whole large table without an
+# index ("SCAN asset_history") is a regression. Small lookup tables, FTS
+# virtual tables and scans that SQLite runs through an index (e.g.
+# "SCAN asset USING INDEX ...") are fine, and so is a scan that reads rows in
+# ORDER BY order under a LIMIT, since it stops after one page.
+#
+# Plans are taken on an empty in-memory copy of the schema: with no ANALYZE
+# statistics SQLite plans every table as if it were large, so the result
+# depends only on the queries and the declared indexes, not on how many rows
+# the test database holds.
+
+# Tables that grow with the fleet; everything else is a handful of rows
+LARGE_TABLES = {'asset', 'asset_history', 'employee', 'scan_log', 'scan_rollup', 'pre_generated_qr'}
+
+# Full scans a route needs by design, e.g. the CSV export reads every asset
+ALLOWED_SCANS = {
+    '/assets/export': {'asset'},
+    '/employees/?status=All': {'employee'},
+    '/qr/manage': {'asset'},  # lists the whole fleet when no filter is picked
+    '/assets/export?mode=detailed': {'asset_history'},
+}
+
+# {asset_id}, {serial}, {employee_id}, {qr_hash} and {branch_id} are filled in from the database
+PLAN_ROUTES = [
+    '/',
+    '/?as_of=2025-01-15',
+    '/assets/',
+    '/assets/?as_of=2025-01-15&status=In Stock',
+    '/assets/?status=Repair',
+    '/assets/?branch_id={branch_id}',
+    '/assets/?status=In Stock&branch_id={branch_id}&sort=serial',
+    '/assets/?search=SN',
+    '/assets/{asset_id}',
+    '/assets/export',
+    '/assets/export?mode=detailed',
+    '/employees/',
+    '/employees/?status=All',
+    '/employees/?search=a',
+    '/employees/{employee_id}',
+    '/admin/transactions',
+    '/admin/transactions?action=Allocation',
+    '/admin/transactions?user_id=1&start=2025-01-01&end=2025-03-31',
+    '/admin/transactions?serial={serial}',
+    '/qr/history',
+    '/qr/history?serial={serial}&start=2025-01-01',
+    '/qr/history?qr={qr_hash}',
+    '/qr/manage',
+    '/qr/manage?branch_id={branch_id}&status=In Stock',
+    '/qr/scan/{qr_hash}',
+    '/api/v1/assets?status=Allocated',
+    '/api/v1/history?asset_id={asset_id}',
+]
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+LIMITED = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+@pytest.fixture(scope='module')
+def sample_ids(app):
+    with app.app_context():
+        asset = db.session.query(Asset.id, Asset.serial_number, Asset.qr_code_hash, Asset.current_branch_id)\
+            .filter(Asset.qr_code_hash.isnot(None), Asset.current_branch_id.isnot(None)).order_by(Asset.id).first()
+        employee_id = db.session.query(Employee.id).order_by(Employee.id).limit(1).scalar()
+        return dict(asset_id=asset.id, serial=asset.serial_number, qr_hash=asset.qr_code_hash,
+                    branch_id=asset.current_branch_id, employee_id=employee_id)
+
+@pytest.fixture(scope='module')
+def plan_db(app):
+    """An empty in-memory SQLite database with the app's tables, indexes and FTS tables."""
+    with app.app_context():
+        with db.engine.connect() as conn:
+            ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL "
+                                    "AND name NOT LIKE 'sqlite_%' ORDER BY type = 'index'")).scalars().all()
+    copy = sqlite3.connect(':memory:')
+    for statement in ddl:
+        try:
+            copy.execute(statement)
+        except sqlite3.OperationalError as e:
+            if 'already exists' not in str(e):  # FTS shadow tables come with their virtual table
+                raise
+    yield copy
+    copy.close()
+
+def full_scans(plan_db, statement, parameters):
+    """(large tables `statement` reads without an index, plan steps) per EXPLAIN QUERY PLAN."""
+    steps = [row[-1] for row in plan_db.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())]
+    # Walking a table in ORDER BY order stops after LIMIT rows; a sort step means it does not
+    ordered_page = LIMITED.search(statement) and not any(step.startswith('USE TEMP B-TREE') for step in steps)
+    scans = []
+    for step in steps:
+        match = FULL_SCAN.match(step)
+        if match and match.group(1) in LARGE_TABLES and not ordered_page:
+            scans.append(match.group(1))
+    return scans, steps
+
+@pytest.mark.parametrize('route', PLAN_ROUTES)
+def test_route_uses_indexes(run_route, plan_db, sample_ids, route):
+    status, statements = run_route(route.format(**sample_ids))
+    assert status == 200
+    failures = []
+    for statement, parameters, executemany in statements:
+        if executemany or not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            continue
+        scans, steps = full_scans(plan_db, statement, parameters)
+        bad = sorted(set(t for t in scans if t not in ALLOWED_SCANS.get(route, ())))
+        if bad:
+            failures.append(f"full scan of {', '.join(bad)}: {' '.join(statement.split())[:200]}\n"
+                            f"    plan: {' | '.join(steps)}")
+    assert not failures, '\n'.join(failures)
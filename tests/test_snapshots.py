@@ -0,0 +1,45 @@
+# Path: tests/test_snapshots.py
+from datetime import datetime
+import pytest
+from app.extensions import db
+from app.models import Asset, AssetHistory, FleetSnapshot
+import app.snapshots as snapshots
+
+class LocalClock(datetime):
+    """Shortly after a local month start, while UTC is still in the previous month (UTC+5:30)."""
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 3, 1, 0, 30)
+
+    @classmethod
+    def utcnow(cls):
+        return cls(2025, 2, 28, 19, 0)
+
+@pytest.fixture
+def month_boundary(app, monkeypatch):
+    monkeypatch.setattr(snapshots, 'datetime', LocalClock)
+    yield
+    with app.app_context():
+        snapshots.drop_snapshots()
+        db.session.commit()
+
+def taken():
+    return sorted(t for (t,) in db.session.query(FleetSnapshot.taken_at))
+
+def test_month_start_snapshot_uses_local_time(app, month_boundary):
+    with app.app_context():
+        snapshots.take_monthly_snapshots()
+        assert taken()[-1] == datetime(2025, 3, 1)
+
+def test_late_entry_before_local_month_start_drops_snapshot(app, month_boundary):
+    with app.app_context():
+        snapshots.take_monthly_snapshots()
+        assert datetime(2025, 3, 1) in taken()
+        asset = Asset.query.order_by(Asset.id).first()
+        entry = AssetHistory(asset_id=asset.id, action='Repair', timestamp=datetime(2025, 2, 28, 23, 50),
+                             post_action_status='Repair', post_action_branch_id=asset.current_branch_id)
+        db.session.add(entry)
+        db.session.commit()
+        assert datetime(2025, 3, 1) not in taken()
+        db.session.delete(entry)
+        db.session.commit()
@@ -0,0 +1,28 @@
+# Path: tests/test_stats.py
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import Asset, FleetStat
+from app.stats import rebuild_fleet_stats
+
+def counters():
+    return sorted((s, b, n) for s, b, n in db.session.query(FleetStat.status, FleetStat.branch_id, FleetStat.count)
+                  if n)
+
+def test_unbranched_assets_share_one_counter(app):
+    with app.app_context():
+        for serial in ('SN-NOBRANCH-1', 'SN-NOBRANCH-2'):
+            db.session.add(Asset(serial_number=serial, brand='Dell', model='Latitude', status='In Transit'))
+            db.session.commit()
+        rows = FleetStat.query.filter_by(status='In Transit').all()
+        assert [(r.branch_id, r.count) for r in rows] == [(0, 2)]
+        with pytest.raises(IntegrityError):
+            with db.session.begin_nested():
+                db.session.add(FleetStat(status='In Transit', branch_id=0, count=1))
+        db.session.rollback()
+
+def test_rebuild_matches_running_counters(app):
+    with app.app_context():
+        running = counters()
+        rebuild_fleet_stats()
+        assert counters() == running
@@ -0,0 +1,41 @@
+# Path: tests/test_workers.py
+import threading
+from app.workers import BackgroundWorker
+
+class Recorder(BackgroundWorker):
+    name = 'recorder'
+    batch_size = 3
+    flush_interval = 0.05
+
+    def __init__(self, app, run_async=True):
+        super().__init__(app, run_async)
+        self.batches = []
+        self.threads_seen = set()
+
+    def handle(self, items):
+        self.batches.append(list(items))
+        self.threads_seen.add(threading.current_thread().name)
+
+def test_items_are_batched_on_the_worker_thread(app):
+    worker = Recorder(app)
+    for i in range(7):
+        worker.put(i)
+    worker.close()
+    assert [i for batch in worker.batches for i in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in worker.batches)
+    assert worker.threads_seen == {'recorder'}
+
+def test_inline_when_not_async(app):
+    worker = Recorder(app, run_async=False)
+    worker.put('a')
+    assert worker.batches == [['a']]
+    assert worker.threads_seen == {threading.current_thread().name}
+
+def test_idle_interval_polls(app):
+    worker = Recorder(app)
+    worker.idle_interval = 0.01
+    polled = threading.Event()
+    worker.handle = lambda items: polled.set() if not items else None
+    worker.ensure_started()
+    assert polled.wait(2)
+    worker.close()